@@ -7,9 +7,12 @@ le phrasé continu (legato), et les enveloppes physiques par famille.
 
 import math
 import random
-import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
 
 import config
+from clock import WallClock
+from scale_quantizer import get_quantizer
 
 try:
     from scamp import Envelope
@@ -76,6 +79,235 @@ PLUCKED_INSTRUMENTS = {
 }
 
 
+# ═══════════════════════════════════════════════════════════
+#  VOICE LEADING INDEX (precomputed per scale + tessitura)
+# ═══════════════════════════════════════════════════════════
+
+def _fold_pitch(pitch: int, lo: int, hi: int) -> int:
+    """Fold a pitch by octaves into [lo, hi], then hard-clamp."""
+    while pitch < lo:
+        pitch += 12
+    while pitch > hi:
+        pitch -= 12
+    return max(lo, min(hi, pitch))
+
+
+class _VoiceLeadIndex:
+    """
+    Sorted candidate pitches for one (scale, tessitura) pair.
+
+    Holds the scale plus its ±12 shifts, each candidate's tessitura-folded
+    value, and lazily built cumulative weight tables keyed by
+    (last pitch, max interval). A pick is one bisect for the window
+    (cached) and one bisect into the cumulative table.
+    """
+
+    __slots__ = ("scale", "lo", "hi", "pitches", "folded", "_tables")
+
+    def __init__(self, scale: list[int], lo: int, hi: int) -> None:
+        self.scale = scale  # Keeps the list alive: the cache is keyed by id()
+        self.lo = lo
+        self.hi = hi
+        pool = set(scale)
+        pool.update(n - 12 for n in scale)
+        pool.update(n + 12 for n in scale)
+        self.pitches: list[int] = sorted(pool)
+        self.folded: list[int] = [_fold_pitch(p, lo, hi) for p in self.pitches]
+        # key -> (values, offset, cum_weights, total)
+        self._tables: dict[int, tuple[list[int], int, list[float], float]] = {}
+
+    def _build_table(self, last: int, max_interval: int) -> tuple[list[int], int, list[float], float]:
+        start = bisect_left(self.pitches, last - max_interval)
+        stop = bisect_right(self.pitches, last + max_interval)
+        if start < stop:
+            values, offset, window = self.folded, start, self.pitches[start:stop]
+        else:
+            # No neighbour in reach: fall back to the raw scale
+            values = [_fold_pitch(p, self.lo, self.hi) for p in self.scale]
+            offset, window = 0, self.scale
+        cum: list[float] = []
+        total = 0.0
+        for c in window:
+            total += 1.0 / (1.0 + abs(c - last))
+            cum.append(total)
+        return values, offset, cum, total
+
+    def pick(self, last: int, max_interval: int) -> int:
+        key = (last << 8) | max_interval
+        table = self._tables.get(key)
+        if table is None:
+            table = self._tables[key] = self._build_table(last, max_interval)
+        values, offset, cum, total = table
+        i = bisect_right(cum, random.random() * total)
+        if i >= len(cum):
+            i = len(cum) - 1
+        return values[offset + i]
+
+
+_VOICE_LEAD_INDEX: dict[tuple[int, int, int], _VoiceLeadIndex] = {}
+_VOICE_LEAD_INDEX_MAX = 256
+
+
+def _get_voice_lead_index(scale: list[int], lo: int, hi: int) -> _VoiceLeadIndex:
+    key = (id(scale), lo, hi)
+    index = _VOICE_LEAD_INDEX.get(key)
+    if index is None or index.scale is not scale:
+        if len(_VOICE_LEAD_INDEX) >= _VOICE_LEAD_INDEX_MAX:
+            _VOICE_LEAD_INDEX.clear()  # Callers passing throwaway lists
+        index = _VOICE_LEAD_INDEX[key] = _VoiceLeadIndex(scale, lo, hi)
+    return index
+
+
+# ═══════════════════════════════════════════════════════════
+#  ENVELOPE TEMPLATES (family shape x duration bucket, LRU)
+# ═══════════════════════════════════════════════════════════
+
+ENV_PERCUSSIVE = "percussive"
+ENV_PLUCKED = "plucked"
+ENV_SUSTAINED = "sustained"
+ENV_DEFAULT = "default"
+ENV_FLUID = "fluid"  # Fluid-mode notes (audio_engine._play_fluid_note)
+
+_ENV_BUCKETS_PER_OCTAVE = 12   # Bucket length within ~3% of the note length
+_ENV_SUSTAINED_VARIANTS = 4    # Pre-drawn "breathing" shapes per bucket
+_ENV_VOLUME_STEPS = 32         # Finer than humanize_velocity() jitter
+_ENV_MIN_DURATION = 0.05
+
+
+def envelope_family(inst_name: str) -> str:
+    if inst_name in PERCUSSIVE_INSTRUMENTS:
+        return ENV_PERCUSSIVE
+    if inst_name in PLUCKED_INSTRUMENTS and inst_name not in SUSTAINED_INSTRUMENTS:
+        return ENV_PLUCKED
+    if inst_name in SUSTAINED_INSTRUMENTS:
+        return ENV_SUSTAINED
+    return ENV_DEFAULT
+
+
+def _envelope_shape(family: str, duration: float) -> tuple[tuple, tuple, tuple]:
+    """
+    Normalized (volume = 1.0) envelope shape: (levels, durations, curves).
+    Levels are multiplied by the note volume (clamped to 1.0) at use.
+    """
+    # PERCUSSIVE: Instant attack, exponential decay
+    if family == ENV_PERCUSSIVE:
+        attack = min(0.03, duration * 0.02)
+        return (1.0, 0.95, 0.0), (attack, duration - attack), (0, -3)
+
+    # PLUCKED: Instant attack, resonant decay (0.5-2s)
+    if family == ENV_PLUCKED:
+        return (0.9, 1.0, 0.4, 0.0), (0.02, duration * 0.3, duration * 0.7), (0, -2, -4)
+
+    # SUSTAINED: Swell attack + dynamic sustain + long release
+    if family == ENV_SUSTAINED:
+        # Release tail: 1.5-2.5s (never cuts abruptly)
+        release_time = max(1.0, min(2.5, duration * 0.15))
+        # Swell: 8-15% of duration for attack
+        attack_time = max(0.3, min(2.0, duration * random.uniform(0.08, 0.15)))
+        body_time = duration - attack_time - release_time
+
+        if body_time < 0.5:
+            # Very short note: simple swell + fade
+            return (0.1, 1.0, 0.0), (duration * 0.3, duration * 0.7), (2, -3)
+
+        # Dynamic sustain: volume breathes slightly
+        peak = random.uniform(1.05, 1.25)
+        sustain = random.uniform(0.75, 0.95)
+        end_sustain = random.uniform(0.6, 0.85)
+        return ((0.05, peak, sustain, end_sustain, 0.0),
+                (attack_time, body_time * 0.4, body_time * 0.6, release_time),
+                (3, -1, 1, -3))
+
+    # FLUID: Soft attack, sustain, slow release
+    if family == ENV_FLUID:
+        return (0.0, 1.0, 0.8, 0.0), (duration * 0.1, duration * 0.5, duration * 0.4), (2, 0, -2)
+
+    # DEFAULT: Simple swell (unknown family)
+    return (0.3, 1.0, 0.0), (duration * 0.2, duration * 0.8), (2, -2)
+
+
+class _LRU:
+    """Minimal bounded LRU mapping."""
+
+    __slots__ = ("_data", "maxsize")
+
+    def __init__(self, maxsize: int) -> None:
+        self._data: OrderedDict = OrderedDict()
+        self.maxsize = maxsize
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value) -> None:
+        self._data[key] = value
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class EnvelopeCache:
+    """
+    Ready-made SCAMP Envelopes keyed by (family, duration bucket, variant,
+    volume step).
+
+    Durations are quantized on a log scale and volumes in 1/32 steps, so
+    one Envelope serves every note of its bucket: callers play the note
+    at snap(duration), the bucket's nominal length, which is the length
+    the cached Envelope was built for. SCAMP leaves volume Envelopes
+    untouched unless playback_settings.resize_parameter_envelopes is
+    "always", so a cached object can be shared by any number of notes.
+    Sustained envelopes keep their random breathing by drawing one of a
+    few pre-built variants per note.
+    """
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        self.envelopes = _LRU(maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def bucket(duration: float) -> int:
+        return round(math.log2(max(_ENV_MIN_DURATION, duration)) * _ENV_BUCKETS_PER_OCTAVE)
+
+    @classmethod
+    def snap(cls, duration: float) -> float:
+        """Nominal length of the bucket `duration` falls in (within ~3%)."""
+        return 2.0 ** (cls.bucket(duration) / _ENV_BUCKETS_PER_OCTAVE)
+
+    def get(self, inst_name: str, vol: float, duration: float, family: str | None = None):
+        """Envelope for a note of length snap(duration); `family` overrides the instrument's."""
+        if family is None:
+            family = envelope_family(inst_name)
+        bucket = self.bucket(duration)
+        variant = random.randrange(_ENV_SUSTAINED_VARIANTS) if family == ENV_SUSTAINED else 0
+        vol_step = max(1, round(vol * _ENV_VOLUME_STEPS))
+        key = (family, bucket, variant, vol_step)
+
+        envelope = self.envelopes.get(key)
+        if envelope is not None:
+            self.hits += 1
+            return envelope
+        self.misses += 1
+        nominal = 2.0 ** (bucket / _ENV_BUCKETS_PER_OCTAVE)
+        levels, durations, curves = _envelope_shape(family, nominal)
+        v = vol_step / _ENV_VOLUME_STEPS
+        envelope = Envelope.from_levels_and_durations(
+            [min(1.0, level * v) for level in levels], list(durations), curve_shapes=list(curves))
+        self.envelopes.put(key, envelope)
+        return envelope
+
+    def clear(self) -> None:
+        self.envelopes.clear()
+
+
 # ═══════════════════════════════════════════════════════════
 #  AI CONDUCTOR
 # ═══════════════════════════════════════════════════════════
@@ -138,7 +370,10 @@ class AIConductor:
         "celesta", "orgue", "timbales", "clavecin", "accordeon",
     }
 
-    def __init__(self) -> None:
+    def __init__(self, clock=None) -> None:
+        # ── Time source: SCAMP beat time, wall time or simulated ──
+        self.clock = clock if clock is not None else WallClock()
+
         # ── State vector (all 0.0–1.0) ──
         self.tension: float = 0.3
         self.density: float = 0.2
@@ -151,6 +386,8 @@ class AIConductor:
 
         # ── Voice leading state ──
         self._last_pitch: dict[str, int] = {}
+        self._lead_index: dict[str, _VoiceLeadIndex] = {}
+        self.envelope_cache = EnvelopeCache()
 
         # ── Phrasing state per instrument ──
         self._phrase_state: dict[str, dict] = {}
@@ -176,6 +413,10 @@ class AIConductor:
             }
         return self._phrase_state[inst_name]
 
+    def _now(self) -> float:
+        """Clock time in seconds: phrase, breath and intro windows are in seconds."""
+        return self.clock.seconds(self.clock.now())
+
     def should_start_phrase(self, inst_name: str) -> bool:
         """
         Decide if this instrument should begin a new phrase.
@@ -185,7 +426,7 @@ class AIConductor:
         Only a rare 'breath' (1/10 after a long phrase) creates a pause.
         """
         state = self.get_phrase_state(inst_name)
-        now = time.time()
+        now = self._now()
 
         # Already in a phrase → continue it
         if state["active"] and now < state["end"]:
@@ -218,7 +459,7 @@ class AIConductor:
         Returns the phrase duration.
         """
         state = self.get_phrase_state(inst_name)
-        now = time.time()
+        now = self._now()
 
         if inst_name in CONTINUUM_INSTRUMENTS:
             # Long continuous phrases: 20-60s
@@ -243,21 +484,24 @@ class AIConductor:
     def is_in_phrase(self, inst_name: str) -> bool:
         """Check if instrument is currently in an active phrase."""
         state = self.get_phrase_state(inst_name)
-        return state["active"] and time.time() < state["end"]
+        return state["active"] and self._now() < state["end"]
 
     def end_phrase_if_done(self, inst_name: str) -> None:
         """Mark phrase as ended if time is up."""
         state = self.get_phrase_state(inst_name)
-        if state["active"] and time.time() >= state["end"]:
+        if state["active"] and self._now() >= state["end"]:
             state["active"] = False
 
     # ═══════════════════════════════════════════════════════
     #  SMART ENVELOPES (Per Instrument Family)
     # ═══════════════════════════════════════════════════════
 
-    def get_smart_envelope(self, inst_name: str, vol: float, duration: float):
+    def get_smart_envelope(self, inst_name: str, vol: float, duration: float, family: str | None = None):
         """
-        Create a physically accurate SCAMP Envelope for this instrument.
+        Physically accurate SCAMP Envelope for this instrument's family
+        (percussive, plucked, sustained, default, or `family`), shared from
+        the envelope cache. The note must be played at
+        envelope_length(duration), the length the Envelope spans.
 
         Returns an Envelope object or a float volume if Envelope unavailable.
         """
@@ -265,77 +509,15 @@ class AIConductor:
             return vol  # Fallback: flat volume
 
         try:
-            # ────────────────────────────────────
-            # PERCUSSIVE: Instant attack, exponential decay
-            # ────────────────────────────────────
-            if inst_name in PERCUSSIVE_INSTRUMENTS:
-                attack = min(0.03, duration * 0.02)
-                decay = duration - attack
-                return Envelope.from_levels(
-                    [vol, vol * 0.95, 0.0],
-                    [attack, decay],
-                    curve_shapes=[0, -3]
-                )
-
-            # ────────────────────────────────────
-            # PLUCKED: Instant attack, resonant decay (0.5-2s)
-            # ────────────────────────────────────
-            if inst_name in PLUCKED_INSTRUMENTS and inst_name not in SUSTAINED_INSTRUMENTS:
-                attack = 0.02
-                body = duration * 0.3
-                release = duration * 0.7
-                return Envelope.from_levels(
-                    [vol * 0.9, vol, vol * 0.4, 0.0],
-                    [attack, body, release],
-                    curve_shapes=[0, -2, -4]
-                )
-
-            # ────────────────────────────────────
-            # SUSTAINED: Swell attack + dynamic sustain + long release
-            # ────────────────────────────────────
-            if inst_name in SUSTAINED_INSTRUMENTS:
-                # Release tail: 1.5-2.5s (never cuts abruptly)
-                release_time = min(2.5, duration * 0.15)
-                release_time = max(1.0, release_time)
-
-                # Swell: 8-15% of duration for attack
-                attack_time = duration * random.uniform(0.08, 0.15)
-                attack_time = max(0.3, min(2.0, attack_time))
-
-                # Body: sustain with subtle dynamics (breathing)
-                body_time = duration - attack_time - release_time
-
-                if body_time < 0.5:
-                    # Very short note: simple swell + fade
-                    return Envelope.from_levels(
-                        [vol * 0.1, vol, 0.0],
-                        [duration * 0.3, duration * 0.7],
-                        curve_shapes=[2, -3]
-                    )
-
-                # Dynamic sustain: volume breathes slightly
-                peak_vol = vol * random.uniform(1.05, 1.25)
-                peak_vol = min(1.0, peak_vol)
-                sustain_vol = vol * random.uniform(0.75, 0.95)
-                end_sustain = vol * random.uniform(0.6, 0.85)
-
-                return Envelope.from_levels(
-                    [vol * 0.05, peak_vol, sustain_vol, end_sustain, 0.0],
-                    [attack_time, body_time * 0.4, body_time * 0.6, release_time],
-                    curve_shapes=[3, -1, 1, -3]
-                )
-
-            # ────────────────────────────────────
-            # DEFAULT: Simple swell (unknown family)
-            # ────────────────────────────────────
-            return Envelope.from_levels(
-                [vol * 0.3, vol, 0.0],
-                [duration * 0.2, duration * 0.8],
-                curve_shapes=[2, -2]
-            )
-
-        except Exception:
-            return vol  # Fallback on any error
+            return self.envelope_cache.get(inst_name, vol, duration, family)
+        except Exception as e:
+            print(f"⚠️ Envelope error ({inst_name}): {e}")
+            return vol  # Fallback: flat volume
+
+    @staticmethod
+    def envelope_length(duration: float) -> float:
+        """Note length matching get_smart_envelope(): `duration` snapped to its cache bucket."""
+        return EnvelopeCache.snap(duration)
 
     # ═══════════════════════════════════════════════════════
     #  NOTE DURATION LOGIC (Pillar + Passage)
@@ -432,7 +614,7 @@ class AIConductor:
 
     def update(self, delta: float, emotion_data: dict) -> None:
         if not self._active:
-            self._start_time = time.time()
+            self._start_time = self._now()
             self._active = True
 
         self._t_tension += delta * 0.015
@@ -443,7 +625,7 @@ class AIConductor:
         self.density = perlin_1d(self._t_density)
         self.valence = perlin_1d(self._t_valence)
 
-        elapsed = time.time() - self._start_time
+        elapsed = self._now() - self._start_time
         intro_factor = min(1.0, elapsed / 30.0)
         self.tension *= intro_factor
         self.density *= intro_factor
@@ -461,40 +643,45 @@ class AIConductor:
 
         bpm_range = 40
         desired_bpm = target_bpm + (self.tension - 0.5) * bpm_range
-        config.ETAT["bpm"] += (desired_bpm - config.ETAT["bpm"]) * 0.03
-
         desired_int = target_int * (0.3 + 0.7 * self.density) * intro_factor
-        config.ETAT["intensite"] += (desired_int - config.ETAT["intensite"]) * 0.02
+
+        # One atomic version for both (a slider move can't be lost in between)
+        config.STATE.mutate(lambda etat: {
+            "bpm": etat["bpm"] + (desired_bpm - etat["bpm"]) * 0.03,
+            "intensite": etat["intensite"] + (desired_int - etat["intensite"]) * 0.02,
+        })
 
     # ═══════════════════════════════════════════════════════
     #  DYNAMIC ORCHESTRATION
     # ═══════════════════════════════════════════════════════
 
     def _manage_layers(self, emotion_data: dict) -> None:
-        actifs = config.ETAT.get("instruments_actifs", [])
         preferred = emotion_data.get("preferred", [])
-        all_available = list(self.TESSITURA.keys())
 
         # Target: density maps to 1–6 (was 1-12, now more restrained)
         target_count = max(1, int(1 + self.density * 5))
         target_count = min(target_count, 6)  # Hard cap
 
-        if len(actifs) < target_count:
-            candidates = [i for i in preferred if i not in actifs]
-            if not candidates:
-                candidates = [i for i in all_available if i not in actifs]
-            candidates = self._spectral_filter(candidates, actifs)
-            if candidates:
+        def change_layers(etat) -> dict | None:
+            actifs = list(etat.get("instruments_actifs", ()))
+            if len(actifs) < target_count:
+                candidates = [i for i in preferred if i not in actifs]
+                if not candidates:
+                    candidates = [i for i in self.TESSITURA if i not in actifs]
+                candidates = self._spectral_filter(candidates, actifs)
+                if not candidates:
+                    return None
                 actifs.append(random.choice(candidates))
-                config.ETAT["instruments_actifs"] = actifs
-                config.ETAT["ui_needs_update"] = True
 
-        elif len(actifs) > target_count:
-            non_pref = [i for i in actifs if i not in preferred]
-            bye = random.choice(non_pref) if non_pref else random.choice(actifs)
-            actifs.remove(bye)
-            config.ETAT["instruments_actifs"] = actifs
-            config.ETAT["ui_needs_update"] = True
+            elif len(actifs) > target_count:
+                non_pref = [i for i in actifs if i not in preferred]
+                bye = random.choice(non_pref) if non_pref else random.choice(actifs)
+                actifs.remove(bye)
+            else:
+                return None
+            return {"instruments_actifs": actifs}  # UI notified via config.EVENTS
+
+        config.STATE.mutate(change_layers)
 
     def _spectral_filter(self, candidates: list[str], actifs: list[str]) -> list[str]:
         actifs_set = set(actifs)
@@ -512,15 +699,7 @@ class AIConductor:
     # ═══════════════════════════════════════════════════════
 
     def quantize_to_scale(self, pitch: int, scale: list[int]) -> int:
-        if pitch in scale:
-            return pitch
-        best = min(scale, key=lambda n: abs(n - pitch))
-        for octave_shift in (-12, 12, -24, 24):
-            for n in scale:
-                shifted = n + octave_shift
-                if abs(shifted - pitch) < abs(best - pitch):
-                    best = shifted
-        return best
+        return get_quantizer(scale).snap(pitch)
 
     # ═══════════════════════════════════════════════════════
     #  VOICE LEADING
@@ -536,23 +715,15 @@ class AIConductor:
             self._last_pitch[inst_name] = result
             return result
 
+        # Candidate window + weights come from the precomputed index:
+        # O(log n) per pick, no per-note list building.
+        index = self._lead_index.get(inst_name)
+        if index is None or index.scale is not scale:
+            lo, hi = self.TESSITURA.get(inst_name, (0, 127))
+            index = self._lead_index[inst_name] = _get_voice_lead_index(scale, lo, hi)
+
         max_interval = int(3 + self.tension * 9)
-        candidates: list[int] = [n for n in scale if abs(n - last) <= max_interval]
-        for n in scale:
-            for shift in (-12, 12):
-                ns = n + shift
-                if abs(ns - last) <= max_interval and ns not in candidates:
-                    candidates.append(ns)
-
-        if not candidates:
-            candidates = list(scale)
-
-        weights = [1.0 / (1.0 + abs(c - last)) for c in candidates]
-        total = sum(weights)
-        weights = [w / total for w in weights]
-
-        chosen = random.choices(candidates, weights=weights, k=1)[0]
-        chosen = self.clamp_tessitura(inst_name, chosen)
+        chosen = index.pick(last, max_interval)
         self._last_pitch[inst_name] = chosen
         return chosen
 
@@ -562,11 +733,7 @@ class AIConductor:
 
     def clamp_tessitura(self, inst_name: str, pitch: int) -> int:
         lo, hi = self.TESSITURA.get(inst_name, (0, 127))
-        while pitch < lo:
-            pitch += 12
-        while pitch > hi:
-            pitch -= 12
-        return max(lo, min(hi, pitch))
+        return _fold_pitch(pitch, lo, hi)
 
     # ═══════════════════════════════════════════════════════
     #  GAUSSIAN VELOCITY HUMANIZATION
@@ -612,6 +779,7 @@ class AIConductor:
     def reset(self) -> None:
         self._active = False
         self._last_pitch.clear()
+        self._lead_index.clear()
         self._phrase_state.clear()
         self.tension = 0.3
         self.density = 0.2
@@ -0,0 +1,787 @@
+# ambience.py - AMBIANCES EN STREAMING v1.20
+"""
+Lecture des ambiances (config.AUDIO_FILES) sans décodage complet en RAM.
+
+Un thread décode le fichier par blocs (soundfile / libsndfile) dans un
+tampon circulaire borné ; un seul thread de mixage additionne les voix
+(plusieurs ambiances superposées, chacune avec sa rampe de gain) et
+pousse le résultat sur un canal pygame via Channel.queue().
+La mémoire reste bornée à quelques secondes de PCM quelle que soit la
+durée de l'enregistrement, et un changement de preset rend la main au
+thread UI immédiatement.
+
+Sans soundfile, le fichier est décodé d'un bloc par pygame.mixer.Sound,
+mais dans le thread de décodage (jamais dans le gestionnaire de clic).
+
+DecodedCache garde les ambiances déjà décodées (format du mixer, int16)
+dans un budget mémoire avec éviction LRU, et précharge en arrière-plan
+les voisins du preset courant dans sa collection : eau → feu → eau ne
+relit ni ne redécode rien, et le fondu démarre immédiatement.
+
+Format pré-transcodé (.qpcm, produit par `python check_assets.py
+--transcode`) : PCM int16 entrelacé à fréquence fixe, points de boucle
+dans l'en-tête. Le lecteur le projette en mémoire (mmap) et lit les
+échantillons sans copie ni décodage : démarrage et changement de preset
+ne coûtent plus que des pages disque.
+
+AudioWorker sérialise toutes les commandes du lecteur (lecture, volume,
+pause, sourdine) sur un thread dédié : les gestionnaires Flet postent et
+rendent la main, et une rafale de mouvements de curseur n'applique que
+la dernière valeur.
+"""
+
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+import config
+
+try:
+    import pygame  # type: ignore
+except ImportError:
+    pygame = None  # type: ignore
+
+try:
+    import soundfile  # type: ignore # Chunked FLAC/WAV/AIFF/MP3 decoding
+except ImportError:
+    soundfile = None  # Graceful fallback: whole-file decode off the UI thread
+
+BLOCK_FRAMES = 4096      # ~93 ms at 44.1 kHz
+RING_BLOCKS = 16         # Decoded look-ahead (~1.5 s): bounds memory per stream
+FADE_SECONDS = 3.0       # Crossfade length (was fade_ms=3000)
+AUTOMATION_RAMP = 0.25   # Seconds to glide to a new automation value (de-zipper)
+
+# Pre-transcoded container: header, then interleaved little-endian int16
+PCM_EXTENSION = ".qpcm"
+PCM_MAGIC = b"QPCM"
+PCM_VERSION = 1
+PCM_RATE = 44100
+PCM_CHANNELS = 2
+PCM_HEADER = struct.Struct("<4sHHIQQQ")  # magic, version, channels, rate, frames, loop_start, loop_end
+PCM_DATA_OFFSET = 64                     # Header padded: sample data stays aligned
+
+
+# ═══════════════════════════════════════════════════════════
+#  OUTPUT FORMAT
+# ═══════════════════════════════════════════════════════════
+
+def mixer_format() -> tuple[int, int] | None:
+    """(sample rate, channels) of the initialized pygame mixer, if it streams int16."""
+    if pygame is None:
+        return None
+    init = pygame.mixer.get_init()
+    if not init:
+        return None
+    rate, size, channels = init
+    if size not in (16, -16):
+        return None  # Only signed 16-bit output is streamed
+    return rate, channels
+
+
+def _match_channels(block: np.ndarray, channels: int) -> np.ndarray:
+    """(frames, n) float32 -> (frames, channels): mono is duplicated, extra channels dropped."""
+    have = block.shape[1]
+    if have == channels:
+        return block
+    if have == 1:
+        return np.repeat(block, channels, axis=1)
+    if channels == 1:
+        return block.mean(axis=1, keepdims=True)
+    if have > channels:
+        return block[:, :channels]
+    return np.concatenate([block, np.repeat(block[:, -1:], channels - have, axis=1)], axis=1)
+
+
+class _LinearResampler:
+    """Streaming linear-interpolation resampler (state carried across blocks)."""
+
+    def __init__(self, src_rate: int, dst_rate: int) -> None:
+        self.ratio = src_rate / dst_rate
+        self._pos = 0.0      # Next read position, in frames of the pending buffer
+        self._tail = None    # Last source frame of the previous block
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        if self.ratio == 1.0:
+            return block
+        if self._tail is not None:
+            block = np.concatenate([self._tail, block])
+        n = len(block)
+        count = max(0, int(np.ceil((n - 1 - self._pos) / self.ratio)))
+        pos = self._pos + np.arange(count) * self.ratio
+        i = pos.astype(np.int64)
+        frac = (pos - i)[:, None].astype(np.float32)
+        out = block[i] * (1.0 - frac) + block[np.minimum(i + 1, n - 1)] * frac
+        self._pos = self._pos + count * self.ratio - (n - 1)
+        self._tail = block[-1:]
+        return out
+
+
+# ═══════════════════════════════════════════════════════════
+#  SOURCES (float32 blocks, looping)
+# ═══════════════════════════════════════════════════════════
+
+class _SoundFileSource:
+    """Incremental decoder: only BLOCK_FRAMES are in memory at a time."""
+
+    def __init__(self, path: str, loop: bool = True) -> None:
+        self._file = soundfile.SoundFile(path)
+        self.samplerate = self._file.samplerate
+        self.loop = loop
+
+    def read(self, frames: int) -> np.ndarray:
+        block = self._file.read(frames, dtype="float32", always_2d=True)
+        if len(block) == 0 and self.loop:
+            self._file.seek(0)
+            block = self._file.read(frames, dtype="float32", always_2d=True)
+        return block
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ArraySource:
+    """Already-decoded int16 samples at the mixer rate (cache hit, pygame fallback)."""
+
+    SCALE = np.float32(1.0 / 32768.0)
+
+    def __init__(self, samples: np.ndarray, rate: int, loop: bool = True,
+                 loop_start: int = 0, loop_end: int | None = None) -> None:
+        self._samples = samples if samples.ndim == 2 else samples[:, None]
+        self._pos = 0
+        self.samplerate = rate
+        self.loop = loop
+        self._loop_start = loop_start
+        self._end = len(self._samples) if loop_end is None else loop_end
+
+    def read(self, frames: int) -> np.ndarray:
+        if self._pos >= self._end and self.loop:
+            self._pos = self._loop_start
+        block = self._samples[self._pos:min(self._pos + frames, self._end)]
+        self._pos += len(block)
+        return block.astype(np.float32) * self.SCALE
+
+    def close(self) -> None:
+        self._samples = None
+
+
+def open_source(path: str, rate: int, loop: bool = True):
+    if soundfile is not None:
+        try:
+            return _SoundFileSource(path, loop)
+        except Exception as e:
+            print(f"⚠️ Streaming decode unavailable for {path} ({e}), decoding whole file")
+    # Fallback: whole-file decode by SDL_mixer (already at the mixer rate)
+    return _ArraySource(pygame.sndarray.array(pygame.mixer.Sound(path)), rate, loop)
+
+
+def _to_int16(block: np.ndarray) -> np.ndarray:
+    return np.clip(block * 32767.0, -32768, 32767).astype(np.int16)
+
+
+def decode_file(path: str, fmt: tuple[int, int]) -> np.ndarray:
+    """Whole file as int16 (frames, channels) in the mixer format, decoded block by block."""
+    rate, channels = fmt
+    source = open_source(path, rate, loop=False)
+    resampler = _LinearResampler(source.samplerate, rate)
+    blocks = []
+    try:
+        while True:
+            block = source.read(BLOCK_FRAMES * 8)
+            if len(block) == 0:
+                break
+            blocks.append(_to_int16(_match_channels(resampler.process(block), channels)))
+    finally:
+        source.close()
+    if not blocks:
+        return np.zeros((0, channels), dtype=np.int16)
+    return np.concatenate(blocks)
+
+
+# ═══════════════════════════════════════════════════════════
+#  PRE-TRANSCODED PCM (.qpcm, memory-mapped)
+# ═══════════════════════════════════════════════════════════
+
+class PcmAsset:
+    """A mapped .qpcm file: `samples` is a read-only view on the mapping (no copy)."""
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, channels, rate, frames, loop_start, loop_end = PCM_HEADER.unpack_from(self._map, 0)
+        if magic != PCM_MAGIC or version != PCM_VERSION:
+            self._map.close()
+            raise ValueError(f"not a v{PCM_VERSION} {PCM_EXTENSION} file")
+        self.path = path
+        self.rate = rate
+        self.channels = channels
+        self.loop_start = loop_start
+        self.loop_end = loop_end
+        self.samples = np.frombuffer(self._map, dtype="<i2", count=frames * channels,
+                                     offset=PCM_DATA_OFFSET).reshape(frames, channels)
+
+    def source(self) -> _ArraySource:
+        return _ArraySource(self.samples, self.rate, loop_start=self.loop_start, loop_end=self.loop_end)
+
+    def will_need(self) -> None:
+        """Ask the OS to read the pages ahead (prefetch without decoding)."""
+        if hasattr(self._map, "madvise") and hasattr(mmap, "MADV_WILLNEED"):
+            self._map.madvise(mmap.MADV_WILLNEED)
+
+
+def pcm_path(src: str) -> str:
+    return os.path.splitext(src)[0] + PCM_EXTENSION
+
+
+_PCM_ASSETS: dict[str, PcmAsset] = {}
+_PCM_LOCK = threading.Lock()
+
+
+def load_pcm(src: str, fmt: tuple[int, int]) -> PcmAsset | None:
+    """Mapped .qpcm twin of `src`, if present, up to date and in the mixer format."""
+    path = pcm_path(src)
+    try:
+        if os.path.getmtime(path) < os.path.getmtime(src):
+            return None  # Stale: source edited since the last transcode
+    except OSError:
+        return None
+    with _PCM_LOCK:
+        asset = _PCM_ASSETS.get(path)
+        if asset is None:
+            try:
+                asset = PcmAsset(path)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring {path}: {e}")
+                return None
+            _PCM_ASSETS[path] = asset
+    if (asset.rate, asset.channels) != tuple(fmt):
+        return None
+    return asset
+
+
+def find_loop_points(samples: np.ndarray, search_seconds: float = 0.05, rate: int = PCM_RATE) -> tuple[int, int]:
+    """
+    Loop end in the last `search_seconds` at the frame closest to the first
+    one (amplitude and slope), so the wrap-around doesn't click.
+    """
+    frames = len(samples)
+    if frames < 4:
+        return 0, frames
+    window = min(frames - 2, max(1, int(search_seconds * rate)))
+    data = samples.astype(np.float32)
+    start, slope = data[0], data[1] - data[0]
+    candidates = np.arange(frames - window, frames)
+    cost = (np.abs(data[candidates] - start).sum(axis=1)
+            + np.abs((data[candidates] - data[candidates - 1]) - slope).sum(axis=1))
+    return 0, int(candidates[np.argmin(cost)])
+
+
+def write_pcm(path: str, samples: np.ndarray, rate: int = PCM_RATE) -> tuple[int, int]:
+    """Write `samples` (int16, frames x channels) as .qpcm. Returns the loop points."""
+    loop_start, loop_end = find_loop_points(samples, rate=rate)
+    frames, channels = samples.shape
+    header = PCM_HEADER.pack(PCM_MAGIC, PCM_VERSION, channels, rate, frames, loop_start, loop_end)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(header.ljust(PCM_DATA_OFFSET, b"\0"))
+        f.write(np.ascontiguousarray(samples, dtype="<i2").tobytes())
+    os.replace(tmp, path)  # Never leave a half-written file for the player to map
+    return loop_start, loop_end
+
+
+# ═══════════════════════════════════════════════════════════
+#  DECODED CACHE (LRU, memory budget, background prefetch)
+# ═══════════════════════════════════════════════════════════
+
+def prefetch_targets(preset_key: str) -> list[str]:
+    """File of `preset_key`, then its left/right neighbours in its collection's pill row."""
+    paths = [config.AUDIO_FILES.get(preset_key)]
+    for order in config.AUDIO_COLLECTIONS.values():
+        if preset_key in order:
+            i = order.index(preset_key)
+            for j in (i + 1, i - 1):
+                paths.append(config.AUDIO_FILES.get(order[j % len(order)]))
+    seen = []
+    for path in paths:
+        if path and path not in seen and os.path.exists(path):
+            seen.append(path)
+    return seen
+
+
+class DecodedCache:
+    """
+    path -> decoded int16 samples, bounded by `budget_bytes` (LRU).
+
+    Pinned paths (the ambience playing now) are never evicted. Files whose
+    decoded size exceeds the whole budget are not cached: they stream.
+    prefetch() decodes on one background thread, nearest first.
+    """
+
+    def __init__(self, budget_bytes: int, fmt: tuple[int, int]) -> None:
+        self.budget = budget_bytes
+        self.fmt = fmt
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._pinned: set[str] = set()
+        self._jobs: queue.Queue = queue.Queue()
+        self._pending: set[str] = set()
+        self._worker: threading.Thread | None = None
+
+    def get(self, path: str) -> np.ndarray | None:
+        with self._lock:
+            samples = self._entries.get(path)
+            if samples is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return samples
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._entries
+
+    def put(self, path: str, samples: np.ndarray) -> bool:
+        size = samples.nbytes
+        with self._lock:
+            if path in self._entries:
+                return True
+            if size > self.budget:
+                return False
+            for old in list(self._entries):
+                if self.bytes + size <= self.budget:
+                    break
+                if old not in self._pinned:
+                    self.bytes -= self._entries.pop(old).nbytes
+            if self.bytes + size > self.budget:
+                return False  # Everything left is pinned
+            self._entries[path] = samples
+            self.bytes += size
+            return True
+
+    def pin(self, *paths: str) -> None:
+        with self._lock:
+            self._pinned = set(paths)
+
+    def _estimated_bytes(self, path: str) -> int:
+        if soundfile is None:
+            return 0  # Unknown until decoded
+        try:
+            info = soundfile.info(path)
+        except Exception:
+            return 0
+        rate, channels = self.fmt
+        return int(info.frames * rate / info.samplerate) * channels * 2
+
+    # ── Prefetch ───────────────────────────────────────────────
+
+    def prefetch(self, paths: list[str]) -> None:
+        """Queue background decodes (first path first); cached/pending paths are skipped."""
+        with self._lock:
+            for path in paths:
+                if path not in self._entries and path not in self._pending:
+                    self._pending.add(path)
+                    self._jobs.put(path)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._prefetch_loop, daemon=True,
+                                                name="ambience-prefetch")
+                self._worker.start()
+
+    def _prefetch_loop(self) -> None:
+        while True:
+            path = self._jobs.get()
+            try:
+                pcm = load_pcm(path, self.fmt)
+                if pcm is not None:
+                    pcm.will_need()  # Mapped, not decoded: nothing to keep in the cache
+                    continue
+                if path in self._entries or self._estimated_bytes(path) > self.budget:
+                    continue
+                t0 = time.perf_counter()
+                samples = decode_file(path, self.fmt)
+                if self.put(path, samples):
+                    print(f"📦 Ambience cached: {os.path.basename(path)} "
+                          f"({samples.nbytes / 1e6:.1f} MB in {time.perf_counter() - t0:.1f}s)")
+            except Exception as e:
+                print(f"⚠️ Ambience prefetch failed ({path}): {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(path)
+
+
+# ═══════════════════════════════════════════════════════════
+#  VOICES (decoder thread → ring buffer) & GAIN RAMPS
+# ═══════════════════════════════════════════════════════════
+
+class GainRamp:
+    """Linear gain ramp rendered per block, sample by sample (no zipper noise)."""
+
+    def __init__(self, value: float = 0.0, rate: int = PCM_RATE) -> None:
+        self.value = value
+        self.target = value
+        self.rate = rate
+        self._step = 0.0   # Gain change per frame
+
+    def ramp_to(self, target: float, seconds: float) -> None:
+        """Restarts from the current value: an in-flight ramp is redirected, never dropped."""
+        self.target = target
+        frames = seconds * self.rate
+        self._step = abs(target - self.value) / frames if frames >= 1 else float("inf")
+
+    @property
+    def silent(self) -> bool:
+        return self.value <= 0.0 and self.target <= 0.0
+
+    def render(self, frames: int):
+        """Gains for the next `frames` frames: a float while steady, else an (frames, 1) array."""
+        start, target = self.value, self.target
+        if start == target:
+            return start
+        if self._step == float("inf"):
+            self.value = target
+            return target
+        ramp = start + np.copysign(self._step, target - start) * np.arange(1, frames + 1, dtype=np.float64)
+        ramp = np.minimum(ramp, target) if target > start else np.maximum(ramp, target)
+        self.value = float(ramp[-1])
+        return ramp.astype(np.float32)[:, None]
+
+
+class AmbienceVoice:
+    """
+    One looping ambience, decoded ahead into a bounded ring buffer.
+
+    The decoder thread blocks when the ring is full (back-pressure), so a
+    one-hour recording costs the same memory as a ten-second one. The
+    mixer thread pulls fixed-size blocks and never waits on it.
+    """
+
+    def __init__(self, path: str, fmt: tuple[int, int], cache: DecodedCache | None = None,
+                 volume: float = 1.0) -> None:
+        self.path = path
+        self.rate, self.channels = fmt
+        self.cache = cache
+        self.volume = volume                  # Layer volume (gain target while audible)
+        self.gain = GainRamp(0.0, self.rate)  # Driven by the mixer thread only
+        self._ring: queue.Queue = queue.Queue(maxsize=RING_BLOCKS)
+        self._stop = threading.Event()
+        self._rest = np.zeros((0, self.channels), dtype=np.float32)
+        self.ready = False                    # First block decoded
+        self.underruns = 0
+
+    def start(self) -> "AmbienceVoice":
+        threading.Thread(target=self._decode_loop, daemon=True, name="ambience-decode").start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    @property
+    def finished(self) -> bool:
+        return self._stop.is_set()
+
+    def pull(self, frames: int) -> np.ndarray | None:
+        """Next `frames` frames, zero-padded on underrun. None until the first block is decoded."""
+        parts, have = [self._rest], len(self._rest)
+        while have < frames:
+            try:
+                block = self._ring.get_nowait()
+            except queue.Empty:
+                break
+            parts.append(block)
+            have += len(block)
+            self.ready = True
+        if not self.ready:
+            return None
+        data = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        if have < frames:
+            self.underruns += 1
+            data = np.concatenate([data, np.zeros((frames - have, self.channels), dtype=np.float32)])
+        self._rest = data[frames:]
+        return data[:frames]
+
+    # ── Decoder thread ─────────────────────────────────────────
+
+    def _decode_loop(self) -> None:
+        try:
+            pcm = load_pcm(self.path, (self.rate, self.channels))
+            samples = None
+            if pcm is None and self.cache is not None:
+                samples = self.cache.get(self.path)
+            if pcm is not None:
+                source = pcm.source()  # Memory-mapped, already in the mixer format
+            elif samples is not None:
+                source = _ArraySource(samples, self.rate)  # No disk I/O, no decode
+            else:
+                source = open_source(self.path, self.rate)
+        except Exception as e:
+            print(f"⚠️ Error decoding {self.path}: {e}")
+            self._stop.set()
+            return
+        resampler = _LinearResampler(source.samplerate, self.rate)
+        try:
+            while not self._stop.is_set():
+                block = source.read(BLOCK_FRAMES)
+                if len(block) == 0:
+                    break  # Empty file
+                block = _match_channels(resampler.process(block), self.channels)
+                if len(block) == 0:
+                    continue
+                while not self._stop.is_set():
+                    try:
+                        self._ring.put(block, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+        except Exception as e:
+            print(f"⚠️ Ambience decode error ({self.path}): {e}")
+        finally:
+            self._stop.set()  # Decoder gone: the mixer reaps the voice
+            source.close()
+
+
+# ═══════════════════════════════════════════════════════════
+#  MIXER (voice pool → one pygame channel, one thread)
+# ═══════════════════════════════════════════════════════════
+
+def intensity_gain(intensite: float) -> float:
+    """config.ETAT["intensite"] (0-100) -> ambience gain, equal-power curve (0 stays silent)."""
+    return min(1.0, max(0.0, intensite / 100.0)) ** 0.5
+
+
+def follow_intensity() -> float:
+    """Automation source: the engine-facing intensite, read lock-free once per block."""
+    return intensity_gain(config.STATE.get("intensite", 50))
+
+
+class AmbienceMixer:
+    """
+    Pool of ambience voices summed into a single pygame channel.
+
+        mixer = AmbienceMixer(channel, fmt, cache)
+        mixer.play(rain)                     # crossfade: everything else fades out
+        mixer.play(fire, volume=0.5, layer=True)   # rain + fire together
+        mixer.set_voice_volume(fire, 0.8)
+        mixer.stop(fire)
+        mixer.automation = follow_intensity      # gain follows intensite
+
+    Control calls only move gain targets and return at once. The mixing
+    thread renders every ramp per block, from its current value: clicking
+    eau → feu → eau mid-fade turns the fades around instead of cutting,
+    and a voice still fading out is revived rather than restarted.
+    """
+
+    MAX_VOICES = 6
+
+    def __init__(self, channel, fmt: tuple[int, int], cache: DecodedCache | None = None) -> None:
+        self.channel = channel
+        self.fmt = fmt
+        self.rate, self.channels = fmt
+        self.cache = cache
+        self.voices: list[AmbienceVoice] = []
+        self.master = GainRamp(1.0, self.rate)
+        # Control-rate automation: polled once per block, glided sample by sample
+        self.automation = None
+        self.auto_gain = GainRamp(1.0, self.rate)
+        self.paused = False
+        self.underruns = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    # ── Control (any thread) ───────────────────────────────────
+
+    def play(self, path: str, volume: float = 1.0, layer: bool = False, fade: float = FADE_SECONDS) -> None:
+        with self._lock:
+            voice = self._find(path)
+            if voice is None:
+                voice = AmbienceVoice(path, self.fmt, self.cache, volume)
+                self._admit(voice)
+                voice.start()
+            voice.volume = volume
+            voice.gain.ramp_to(volume, fade)
+            if not layer:
+                for other in self.voices:
+                    if other is not voice:
+                        other.gain.ramp_to(0.0, fade)
+        self._ensure_thread()
+
+    def set_voice_volume(self, path: str, volume: float, fade: float = 0.5) -> None:
+        with self._lock:
+            voice = self._find(path)
+            if voice is not None and voice.gain.target > 0:
+                voice.volume = volume
+                voice.gain.ramp_to(volume, fade)
+
+    def stop(self, path: str | None = None, fade: float = FADE_SECONDS) -> None:
+        """Fade out one voice (or all of them)."""
+        with self._lock:
+            for voice in self.voices:
+                if path is None or voice.path == path:
+                    voice.gain.ramp_to(0.0, fade)
+
+    def set_master(self, volume: float, fade: float = 0.05) -> None:
+        with self._lock:
+            self.master.ramp_to(volume, fade)
+
+    def pause(self) -> None:
+        self.paused = True
+        self.channel.pause()
+
+    def resume(self) -> None:
+        self.paused = False
+        self.channel.unpause()
+        self._wake.set()
+
+    def layers(self) -> dict[str, float]:
+        """Audible (or fading in) voices: path -> layer volume."""
+        with self._lock:
+            return {v.path: v.volume for v in self.voices if v.gain.target > 0}
+
+    def _find(self, path: str) -> AmbienceVoice | None:
+        for voice in reversed(self.voices):
+            if voice.path == path and not voice.finished:
+                return voice
+        return None
+
+    def _admit(self, voice: AmbienceVoice) -> None:
+        """Add a voice; when the pool is full, steal the quietest (fading ones first)."""
+        if len(self.voices) >= self.MAX_VOICES:
+            victim = min(self.voices, key=lambda v: (v.gain.target > 0, v.gain.value))
+            victim.stop()
+            self.voices.remove(victim)
+        self.voices.append(voice)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="ambience-mixer")
+            self._thread.start()
+        self._wake.set()
+
+    # ── Mixer thread ───────────────────────────────────────────
+
+    def _mix_block(self, frames: int) -> np.ndarray:
+        out = np.zeros((frames, self.channels), dtype=np.float32)
+        with self._lock:
+            voices = list(self.voices)
+        for voice in voices:
+            block = voice.pull(frames)
+            if block is None:
+                continue  # Still decoding its first block: its fade-in hasn't started
+            with self._lock:
+                gain = voice.gain.render(frames)
+            if isinstance(gain, float):
+                if gain > 0.0:
+                    out += block * np.float32(gain)
+            else:
+                out += block * gain
+            self.underruns += voice.underruns
+            voice.underruns = 0
+        with self._lock:
+            for voice in [v for v in self.voices if v.finished or (v.gain.silent and v.ready)]:
+                voice.stop()
+                self.voices.remove(voice)
+            master = self.master.render(frames)
+        auto = self._automation_gain(frames)
+        gain = master * auto
+        return out * (np.float32(gain) if isinstance(gain, float) else gain)
+
+    def _automation_gain(self, frames: int):
+        if self.automation is None:
+            return 1.0
+        try:
+            target = float(self.automation())
+        except Exception:
+            target = self.auto_gain.target
+        if abs(target - self.auto_gain.target) > 1e-4:
+            self.auto_gain.ramp_to(target, AUTOMATION_RAMP)
+        return self.auto_gain.render(frames)
+
+    def _run(self) -> None:
+        block_seconds = BLOCK_FRAMES / self.rate
+        while True:
+            if self.paused or not self.voices:
+                self._wake.wait(0.5)
+                self._wake.clear()
+                continue
+            # The channel holds one playing + one queued sound: wait for a free slot
+            if self.channel.get_busy() and self.channel.get_queue() is not None:
+                time.sleep(block_seconds / 4)
+                continue
+            try:
+                sound = pygame.mixer.Sound(buffer=_to_int16(self._mix_block(BLOCK_FRAMES)).tobytes())
+                if self.channel.get_busy():
+                    self.channel.queue(sound)
+                else:
+                    self.channel.play(sound)
+            except Exception as e:
+                print(f"⚠️ Ambience mixer error: {e}")
+                time.sleep(block_seconds)
+
+
+# ═══════════════════════════════════════════════════════════
+#  AUDIO WORKER (serialized, coalescing command queue)
+# ═══════════════════════════════════════════════════════════
+
+class AudioWorker:
+    """
+    One thread runs every player command, in posting order.
+
+    post(fn, *args, key=k) coalesces: while a command with the same key
+    is still waiting, a new post replaces it and moves it to the back of
+    the queue, so what runs still runs in posting order. Unkeyed commands
+    always run.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._queue: deque = deque()      # (key, fn, args); fn/args are None for keyed slots
+        self._latest: dict = {}           # key -> (fn, args)
+        self._busy = False
+        self.coalesced = 0
+        self._thread = threading.Thread(target=self._run, daemon=True, name="audio-worker")
+        self._thread.start()
+
+    def post(self, fn, *args, key=None) -> None:
+        with self._cond:
+            if key is None:
+                self._queue.append((None, fn, args))
+            elif key in self._latest:
+                self._latest[key] = (fn, args)
+                self.coalesced += 1
+                if self._queue[-1][0] != key:  # Superseded: run after what was posted since
+                    self._queue.remove((key, None, None))
+                    self._queue.append((key, None, None))
+                return
+            else:
+                self._latest[key] = (fn, args)
+                self._queue.append((key, None, None))
+            self._cond.notify()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until every posted command has run. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue)
+                key, fn, args = self._queue.popleft()
+                if key is not None:
+                    fn, args = self._latest.pop(key)
+                self._busy = True
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"⚠️ Audio command failed ({getattr(fn, '__name__', fn)}): {e}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
@@ -4,15 +4,30 @@ Moteur audio procédural basé sur SCAMP.
 Génère des nappes fluides avec enveloppes dynamiques et tuilage.
 """
 
-from scamp import Session, Envelope, wait
+from scamp import Session
+import heapq
+import itertools
 import random
 import os
 import time
 import threading
 from gammes import TOUTES_GAMMES
-from ai_conductor import AIConductor, SUSTAINED_INSTRUMENTS, CONTINUUM_INSTRUMENTS, PLUCKED_INSTRUMENTS, PERCUSSIVE_INSTRUMENTS
+from scale_quantizer import get_quantizer
+from clock import ScampClock
+from note_scheduler import NoteScheduler, DEFAULT_LOOKAHEAD
+from onset_probe import PROBE
+from profiler import PROFILER
+from midi_channels import ChannelAllocator, SCAMP_PART_SLOTS, DRUM_BANK, gm_program, CC_REVERB, CC_CHORUS
+from ai_conductor import AIConductor, ENV_FLUID, SUSTAINED_INSTRUMENTS, CONTINUUM_INSTRUMENTS, PLUCKED_INSTRUMENTS, PERCUSSIVE_INSTRUMENTS
 import config
 
+# Gamme de secours (constante partagée : get_quantizer() la met en cache)
+GAMME_DEFAUT = [60, 62, 64, 65, 67, 69, 71, 72]
+
+# Instruments qui reçoivent du chorus (CC 93) en plus de la réverbération
+CHORUS_INSTRUMENTS = {"violon", "violoncelle", "contrebasse", "cuivres", "cor", "orgue"}
+FOND_PRESET = "Pad 2 (warm)"  # Nappe de fond : toujours liée
+
 
 class QuoniamAudioEngine:
     """
@@ -20,11 +35,17 @@ class QuoniamAudioEngine:
     Gère la génération MIDI via SCAMP avec nappes fluides et enveloppes expressives.
     """
 
-    def __init__(self, soundfont_path="FluidR3_GM.sf2"):
+    # Emplacements de parts SCAMP (None = illimité)
+    CHANNELS = SCAMP_PART_SLOTS
+
+    def __init__(self, soundfont_path="FluidR3_GM.sf2", clock=None, lookahead=DEFAULT_LOOKAHEAD):
         self.soundfont_path = soundfont_path
+        # Horloge : now() + wait(). Par défaut le temps logique SCAMP (créé avec la session)
+        self.clock = clock
         self.session = None
-        self.instruments = {}
-        self.parts_cache = {}
+        self.instrument_presets = {}  # instrument -> preset SCAMP
+        self.parts_cache = {}  # preset -> part liée à un emplacement
+        self.channels = ChannelAllocator(self.CHANNELS, drum_channel=None)
         self.fond_sonore = None
 
         # État du moteur
@@ -34,9 +55,6 @@ class QuoniamAudioEngine:
         # État musical
         self.note_courante = 60
 
-        # AI Conductor
-        self.conductor = AIConductor()
-
         # Recording state (v1.20)
         self.is_recording = False
         self._current_performance = None
@@ -44,6 +62,20 @@ class QuoniamAudioEngine:
 
         # Initialiser la session SCAMP
         self._init_scamp_session()
+        if self.clock is None:
+            self.clock = ScampClock(self.session)
+
+        # Orchestre : notes composées `lookahead` s en avance, jouées à l'heure
+        self.scheduler = NoteScheduler(self.clock, lookahead, probe=PROBE, profiler=PROFILER)
+        # Voix : (réveil, seq, instrument) ; instrument None = réveil du chef d'orchestre
+        self._voices = []
+        self._voice_seq = itertools.count()
+        self._voice_names = set()
+        self._orchestra = None  # Contexte partagé posé par le réveil du chef
+        self._fluid_due = None  # Échéance de la prochaine note fluide (sonde de retard)
+
+        # AI Conductor : voit le temps en cours de composition
+        self.conductor = AIConductor(clock=self.scheduler.compose_clock)
 
     def _init_scamp_session(self):
         """Initialise la session SCAMP et charge les instruments."""
@@ -61,27 +93,81 @@ class QuoniamAudioEngine:
 
         self._load_instruments()
 
+    def _now(self):
+        return self.clock.now() if self.clock is not None else 0.0
+
     def _get_part(self, preset_name):
-        """Récupère ou crée un Part SCAMP (cache pour économiser les canaux MIDI)."""
-        if preset_name not in self.parts_cache:
-            try:
-                self.parts_cache[preset_name] = self.session.new_part(preset_name)
-                print(f"🔌 New Part: {preset_name}")
-            except Exception as e:
-                print(f"⚠️ Failed to create part '{preset_name}': {e}")
-                return None
-        return self.parts_cache[preset_name]
+        """
+        Récupère ou crée le Part SCAMP d'un preset, lié à un emplacement.
+        Emplacements pleins : le part inactif le moins récemment utilisé est
+        repris tel quel (ses canaux synthé restent à lui) et reprogrammé
+        sur le nouveau preset, puis reçoit CC 91/93.
+        """
+        part = self.parts_cache.get(preset_name)
+        if part is not None:
+            return part
+
+        channel, evicted = self.channels.bind(preset_name, preset_name, self._now())
+        try:
+            if evicted is not None:
+                part = self._reuse_part(self.parts_cache.pop(evicted), preset_name)
+                print(f"♻️ Part reused: {evicted} -> {preset_name}")
+            else:
+                part = self._create_part(preset_name)
+        except Exception as e:
+            self.channels.release(preset_name)
+            print(f"⚠️ Failed to bind part '{preset_name}': {e}")
+            return None
+        self.parts_cache[preset_name] = part
+        self._setup_part(preset_name, part)
+        return part
+
+    def _create_part(self, preset_name):
+        part = self.session.new_part(preset_name)
+        print(f"🔌 New Part: {preset_name}")
+        return part
+
+    def _reuse_part(self, part, preset_name):
+        """Coupe les notes d'un part évincé et reprogramme ses canaux sur `preset_name`."""
+        part.end_all_notes()
+        is_drum, program = gm_program(preset_name)
+        bank_and_preset = (DRUM_BANK if is_drum else 0, program)
+        for impl in part.playback_implementations:
+            soundfont_instrument = getattr(impl, "soundfont_instrument", None)
+            if soundfont_instrument is not None:
+                soundfont_instrument.set_to_preset(*bank_and_preset)
+                impl.bank_and_preset = bank_and_preset
+        part.name = preset_name
+        return part
+
+    def _instrument(self, key):
+        """Part de l'instrument `key`, lié à la demande. None si inconnu ou impossible à créer."""
+        preset = self.instrument_presets.get(key)
+        if preset is None:
+            return None
+        part = self.parts_cache.get(preset)
+        return part if part is not None else self._get_part(preset)
+
+    def _hold_part(self, key, start, end):
+        """Le canal de `key` sonne de `start` à `end` : il n'est pas évincé avant."""
+        channel = self.channels.channel_of(self.instrument_presets.get(key))
+        if channel is not None:
+            self.channels.hold(channel, start, end)
+
+    def _pin_instruments(self, keys):
+        """Les presets de `keys` gardent leur canal tant qu'un autre peut être repris."""
+        self.channels.pinned = {self.instrument_presets[k] for k in keys if k in self.instrument_presets}
 
     def _load_instruments(self):
-        """Charge tous les instruments SCAMP avec effets (reverb, chorus)."""
+        """Déclare les instruments ; leurs parts SCAMP sont créés au premier usage."""
         print("⏳ Loading instruments...")
         try:
-            self.fond_sonore = self._get_part("Pad 2 (warm)")
+            self.fond_sonore = self._get_part(FOND_PRESET)
+            self.channels.reserved.add(FOND_PRESET)
 
-            # Helper to safely add instruments
+            # Helper to declare instruments (bound lazily)
             def add(key, preset):
-                p = self._get_part(preset)
-                if p: self.instruments[key] = p
+                self.instrument_presets[key] = preset
 
             # Éléments
             add("eau", "Marimba")
@@ -140,30 +226,32 @@ class QuoniamAudioEngine:
             add("celesta", "Celesta")
             add("bells", "Tubular Bells")
 
-            print(f"✅ Loaded {len(self.parts_cache)} unique parts for {len(self.instruments)} instruments.")
-            self._apply_effects()
+            presets = set(self.instrument_presets.values())
+            print(f"✅ {len(self.instrument_presets)} instruments ({len(presets)} presets), bound to SCAMP parts on demand.")
 
         except Exception as e:
             # Fix #10: Halt si instruments ne chargent pas
             print(f"❌ Erreur chargement instruments : {e}")
             raise
 
-    def _apply_effects(self):
-        """Applique la réverbération et le chorus aux instruments."""
-        print("🎛️  Initialisation CC (Reverb/Chorus)...")
-        for name, part in self.instruments.items():
-            try:
-                part.play_note(0, 0, 0)  # Wake up channel
-                # CC 91 = Reverb, CC 93 = Chorus
-                if hasattr(part, 'midi_channel') and hasattr(self.session, 'send_message'):
-                    midi_ch = part.midi_channel
-                    self.session.send_message(part, 176, midi_ch, 91, 95)  # type: ignore[attr-defined]
-                    if name in ["violon", "violoncelle", "contrebasse", "cuivres", "cor", "orgue"]:
-                        self.session.send_message(part, 176, midi_ch, 93, 80)  # type: ignore[attr-defined]
-                    else:
-                        self.session.send_message(part, 176, midi_ch, 93, 0)  # type: ignore[attr-defined]
-            except:
-                pass
+    def _part_effects(self, preset_name):
+        """(reverb, chorus) d'un preset d'instrument ; None pour la nappe de fond (réglages du preset)."""
+        names = [k for k, p in self.instrument_presets.items() if p == preset_name]
+        if not names:
+            return None
+        return 95, 80 if any(k in CHORUS_INSTRUMENTS for k in names) else 0
+
+    def _setup_part(self, preset_name, part):
+        """Réverbération et chorus (CC 91/93) sur tous les canaux d'un part (nouveau ou re-lié)."""
+        effects = self._part_effects(preset_name)
+        if effects is None:
+            return
+        reverb, chorus = effects
+        try:
+            part.send_midi_cc(CC_REVERB, reverb / 127)
+            part.send_midi_cc(CC_CHORUS, chorus / 127)
+        except Exception as e:
+            print(f"⚠️ CC setup failed for '{preset_name}': {e}")
 
     def start(self):
         """Démarre le moteur audio dans un thread séparé."""
@@ -247,6 +335,25 @@ class QuoniamAudioEngine:
             self._current_performance = None
             return None
 
+    def start_profiling(self, path=None, interval=10.0):
+        """Active les compteurs du chemin critique ; avec `path`, écrit une fenêtre toutes les `interval` s."""
+        if path:
+            PROFILER.start_periodic(path, interval)
+        else:
+            PROFILER.enable()
+
+    def stop_profiling(self):
+        PROFILER.stop_periodic()
+        PROFILER.enable(False)
+
+    def dump_profile(self, path=None, reset=False):
+        """Compteurs (appels, total ns, max ns) par étape : tableau affiché, ou une ligne JSON dans `path`."""
+        return PROFILER.dump(path, reset=reset)
+
+    def get_onset_stats(self, inst_name=None):
+        """Retard d'attaque (ms, p50/p95/p99/max) par instrument, ou d'un seul."""
+        return PROBE.stats(inst_name)
+
     def get_recording_duration(self):
         """Returns elapsed recording time in seconds."""
         if self.is_recording and self._recording_start_time > 0:
@@ -259,9 +366,9 @@ class QuoniamAudioEngine:
     def trouver_accords(note_base, gamme):
         """Génère une triade harmonique à partir d'une note de base."""
         try:
-            if note_base not in gamme:
+            idx = get_quantizer(gamme).index_of(note_base)
+            if idx < 0:
                 return [note_base]
-            idx = gamme.index(note_base)
             n1 = gamme[idx]
             n2 = gamme[(idx + 4) % len(gamme)]
             n3 = gamme[(idx + 8) % len(gamme)]
@@ -284,86 +391,104 @@ class QuoniamAudioEngine:
         """Boucle de génération de la nappe harmonique de fond."""
         while self.is_running:
             try:
-                if not config.ETAT["actif"] or config.ETAT["collection"] is None:
-                    wait(1.0)
-                    continue
+                self._nappe_fond_step()
+            except Exception as e:
+                print(f"⚠️ Erreur nappe fond: {e}")
+                self.clock.wait(1.0)
 
-                if config.ETAT["collection"] in ["elements", "saisons", "atmos"]:
-                    wait(1.0)
-                    continue
+    def _nappe_fond_step(self):
+        """Une itération de la nappe de fond (attend toujours au moins une fois)."""
+        etat = config.STATE.snapshot()  # One consistent state per iteration
+        if not etat["actif"] or etat["collection"] is None:
+            self.clock.wait(1.0)
+            return
 
-                preset = config.ETAT["preset"]
-                if preset is None:
-                    wait(1.0)
-                    continue
+        if etat["collection"] in ["elements", "saisons", "atmos"]:
+            self.clock.wait(1.0)
+            return
 
-                gamme = TOUTES_GAMMES.get(preset, [60, 62, 64, 65, 67, 69, 71, 72])
-                intensite = config.ETAT["intensite"]
+        preset = etat["preset"]
+        if preset is None:
+            self.clock.wait(1.0)
+            return
 
-                note_cible = min(gamme, key=lambda x: abs(x - 48))
-                duree = 10.0
-                vol = 0.05 + (intensite / 800.0)
+        gamme = TOUTES_GAMMES.get(preset, GAMME_DEFAUT)
+        intensite = etat["intensite"]
 
-                accord = self.trouver_accords(note_cible, gamme)
-                for n in accord:
-                    if self.fond_sonore:
-                        self.fond_sonore.play_note(n, vol, duree, blocking=False)
-                        wait(0.1)
+        note_cible = get_quantizer(gamme).nearest_note(48)
+        duree = 10.0
+        vol = 0.05 + (intensite / 800.0)
 
-                wait(duree * 0.8)
+        accord = self.trouver_accords(note_cible, gamme)
+        for n in accord:
+            if self.fond_sonore:
+                self.fond_sonore.play_note(n, vol, duree, blocking=False)
+                self.clock.wait(0.1)
 
-            except Exception as e:
-                print(f"⚠️ Erreur nappe fond: {e}")
-                wait(1.0)
+        self.clock.wait(duree * 0.8)
 
     def _melodie_loop(self):
         """Boucle principale de génération mélodique."""
         while self.is_running:
             try:
-                if not config.ETAT["actif"] or config.ETAT["collection"] is None:
-                    wait(0.1)
-                    continue
-
-                # MODE ORCHESTRE
-                if config.ETAT.get("mode_orchestre", False):
-                    self._play_orchestra_mode()
-                    continue
+                self._melodie_step()
+            except Exception as e:
+                print(f"⚠️ Erreur mélodie: {e}")
+                self.clock.wait(1.0)
+
+    def _melodie_step(self):
+        """Une itération de la boucle mélodique (attend toujours au moins une fois)."""
+        etat = config.STATE.snapshot()  # One consistent state per iteration
+        if not etat["actif"] or etat["collection"] is None:
+            if len(self.scheduler):
+                self.scheduler.clear()  # Paused: notes composed ahead must not play
+            self._reset_voices()
+            self._fluid_due = None
+            self.clock.wait(0.1)
+            return
 
-                # Skip MIDI pour modes audio loop
-                if config.ETAT.get("collection") in ["elements", "saisons", "atmos"]:
-                    wait(1.0)
-                    continue
+        # MODE ORCHESTRE
+        if etat.get("mode_orchestre", False):
+            self._play_orchestra_mode(etat)
+            return
+        if self._voices:
+            self._reset_voices()
 
-                preset = config.ETAT["preset"]
-                if preset is None:
-                    wait(0.1)
-                    continue
+        # Skip MIDI pour modes audio loop
+        if etat.get("collection") in ["elements", "saisons", "atmos"]:
+            self.clock.wait(1.0)
+            return
 
-                # NAPPES FLUIDES (mode standard)
-                self._play_fluid_note(preset)
+        preset = etat["preset"]
+        if preset is None:
+            self.clock.wait(0.1)
+            return
 
-            except Exception as e:
-                print(f"⚠️ Erreur mélodie: {e}")
-                wait(1.0)
+        # NAPPES FLUIDES (mode standard)
+        self._play_fluid_note(preset, etat)
 
-    def _play_fluid_note(self, preset):
+    def _play_fluid_note(self, preset, etat=None):
         """
         Joue une note avec nappe fluide :
         - Envelope avec attaque lente, sustain, relâchement lent
         - blocking=False pour parallélisation
         - wait(attente * 0.5) pour tuilage/chevauchement
         """
-        inst = self.instruments.get(preset)
+        self._pin_instruments((preset,))
+        inst = self._instrument(preset)
         if inst is None:
-            wait(0.5)
+            self.clock.wait(0.5)
             return
+        t0 = PROFILER.start()  # Décision + enveloppe (hors attentes)
 
-        gamme = TOUTES_GAMMES.get(preset, [60, 62, 64, 65, 67, 69, 71, 72])
+        gamme = TOUTES_GAMMES.get(preset, GAMME_DEFAUT)
 
-        intensite = config.ETAT["intensite"]
-        chaos = config.ETAT["chaos"]
-        gravite = config.ETAT["gravite"]
-        vitesse = config.ETAT.get("vitesse", 50)
+        if etat is None:
+            etat = config.STATE.snapshot()
+        intensite = etat["intensite"]
+        chaos = etat["chaos"]
+        gravite = etat["gravite"]
+        vitesse = etat.get("vitesse", 50)
 
         # Timing
         presets_lents = ["espace", "vide", "indus", "zen"]
@@ -374,6 +499,9 @@ class QuoniamAudioEngine:
         seuil_jeu = 0.35 + (intensite / 200.0)
 
         if random.random() < seuil_jeu:
+            if self._fluid_due is not None:
+                PROBE.record_onset(preset, self.clock, self._fluid_due)
+
             # Sélection de la note (random walk)
             direction = random.choice([-1, 1])
             if random.random() * 100 < chaos:
@@ -384,8 +512,7 @@ class QuoniamAudioEngine:
                 saut = random.randint(2, 4)
 
             try:
-                curr = min(gamme, key=lambda x: abs(x - self.note_courante))
-                curr_idx = gamme.index(curr)
+                curr_idx = get_quantizer(gamme).index_near(self.note_courante)
                 new_idx = max(0, min(curr_idx + (direction * saut), len(gamme) - 1))
                 note_brute = gamme[new_idx]
             except:
@@ -407,173 +534,250 @@ class QuoniamAudioEngine:
             if random.random() * 100 < chaos * 0.5:
                 sustain = 0.5
 
-            duree_note = attente * sustain
-
             # Fix #7: Envelope dont la durée totale = duree_note exactement
-            try:
-                envelope = Envelope.from_levels(
-                    [0.0, vol, vol * 0.8, 0.0],
-                    [duree_note * 0.1, duree_note * 0.5, duree_note * 0.4],
-                    curve_shapes=[2, 0, -2]  # type: ignore[call-arg]
-                )
-            except:
-                envelope = vol
+            # (longueur du panier de l'enveloppe partagée, à ~3% près)
+            duree_note = self.conductor.envelope_length(attente * sustain)
+            envelope = self.conductor.get_smart_envelope(preset, vol, duree_note, family=ENV_FLUID)
+
+            PROFILER.stop("fluid_note", t0)
 
             # Jouer les notes
             if intensite > 65 and random.random() < 0.35:
                 accord = self.trouver_accords(note_finale, gamme)
                 for n in accord:
-                    wait(0.1)
+                    self.clock.wait(0.1)
                     # Fix #6: Chord volume damping (vol * 0.85)
+                    t0 = PROFILER.start()
                     inst.play_note(n, vol * 0.85, duree_note, blocking=False)
+                    PROFILER.stop("play_note", t0)
             else:
+                t0 = PROFILER.start()
                 inst.play_note(note_finale, envelope, duree_note, blocking=False)
+                PROFILER.stop("play_note", t0)
+            now = self.clock.now()
+            self._hold_part(preset, now, now + duree_note)
 
             # TUILAGE : attendre la moitié pour créer un chevauchement
-            wait(attente * 0.5)
+            self._fluid_due = self.clock.now() + attente * 0.5
+            self.clock.wait(attente * 0.5)
         else:
-            wait(attente)
+            PROFILER.stop("fluid_note", t0)
+            self._fluid_due = self.clock.now() + attente
+            self.clock.wait(attente)
 
-    def _play_orchestra_mode(self):
+    def _play_orchestra_mode(self, etat=None):
         """
         Gère la lecture en mode orchestre avec AI Conductor v1.20.
         ORGANIC SOUL & PHRASING + CONTINUUM MÉLODIQUE
+
+        Lookahead : tout ce qui tombe avant `scheduler.lookahead` devant
+        l'horloge est composé, puis les notes sont jouées à leur date exacte.
+        Voix : chaque instrument actif a son propre réveil dans une file
+        triée par date (fin de cooldown / legato exact) ; le chef d'orchestre
+        garde un réveil par temps. Attend jusqu'au prochain réveil à composer.
+        """
+        sched = self.scheduler
+        voices = self._voices
+        now = sched.resync()
+        if not voices:
+            heapq.heappush(voices, (now, next(self._voice_seq), None))  # Conductor first
+
+        t0 = PROFILER.start()
+        while voices and voices[0][0] < now + sched.lookahead:
+            t, _, inst_name = heapq.heappop(voices)
+            t = max(t, now)  # Late wake-up (overload, mode switch): compose from now
+            sched.cursor = max(sched.cursor, t)
+            if inst_name is None:
+                wake = self._compose_orchestra_tick(t, etat)
+                etat = None  # Later ticks read the state again (conductor drift)
+            else:
+                wake = self._voice_step(inst_name, t)
+            if wake is not None:
+                heapq.heappush(voices, (wake, next(self._voice_seq), inst_name))
+            elif inst_name is not None:
+                self._voice_names.discard(inst_name)
+        PROFILER.stop("orchestra_compose", t0)
+
+        sched.play_until(voices[0][0] - sched.lookahead if voices else now)
+
+    def _reset_voices(self):
+        """Oublie les réveils en attente (pause, sortie du mode orchestre)."""
+        self._voices.clear()
+        self._voice_names.clear()
+        self._orchestra = None
+
+    def _compose_orchestra_tick(self, tick_time, etat=None):
+        """
+        Réveil du chef d'orchestre à `tick_time` : émotion, dérive du
+        conductor, contexte partagé des voix, voix ajoutées pour les
+        nouveaux instruments. Retourne la date du prochain réveil.
         """
-        actifs = config.ETAT.get("instruments_actifs", [])
+        if etat is None:
+            etat = config.STATE.snapshot()
+        actifs = etat.get("instruments_actifs", ())
         if not actifs:
-            wait(0.5)
-            return
+            self._orchestra = None
+            return tick_time + 0.5
 
         EMOTIONS = config.EMOTIONS
-        current_emotion = config.ETAT.get("emotion", "aleatoire")
+        current_emotion = etat.get("emotion", "aleatoire")
 
         # Random emotion switch
         if current_emotion == "aleatoire":
-            if "target_emotion" not in config.ETAT:
-                config.ETAT["target_emotion"] = "joyeux"
-                config.ETAT["last_emotion_switch"] = time.time()
+            if "target_emotion" not in etat:
+                etat = config.STATE.set(target_emotion="joyeux", last_emotion_switch=tick_time)
 
-            if time.time() - config.ETAT.get("last_emotion_switch", 0) > random.randint(15, 25):
+            # Window in seconds (tick_time is in beats under SCAMP)
+            if self.clock.seconds(tick_time - etat.get("last_emotion_switch", 0)) > random.randint(15, 25):
                 emotions_list = list(EMOTIONS.keys())
                 new_emotion = random.choice(emotions_list)
-                config.ETAT["target_emotion"] = new_emotion
-                config.ETAT["last_emotion_switch"] = time.time()
+                etat = config.STATE.set(target_emotion=new_emotion, last_emotion_switch=tick_time)
                 print(f"🎭 Changement d'émotion : {new_emotion}")
 
-            target_key = config.ETAT["target_emotion"]
+            target_key = etat["target_emotion"]
         else:
             target_key = current_emotion
 
         target_data = EMOTIONS.get(target_key, EMOTIONS["joyeux"])
-        gamme = target_data["gamme"]
 
         # Skip MIDI pour audio loop
-        if config.ETAT.get("collection") in ["elements", "saisons", "atmos"]:
-            wait(1.0)
-            return
+        if etat.get("collection") in ["elements", "saisons", "atmos"]:
+            self._orchestra = None
+            return tick_time + 1.0
 
-        bpm = config.ETAT.get("bpm", 120)
+        bpm = etat.get("bpm", 120)
         attente = 60.0 / bpm
         attente = self.humaniser(attente, 0.05)
 
         # ── AI Conductor update ──
-        if config.ETAT.get("mode_auto", False):
+        if etat.get("mode_auto", False):
+            t0 = PROFILER.start()
             self.conductor.update(attente, target_data)
+            PROFILER.stop("conductor_update", t0)
+            etat = config.STATE.snapshot()  # Conductor drifted bpm/intensite/layers
+            actifs = etat.get("instruments_actifs", ())
+
+        self._orchestra = {
+            "actifs": frozenset(actifs),
+            "target_data": target_data,
+            "gamme": target_data["gamme"],
+            "attente": attente,
+            "intensite": etat.get("intensite", 50),
+        }
+
+        # Une voix par instrument actif (les voix retirées s'arrêtent d'elles-mêmes),
+        # son canal MIDI lié à l'activation
+        self._pin_instruments(actifs)
+        for inst_name in actifs:
+            if inst_name not in self._voice_names and self._instrument(inst_name) is not None:
+                self._voice_names.add(inst_name)
+                heapq.heappush(self._voices, (tick_time, next(self._voice_seq), inst_name))
+
+        return tick_time + attente
+
+    def _voice_step(self, inst_name, current_time):
+        """
+        Réveil de la voix `inst_name` à `current_time` : joue (ou non) une
+        note puis retourne la date exacte du prochain réveil — fin du
+        cooldown, ou get_legato_wait pour un instrument tenu en phrase.
+        None quand l'instrument n'est plus actif (la voix s'arrête).
+        """
+        orch = self._orchestra
+        if orch is None or inst_name not in orch["actifs"]:
+            return None
 
-        intensite = config.ETAT.get("intensite", 50)
-        current_time = time.time()
-
-        for inst_name in list(actifs):
-            if inst_name not in self.instruments:
-                continue
-            if inst_name in target_data.get("excluded", []):
-                continue
-
-            inst = self.instruments[inst_name]
-
-            # ── PHRASING STATE LOGIC ──
-            # Sustained instruments: check if we should start/continue a phrase
-            is_sustained = inst_name in SUSTAINED_INSTRUMENTS
-            is_plucked = inst_name in PLUCKED_INSTRUMENTS and inst_name not in SUSTAINED_INSTRUMENTS
-            is_percussive = inst_name in PERCUSSIVE_INSTRUMENTS and inst_name not in PLUCKED_INSTRUMENTS
-
-            in_phrase = self.conductor.is_in_phrase(inst_name)
-
-            if is_sustained and not in_phrase:
-                # Not in a phrase: should we start one?
-                # CONTINUUM RULE: should_start_phrase is almost always True for continuum instruments
-                if self.conductor.should_start_phrase(inst_name):
-                    self.conductor.begin_phrase(inst_name)
-                    in_phrase = True
-                else:
-                    # Still breathing or random pause
-                    continue
-            elif not is_sustained:
-                # Non-sustained: use probability-based play logic
-                if not self.conductor.should_play(inst_name, target_data):
-                    continue
-
-            # ── COOLDOWN CHECK ──
-            last_end = config.COOLDOWNS.get(inst_name, 0)
-            if is_sustained and in_phrase:
-                # Legato: allow heavy overlap (next note starts before prev ends)
-                # Only skip if we're very early in the current note
-                if current_time < last_end - 1.0:
-                    continue  # Still too early, wait for overlap window
-            elif not is_sustained:
-                if current_time < last_end:
-                    continue  # Instrument busy
-
-            # ── PITCH (Voice Leading via Conductor) ──
-            if inst_name == "batterie":
-                pitch = random.choice([35, 38, 42, 46, 49])
-            else:
-                pitch = self.conductor.voice_lead(inst_name, gamme)
-
-            # ── DURATION (Conductor-driven) ──
-            # PASSING LOOP_WAIT (attente) IS CRITICAL FOR CONTINUUM RULE
-            sound_duration = self.conductor.suggest_duration(inst_name, attente, loop_wait=attente)
-
-            # ── COOLDOWN UPDATE ──
-            if is_sustained and in_phrase:
-                # Legato overlap: next note available at 60-90% of duration
-                legato_wait = self.conductor.get_legato_wait(inst_name, sound_duration)
-                config.COOLDOWNS[inst_name] = current_time + legato_wait
-            elif inst_name in PLUCKED_INSTRUMENTS:
-                config.COOLDOWNS[inst_name] = current_time + sound_duration * 0.9
-            else:
-                config.COOLDOWNS[inst_name] = current_time + sound_duration
-
-            # ── ANTI-MUD (don't repeat ringing pitch) ──
-            active_notes = config.ACTIVE_NOTES.get(inst_name, {})
-            if pitch in active_notes and active_notes[pitch] > current_time:
-                # Allow repeat for percussive sometimes
-                if not is_percussive and random.random() < 0.7:
-                    continue
-            active_notes[pitch] = current_time + sound_duration
-            config.ACTIVE_NOTES[inst_name] = {k: v for k, v in active_notes.items() if v > current_time}
-
-            # ── VOLUME ──
-            vol = 0.15 + (intensite / 250.0)
-            vol = self.conductor.humanize_velocity(vol, 0.06)
-            vol = min(1.0, max(0.05, vol))
-
-            # ── SMART ENVELOPE (per instrument family) ──
-            final_vol = self.conductor.get_smart_envelope(inst_name, vol, sound_duration)
-
-            # ── PLAY NOTE ──
-            try:
-                inst.play_note(pitch, final_vol, sound_duration, blocking=False)
-                # Count note for phrasing logic
-                state = self.conductor.get_phrase_state(inst_name)
-                state["notes_played"] += 1
-            except Exception:
-                pass
-
-            # End phrase if time is up
-            self.conductor.end_phrase_if_done(inst_name)
+        target_data = orch["target_data"]
+        attente = orch["attente"]
+        next_beat = current_time + attente
+        if inst_name in target_data.get("excluded", []):
+            return next_beat
 
-        wait(attente)
+        inst = self._instrument(inst_name)  # Re-lié si son canal a été repris
+        if inst is None:
+            return next_beat
+
+        # ── PHRASING STATE LOGIC ──
+        is_sustained = inst_name in SUSTAINED_INSTRUMENTS
+        is_percussive = inst_name in PERCUSSIVE_INSTRUMENTS and inst_name not in PLUCKED_INSTRUMENTS
+
+        t0 = PROFILER.start()
+        play, in_phrase = self._phrase_gate(inst_name, is_sustained, target_data)
+        PROFILER.stop("phrase_logic", t0)
+        if not play:
+            return next_beat
+
+        # ── PITCH (Voice Leading via Conductor) ──
+        t0 = PROFILER.start()
+        if inst_name == "batterie":
+            pitch = random.choice([35, 38, 42, 46, 49])
+        else:
+            pitch = self.conductor.voice_lead(inst_name, orch["gamme"])
+        PROFILER.stop("voice_lead", t0)
+
+        # ── DURATION (Conductor-driven) ──
+        # PASSING LOOP_WAIT (attente) IS CRITICAL FOR CONTINUUM RULE
+        t0 = PROFILER.start()
+        sound_duration = self.conductor.suggest_duration(inst_name, attente, loop_wait=attente)
+        sound_duration = self.conductor.envelope_length(sound_duration)  # Length of the shared envelope
+        PROFILER.stop("suggest_duration", t0)
+
+        # ── COOLDOWN = prochain réveil de la voix ──
+        if is_sustained and in_phrase:
+            # Legato overlap: next note available at 60-90% of duration
+            wake = current_time + self.conductor.get_legato_wait(inst_name, sound_duration)
+        elif inst_name in PLUCKED_INSTRUMENTS:
+            wake = current_time + sound_duration * 0.9
+        else:
+            wake = current_time + sound_duration
+        config.COOLDOWNS[inst_name] = wake
+
+        # ── ANTI-MUD (don't repeat ringing pitch) ──
+        active_notes = config.ACTIVE_NOTES.get(inst_name, {})
+        if pitch in active_notes and active_notes[pitch] > current_time:
+            # Allow repeat for percussive sometimes
+            if not is_percussive and random.random() < 0.7:
+                return wake
+        active_notes[pitch] = current_time + sound_duration
+        config.ACTIVE_NOTES[inst_name] = {k: v for k, v in active_notes.items() if v > current_time}
+
+        # ── VOLUME ──
+        vol = 0.15 + (orch["intensite"] / 250.0)
+        vol = self.conductor.humanize_velocity(vol, 0.06)
+        vol = min(1.0, max(0.05, vol))
+
+        # ── SMART ENVELOPE (per instrument family) ──
+        t0 = PROFILER.start()
+        final_vol = self.conductor.get_smart_envelope(inst_name, vol, sound_duration)
+        PROFILER.stop("envelope", t0)
+
+        # ── PLAY NOTE (at wake time, from the scheduler) ──
+        self.scheduler.schedule(current_time, inst, pitch, final_vol, sound_duration, inst_name)
+        self._hold_part(inst_name, current_time, current_time + sound_duration)
+        # Count note for phrasing logic
+        state = self.conductor.get_phrase_state(inst_name)
+        state["notes_played"] += 1
+
+        # End phrase if time is up
+        self.conductor.end_phrase_if_done(inst_name)
+
+        return wake
+
+    def _phrase_gate(self, inst_name, is_sustained, target_data):
+        """Phrasé : (jouer ce réveil ?, dans une phrase ?)."""
+        in_phrase = self.conductor.is_in_phrase(inst_name)
+
+        if is_sustained and not in_phrase:
+            # Not in a phrase: should we start one?
+            # CONTINUUM RULE: should_start_phrase is almost always True for continuum instruments
+            if self.conductor.should_start_phrase(inst_name):
+                self.conductor.begin_phrase(inst_name)
+                return True, True
+            # Still breathing or random pause
+            return False, False
+        if not is_sustained:
+            # Non-sustained: use probability-based play logic
+            return self.conductor.should_play(inst_name, target_data), in_phrase
+        return True, in_phrase
 
     def _legacy_note_select(self, gamme, target_data):
         """Original random walk note selection (non-conductor mode)."""
@@ -585,8 +789,7 @@ class QuoniamAudioEngine:
         if random.random() * 100 < chaos:
             saut = random.randint(2, 4)
         try:
-            curr = min(gamme, key=lambda x: abs(x - self.note_courante))
-            curr_idx = gamme.index(curr)
+            curr_idx = get_quantizer(gamme).index_near(self.note_courante)
             new_idx = max(0, min(curr_idx + (direction * saut), len(gamme) - 1))
             note_brute = gamme[new_idx]
         except:
@@ -0,0 +1,239 @@
+# benchmark.py - BANC D'ESSAI DU GÉNÉRATEUR v1.20
+"""
+Mesure le coût de la logique de composition, sans matériel audio :
+les parts SCAMP sont remplacées par les parts d'enregistrement du rendu
+offline et le temps est simulé (aucune attente réelle).
+
+Mesures : notes/s, latence par itération (p50/p95/p99/max) et mémoire
+allouée par itération (pic tracemalloc), pour voice_lead,
+get_smart_envelope, suggest_duration, la boucle fluide et la boucle
+orchestre à 1, 6, 16 et 40 instruments actifs.
+
+Usage :
+    python benchmark.py --output bench.json
+    python benchmark.py --compare bench_v1.19.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import config
+from ai_conductor import AIConductor
+from clock import SimulatedClock
+from offline_render import OfflineEngine, configure, isolated_state
+
+ORCHESTRA_SIZES = (1, 6, 16, 40)
+ALLOC_SAMPLES = 200  # tracemalloc is slow: allocation pass uses a subset
+
+
+# ═══════════════════════════════════════════════════════════
+#  MEASUREMENT
+# ═══════════════════════════════════════════════════════════
+
+def _percentile(sorted_values: list[int], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def measure(step, iterations: int, warmup: int = 50, count_notes=None) -> dict:
+    """
+    Time `step()` per call. `count_notes()` (optional) returns the running
+    number of notes emitted, used for the notes/s figure.
+    """
+    for _ in range(warmup):
+        step()
+
+    notes_before = count_notes() if count_notes else 0
+    samples: list[int] = []
+    perf = time.perf_counter_ns
+    total_start = perf()
+    for _ in range(iterations):
+        t0 = perf()
+        step()
+        samples.append(perf() - t0)
+    total_ns = perf() - total_start
+    notes = (count_notes() - notes_before) if count_notes else 0
+
+    # Allocation pass: peak traced bytes within a single call
+    peaks: list[int] = []
+    tracemalloc.start()
+    try:
+        for _ in range(min(ALLOC_SAMPLES, iterations)):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            step()
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+
+    samples.sort()
+    seconds = total_ns / 1e9
+    result = {
+        "iterations": iterations,
+        "calls_per_sec": iterations / seconds if seconds > 0 else 0.0,
+        "latency_us": {
+            "mean": statistics.fmean(samples) / 1000.0,
+            "p50": _percentile(samples, 0.50) / 1000.0,
+            "p95": _percentile(samples, 0.95) / 1000.0,
+            "p99": _percentile(samples, 0.99) / 1000.0,
+            "max": samples[-1] / 1000.0,
+        },
+        "alloc_bytes": {
+            "mean": statistics.fmean(peaks) if peaks else 0.0,
+            "max": max(peaks) if peaks else 0,
+        },
+    }
+    if count_notes:
+        result["notes"] = notes
+        result["notes_per_sec"] = notes / seconds if seconds > 0 else 0.0
+    return result
+
+
+# ═══════════════════════════════════════════════════════════
+#  BENCHMARKS
+# ═══════════════════════════════════════════════════════════
+
+def _make_engine() -> OfflineEngine:
+    engine = OfflineEngine(SimulatedClock())
+    engine.is_running = True
+    return engine
+
+
+def _note_counter(engine: OfflineEngine):
+    # Parts are created lazily: walk the cache at each call
+    return lambda: sum(len(p.events) for p in engine.parts_cache.values())
+
+
+def bench_voice_lead(iterations: int) -> dict:
+    conductor = AIConductor(clock=SimulatedClock())
+    scale = config.EMOTIONS["joyeux"]["gamme"]
+    names = ["violon", "violoncelle", "flute", "piano", "contrebasse", "harpe"]
+    i = [0]
+
+    def step():
+        conductor.tension = (i[0] % 10) / 10.0
+        conductor.voice_lead(names[i[0] % len(names)], scale)
+        i[0] += 1
+    return measure(step, iterations)
+
+
+def bench_smart_envelope(iterations: int) -> dict:
+    conductor = AIConductor(clock=SimulatedClock())
+    names = ["violon", "piano", "harpe", "orgue", "timbales", "eau"]
+    i = [0]
+
+    def step():
+        name = names[i[0] % len(names)]
+        conductor.get_smart_envelope(name, 0.4 + (i[0] % 5) * 0.1, 0.5 + (i[0] % 16) * 0.5)
+        i[0] += 1
+    return measure(step, iterations)
+
+
+def bench_suggest_duration(iterations: int) -> dict:
+    conductor = AIConductor(clock=SimulatedClock())
+    names = ["violon", "piano", "harpe", "batterie", "xylophone", "eau"]
+    i = [0]
+
+    def step():
+        conductor.suggest_duration(names[i[0] % len(names)], 0.5, loop_wait=0.5)
+        i[0] += 1
+    return measure(step, iterations)
+
+
+def bench_fluid_loop(iterations: int, preset: str = "choir") -> dict:
+    with isolated_state():
+        configure(preset=preset, intensite=70)
+        engine = _make_engine()
+        return measure(engine._melodie_step, iterations, count_notes=_note_counter(engine))
+
+
+def bench_orchestra_loop(iterations: int, size: int) -> dict:
+    with isolated_state():
+        engine = _make_engine()
+        # Orchestra instruments first, then preset voices to reach large sizes
+        orchestra = [n for n in AIConductor.TESSITURA if n in engine.instrument_presets]
+        extra = [n for n in engine.instrument_presets if n not in orchestra]
+        actifs = (orchestra + extra)[:size]
+        configure(instruments=actifs, emotion="joyeux", intensite=70, auto=False)
+        result = measure(engine._play_orchestra_mode, iterations,
+                         count_notes=_note_counter(engine))
+        result["instruments"] = len(actifs)
+        return result
+
+
+def run_all(iterations: int, seed: int) -> dict:
+    random.seed(seed)
+    results = {
+        "voice_lead": bench_voice_lead(iterations * 10),
+        "get_smart_envelope": bench_smart_envelope(iterations * 10),
+        "suggest_duration": bench_suggest_duration(iterations * 10),
+        "fluid_loop": bench_fluid_loop(iterations),
+    }
+    for size in ORCHESTRA_SIZES:
+        results[f"orchestra_loop_{size}"] = bench_orchestra_loop(iterations, size)
+    return {
+        "meta": {
+            "version": config.TRANSLATIONS["EN"]["version_tag"],
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "iterations": iterations,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+# ═══════════════════════════════════════════════════════════
+#  REPORTING
+# ═══════════════════════════════════════════════════════════
+
+def print_report(report: dict, baseline: dict | None = None) -> None:
+    base = (baseline or {}).get("results", {})
+    print(f"{'BENCH':<22} | {'calls/s':>11} | {'notes/s':>10} | {'p50 us':>8} | "
+          f"{'p95 us':>8} | {'p99 us':>8} | {'max us':>9} | {'alloc B':>8} | {'Δ p95':>7}")
+    print("-" * 112)
+    for name, r in report["results"].items():
+        lat = r["latency_us"]
+        notes = f"{r['notes_per_sec']:>10.0f}" if "notes_per_sec" in r else f"{'-':>10}"
+        delta = ""
+        if name in base and base[name]["latency_us"]["p95"] > 0:
+            change = lat["p95"] / base[name]["latency_us"]["p95"] - 1.0
+            delta = f"{change * 100:+.0f}%"
+        print(f"{name:<22} | {r['calls_per_sec']:>11.0f} | {notes} | {lat['p50']:>8.1f} | "
+              f"{lat['p95']:>8.1f} | {lat['p99']:>8.1f} | {lat['max']:>9.1f} | "
+              f"{r['alloc_bytes']['mean']:>8.0f} | {delta:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quoniam generator benchmarks")
+    parser.add_argument("--iterations", type=int, default=2000, help="Loop iterations per benchmark")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to compare p95 latency against")
+    args = parser.parse_args()
+
+    report = run_all(args.iterations, args.seed)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
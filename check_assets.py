@@ -1,4 +1,6 @@
+import argparse
 import os
+import time
 import config
 
 def check_audio_assets():
@@ -36,5 +38,57 @@ def check_audio_assets():
         print(f"\n⚠️  ACTION REQUIRED: Please copy your MP3 files into the '{sound_dir}' folder.")
         print("   Make sure filenames match the expected paths above!")
 
+def transcode_audio_assets(force=False):
+    """
+    v1.20: Convert every ambience to the player's raw PCM container (.qpcm,
+    next to the source): fixed rate/format, loop points in the header.
+    The player memory-maps these instead of decoding FLAC/WAV/MP3/AIFF.
+    """
+    import ambience  # numpy + a decoder (soundfile, or pygame as fallback)
+
+    print("\n--- QUONIAM AMBIENCE TRANSCODE ---")
+    fmt = (ambience.PCM_RATE, ambience.PCM_CHANNELS)
+    if ambience.soundfile is None:
+        if ambience.pygame is None:
+            print("❌ Needs 'soundfile' or 'pygame' to decode the sources.")
+            return
+        # The pygame decoder outputs the mixer format: make it the container format
+        ambience.pygame.mixer.init(frequency=ambience.PCM_RATE, size=-16, channels=ambience.PCM_CHANNELS)
+
+    print(f"Target: {ambience.PCM_RATE} Hz, {ambience.PCM_CHANNELS} ch, int16 ({ambience.PCM_EXTENSION})\n")
+    print(f"{'PRESET':<12} | {'STATUS':<10} | {'DETAILS'}")
+    print("-" * 60)
+
+    done = skipped = failed = 0
+    for preset, src in config.AUDIO_FILES.items():
+        if not os.path.exists(src):
+            continue
+        dst = ambience.pcm_path(src)
+        if not force and os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src):
+            print(f"{preset:<12} | ⏭️  UP TO DATE | {dst}")
+            skipped += 1
+            continue
+        try:
+            t0 = time.perf_counter()
+            samples = ambience.decode_file(src, fmt)
+            loop_start, loop_end = ambience.write_pcm(dst, samples)
+            seconds = len(samples) / ambience.PCM_RATE
+            print(f"{preset:<12} | ✅ WRITTEN  | {dst} ({seconds:.0f}s, loop {loop_start}-{loop_end}, "
+                  f"{time.perf_counter() - t0:.1f}s)")
+            done += 1
+        except Exception as e:
+            print(f"{preset:<12} | ❌ FAILED   | {src}: {e}")
+            failed += 1
+
+    print("-" * 60)
+    print(f"\n📊 TRANSCODE: {done} Written, {skipped} Up to date, {failed} Failed.")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check (and optionally transcode) Quoniam ambience assets")
+    parser.add_argument("--transcode", action="store_true", help="Write .qpcm files for fast memory-mapped loading")
+    parser.add_argument("--force", action="store_true", help="Re-transcode even if .qpcm files are up to date")
+    args = parser.parse_args()
+
     check_audio_assets()
+    if args.transcode:
+        transcode_audio_assets(force=args.force)
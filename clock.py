@@ -0,0 +1,94 @@
+# clock.py - HORLOGES INJECTABLES v1.20
+"""
+Sources de temps pour le moteur et le chef d'orchestre.
+Toute horloge expose now(), wait(), seconds() (durée en unités de now()
+convertie en secondes) et lag() (retard sur le temps réel) :
+- WallClock      : temps réel (time.monotonic + time.sleep)
+- ScampClock     : temps logique de la session SCAMP (suit l'horloge audio,
+                   même quand elle prend du retard sur le temps réel)
+- SimulatedClock : temps virtuel, wait() avance instantanément (rendu, tests)
+"""
+
+import time
+
+try:
+    from scamp import wait as scamp_wait
+except ImportError:
+    scamp_wait = None  # Graceful fallback
+
+
+class WallClock:
+    """Temps réel (monotone)."""
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    def wait(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def seconds(self, duration: float) -> float:
+        return duration
+
+    def lag(self) -> float:
+        return 0.0  # now() is real time: lateness shows up in now() itself
+
+
+class ScampClock:
+    """
+    Temps logique de la session SCAMP.
+
+    now() returns the session's beat position, i.e. the same unit as wait()
+    and play_note() lengths. Under load SCAMP's logical time keeps the
+    intended schedule, so cooldowns and phrases don't drift with it.
+    wait() must run inside the SCAMP clock context (session.fork()).
+    lag() compares the session's logical seconds (session.time()) with real
+    time; seconds() converts beat durations at the current tempo.
+    """
+
+    def __init__(self, session) -> None:
+        self.session = session
+        self._offset = None  # Smallest (real - logical) seen: the on-schedule baseline
+
+    def now(self) -> float:
+        return self.session.beat()
+
+    def wait(self, seconds: float) -> None:
+        scamp_wait(seconds)
+
+    def seconds(self, duration: float) -> float:
+        """A duration in beats, in seconds at the current tempo."""
+        return duration * self.session.beat_length
+
+    def lag(self) -> float:
+        """Seconds the logical time currently runs behind real time (0 when on schedule)."""
+        offset = time.monotonic() - self.session.time()
+        if self._offset is None or offset < self._offset:
+            self._offset = offset
+        return offset - self._offset
+
+
+class SimulatedClock:
+    """
+    Temps simulé : wait() avance le temps sans dormir.
+
+    With a `tempo`, now() counts beats like ScampClock (seconds() converts
+    at that tempo); the default of 60 makes one unit one second.
+    """
+
+    def __init__(self, start: float = 0.0, tempo: float = 60.0) -> None:
+        self.t = start
+        self.beat_length = 60.0 / tempo
+
+    def now(self) -> float:
+        return self.t
+
+    def wait(self, seconds: float) -> None:
+        if seconds > 0:
+            self.t += seconds
+
+    def seconds(self, duration: float) -> float:
+        return duration * self.beat_length
+
+    def lag(self) -> float:
+        return 0.0
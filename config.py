@@ -26,6 +26,21 @@ ETAT = {
     "timer_minutes": 0          # 0 = Disabled
 }
 
+# --- SHARED STATE (v1.20) ---
+# Versioned immutable snapshots (copy-on-write). ETAT stays a dict-like view:
+# hot loops read STATE.snapshot() once per iteration, multi-key and
+# read-modify-write updates go through STATE.set() / STATE.mutate().
+from state_store import StateStore
+
+STATE = StateStore(ETAT)
+ETAT = STATE.view()
+
+# Engine -> UI events (instruments / emotion / bpm), drained by the UI thread
+from event_bus import EventBus, bridge_state
+
+EVENTS = EventBus()
+bridge_state(STATE, EVENTS)
+
 # --- AUDIO ASSETS (v13.0) ---
 # Placeholder paths - User must add real files to 'assets/sounds/'
 AUDIO_FILES = {
@@ -51,6 +66,13 @@ AUDIO_FILES = {
     "indus": "assets/sounds/traffic.wav"
 }
 
+# Preset order of each collection (preset pills row): neighbours get prefetched
+AUDIO_COLLECTIONS = {
+    "elements": ("terre", "eau", "feu", "air", "espace"),
+    "saisons": ("hiver", "printemps", "ete", "automne", "vide"),
+    "atmos": ("zen", "cyber", "lofi", "jungle", "indus"),
+}
+
 # --- PERSISTENCE (v11.1) ---
 import json
 import os
@@ -136,6 +158,8 @@ SETTINGS_DEFAULTS = {
     "language": "EN",            # EN, FR, ES, AR
     "accent_color": "#00E5FF",   # Cyan default
     "export_folder": "./recordings",
+    "ambience_cache_mb": 256,    # Decoded ambience cache budget (LRU)
+    "debug_overlay": False,      # Note onset lag (p50/p95/p99/max) over the stage
 }
 
 SETTINGS = dict(SETTINGS_DEFAULTS)
@@ -171,7 +195,7 @@ TRANSLATIONS = {
         "visual_quality": "Visual Quality", "target_fps": "Target FPS",
         "low": "Low", "medium": "Medium", "high": "High", "unlimited": "Max",
         # Settings: App
-        "sec_app": "APP & LOCALIZATION", "language": "Language", "accent_color": "Accent Color",
+        "sec_app": "APP & LOCALIZATION", "language": "Language", "accent_color": "Accent Color", "debug_overlay": "Debug Overlay",
         # Settings: Data
         "sec_data": "DATA", "export_folder": "Export Folder",
         # Advanced Controls
@@ -236,7 +260,7 @@ TRANSLATIONS = {
         "sec_visuals": "VISUELS", "fullscreen": "Plein Ecran", "zen_intro": "Intro Zen",
         "visual_quality": "Qualite Visuelle", "target_fps": "FPS Cible",
         "low": "Bas", "medium": "Moyen", "high": "Haut", "unlimited": "Max",
-        "sec_app": "APP & LANGUE", "language": "Langue", "accent_color": "Couleur d'Accent",
+        "sec_app": "APP & LANGUE", "language": "Langue", "accent_color": "Couleur d'Accent", "debug_overlay": "Overlay de Debug",
         "sec_data": "DONNEES", "export_folder": "Dossier d'Export",
         "advanced_controls": "Controles Avances",
         "zen_auto": "MODE ZEN & AUTO", "auto_drift": "Derive Auto", "sleep_timer": "Minuterie",
@@ -292,7 +316,7 @@ TRANSLATIONS = {
         "sec_visuals": "VISUALES", "fullscreen": "Pantalla Completa", "zen_intro": "Intro Zen",
         "visual_quality": "Calidad Visual", "target_fps": "FPS Objetivo",
         "low": "Bajo", "medium": "Medio", "high": "Alto", "unlimited": "Max",
-        "sec_app": "APP & IDIOMA", "language": "Idioma", "accent_color": "Color de Acento",
+        "sec_app": "APP & IDIOMA", "language": "Idioma", "accent_color": "Color de Acento", "debug_overlay": "Overlay de Depuracion",
         "sec_data": "DATOS", "export_folder": "Carpeta de Exportacion",
         "advanced_controls": "Controles Avanzados",
         "zen_auto": "MODO ZEN & AUTO", "auto_drift": "Deriva Auto", "sleep_timer": "Temporizador",
@@ -348,7 +372,7 @@ TRANSLATIONS = {
         "sec_visuals": "ALMAR'IYYAT", "fullscreen": "Sha-sha Kamila", "zen_intro": "Muqaddima Zen",
         "visual_quality": "Jawdat Almar'iyyat", "target_fps": "FPS Alhadaf",
         "low": "Munkhafid", "medium": "Mutawassit", "high": "Ali", "unlimited": "Aqsa",
-        "sec_app": "ALTATBIQ & ALLUGHA", "language": "Allugha", "accent_color": "Lawn Alta'kid",
+        "sec_app": "ALTATBIQ & ALLUGHA", "language": "Allugha", "accent_color": "Lawn Alta'kid", "debug_overlay": "Tabaqat Altashkhis",
         "sec_data": "ALBYANAT", "export_folder": "Mujallad Altasdir",
         "advanced_controls": "Altahakkum Almutaqaddim",
         "zen_auto": "WADH ZEN & TALQA'I", "auto_drift": "Inhiraf Talqa'i", "sleep_timer": "Muaqqit Nawm",
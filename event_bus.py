@@ -0,0 +1,104 @@
+# event_bus.py - BUS D'ÉVÉNEMENTS MOTEUR → UI v1.20
+"""
+Publish/subscribe entre le moteur et l'interface.
+
+publish() peut être appelé depuis n'importe quel thread : les deltas sont
+fusionnés par sujet et livrés par lots quand le thread UI appelle
+dispatch(). Si le chef d'orchestre change le BPM cinquante fois entre
+deux frames, l'UI ne reçoit que la dernière valeur.
+"""
+
+import threading
+
+# ── Topics (payload keys) ──────────────────────────────────────
+INSTRUMENTS_CHANGED = "instruments"   # added: set, removed: set, actifs: tuple
+EMOTION_CHANGED = "emotion"           # emotion, target
+BPM_CHANGED = "bpm"                   # bpm
+
+_SET_KEYS = ("added", "removed")
+
+
+def _merge(pending: dict, delta: dict) -> None:
+    """Coalesce `delta` into `pending`: sets net out, other keys last-wins."""
+    added = delta.get("added", set())
+    removed = delta.get("removed", set())
+    if "added" in pending or "removed" in pending or added or removed:
+        pending["added"] = (pending.get("added", set()) - removed) | added
+        pending["removed"] = (pending.get("removed", set()) - added) | removed
+    for key, value in delta.items():
+        if key not in _SET_KEYS:
+            pending[key] = value
+
+
+class EventBus:
+    """Thread-safe coalescing event bus, drained by the UI thread."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._handlers: dict[str, list] = {}
+        self._pending: dict[str, dict] = {}
+
+    def subscribe(self, topic: str, handler):
+        """handler(delta) runs on the thread calling dispatch(). Returns an unsubscribe function."""
+        with self._lock:
+            self._handlers.setdefault(topic, []).append(handler)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                handlers = self._handlers.get(topic, [])
+                if handler in handlers:
+                    handlers.remove(handler)
+        return unsubscribe
+
+    def publish(self, topic: str, **delta) -> None:
+        for key in _SET_KEYS:
+            if key in delta:
+                delta[key] = set(delta[key])
+        with self._lock:
+            pending = self._pending.get(topic)
+            if pending is None:
+                self._pending[topic] = delta
+            else:
+                _merge(pending, delta)
+
+    def dispatch(self) -> int:
+        """Deliver every pending delta (one per topic). Returns the number of topics delivered."""
+        if not self._pending:
+            return 0  # Fast path: nothing published since last frame
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            handlers = {topic: list(self._handlers.get(topic, ())) for topic in batch}
+        for topic, delta in batch.items():
+            for handler in handlers[topic]:
+                try:
+                    handler(delta)
+                except Exception as e:
+                    print(f"⚠️ Event handler error ({topic}): {e}")
+        return len(batch)
+
+
+def bridge_state(store, bus: EventBus):
+    """
+    Publish engine-facing state changes (config.STATE) as bus events.
+    Returns the store unsubscribe function.
+    """
+    lock = threading.Lock()
+    last = {"version": store.version, "actifs": tuple(store.get("instruments_actifs", ()))}
+
+    def on_change(snap, changed) -> None:
+        with lock:
+            if snap.version <= last["version"]:
+                return  # A newer snapshot was already published by another writer
+            last["version"] = snap.version
+            if "instruments_actifs" in changed:
+                old, new = last["actifs"], snap.get("instruments_actifs", ())
+                last["actifs"] = new
+                added, removed = set(new) - set(old), set(old) - set(new)
+                if added or removed:
+                    bus.publish(INSTRUMENTS_CHANGED, added=added, removed=removed, actifs=new)
+            if "emotion" in changed or "target_emotion" in changed:
+                bus.publish(EMOTION_CHANGED, emotion=snap.get("emotion"), target=snap.get("target_emotion"))
+            if "bpm" in changed:
+                bus.publish(BPM_CHANGED, bpm=snap["bpm"])
+
+    return store.subscribe(on_change, keys=("instruments_actifs", "emotion", "target_emotion", "bpm"))
@@ -0,0 +1,137 @@
+# frame_pacer.py - CADENCE D'IMAGES & GOUVERNEUR DE QUALITÉ v1.20
+"""
+Cadence des boucles d'animation contre une échéance monotone (pas de
+dérive quand le travail d'une frame varie) et gouverneur de qualité :
+si les frames dépassent leur budget, la qualité visuelle effective
+descend (high → medium → low), puis remonte quand la marge revient.
+Le réglage utilisateur (config.SETTINGS["visual_quality"]) n'est jamais
+modifié : il reste le plafond.
+"""
+
+import threading
+import time
+
+import config
+
+QUALITY_LEVELS = ("low", "medium", "high")
+UNLIMITED_FPS_CAP = 240  # target_fps = 0 ("unlimited") still yields the CPU
+IDLE_PERIOD = 0.25       # Paused / minimized: only poll for wake-up
+THROTTLED_FPS = 8        # Background covered by an overlay, or silent
+SUBPIXEL_MOTION = 0.5    # px: below this a redraw is indistinguishable
+
+
+def frame_period() -> float:
+    fps = config.SETTINGS.get("target_fps", 30)
+    if not fps or fps <= 0:
+        fps = UNLIMITED_FPS_CAP
+    return 1.0 / min(fps, UNLIMITED_FPS_CAP)
+
+
+class QualityGovernor:
+    """
+    Tracks frame cost against the frame budget (exponential moving average
+    of cost / period) and caps the visual quality with hysteresis.
+    """
+
+    ALPHA = 0.1             # EMA smoothing
+    DOWNGRADE_LOAD = 0.9    # Sustained load above this: one level down
+    UPGRADE_LOAD = 0.45     # Sustained load below this: one level up
+    DOWNGRADE_FRAMES = 30   # ~1s at 30 FPS
+    UPGRADE_FRAMES = 150    # Recover slowly to avoid flapping
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.load = 0.0
+        self._cap = len(QUALITY_LEVELS) - 1
+        self._over = 0
+        self._under = 0
+
+    def record(self, cost: float, budget: float) -> None:
+        with self._lock:
+            self.load += ((cost / budget) - self.load) * self.ALPHA
+            if self.load > self.DOWNGRADE_LOAD:
+                self._over += 1
+                self._under = 0
+            elif self.load < self.UPGRADE_LOAD:
+                self._under += 1
+                self._over = 0
+            else:
+                self._over = self._under = 0
+
+            if self._over >= self.DOWNGRADE_FRAMES and self._cap > 0:
+                self._cap -= 1
+                self._over = 0
+                self.load = self.UPGRADE_LOAD  # Give the new level a fresh start
+                print(f"🎚️ Visual quality capped to {QUALITY_LEVELS[self._cap]} (frame budget exceeded)")
+            elif self._under >= self.UPGRADE_FRAMES and self._cap < len(QUALITY_LEVELS) - 1:
+                self._cap += 1
+                self._under = 0
+                print(f"🎚️ Visual quality cap raised to {QUALITY_LEVELS[self._cap]}")
+
+    def quality(self) -> str:
+        """Effective quality: the user's setting, lowered by the governor if needed."""
+        wanted = config.SETTINGS.get("visual_quality", "high")
+        level = QUALITY_LEVELS.index(wanted) if wanted in QUALITY_LEVELS else len(QUALITY_LEVELS) - 1
+        return QUALITY_LEVELS[min(level, self._cap)]
+
+    def reset(self) -> None:
+        with self._lock:
+            self.load = 0.0
+            self._cap = len(QUALITY_LEVELS) - 1
+            self._over = self._under = 0
+
+
+GOVERNOR = QualityGovernor()
+
+
+def visual_quality() -> str:
+    return GOVERNOR.quality()
+
+
+class FramePacer:
+    """
+    Deadline pacing for one animation loop:
+
+        pacer = FramePacer()
+        while True:
+            pacer.begin()
+            ...draw and update...
+            pacer.end()   # records the cost, sleeps until the next deadline
+
+    Deadlines advance by exactly one period, so a slow frame shortens the
+    next sleep instead of pushing every later frame back. When a loop falls
+    more than a frame behind it re-syncs rather than bursting to catch up.
+    """
+
+    def __init__(self, governor: QualityGovernor | None = GOVERNOR) -> None:
+        self.governor = governor
+        self._deadline: float | None = None
+        self._start = 0.0
+        self.last_cost = 0.0
+
+    def begin(self) -> None:
+        self._start = time.monotonic()
+
+    def end(self, period: float | None = None, record: bool = True) -> float:
+        """
+        `period` overrides the target frame period (idle/throttled loops);
+        `record=False` keeps cheap idle frames out of the quality governor.
+        """
+        now = time.monotonic()
+        if period is None:
+            period = frame_period()
+        self.last_cost = now - self._start
+        if record and self.governor is not None:
+            self.governor.record(self.last_cost, period)
+
+        if self._deadline is None or now - self._deadline > period:
+            self._deadline = now  # Fell behind (or first frame): re-sync
+        self._deadline += period
+        delay = self._deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return self.last_cost
+
+    def reset(self) -> None:
+        """Forget the deadline (after a pause) so the next frame isn't a catch-up."""
+        self._deadline = None
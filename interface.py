@@ -4,11 +4,16 @@ import threading
 import time
 from audio_engine import QuoniamAudioEngine
 import config
+import event_bus
+import frame_pacer
+import ambience
+import onset_probe
 import random
 import base64
 import assets_library as assets
 import os # v13.0 fix
 import math # v13.3 fix for visualizer
+import numpy as np # v1.20 particle arrays
 
 # Optional pygame import for ambient audio playback
 try:
@@ -232,8 +237,30 @@ def main(page: ft.Page):
         "_default":  (8,  ["circle", "petal"],           3, 6, 0.005, 1.0),
     }
 
+    # Local shape geometry, in units of shape size: u runs along the arm,
+    # v is perpendicular. Built once; each frame only rotates/scales/moves it.
+    KALEIDOSCOPE_GEOMETRY = {
+        "petal": [("move", ((0, 0),)),
+                  ("cubic", ((1.0, 0.8), (2.0, 0.24), (2.0, 0))),
+                  ("cubic", ((2.0, -0.24), (1.0, -0.8), (0, 0)))],
+        "teardrop": [("move", ((2.5, 0),)),
+                     ("quad", ((0, 0.6), (-0.3, 0))),
+                     ("quad", ((0, -0.6), (2.5, 0)))],
+        "diamond": [("move", ((1.5, 0),)),
+                    ("line", ((0, 0.6),)),
+                    ("line", ((-1.5, 0),)),
+                    ("line", ((0, -0.6),))],
+    }
+    PAINT_OPACITY_STEPS = 64  # Opacity buckets for shared Paint objects
+
     class KaleidoscopeEngine:
-        """Generates cv.Canvas shapes for a radially-symmetric kaleidoscope visualizer."""
+        """
+        Radially-symmetric kaleidoscope visualizer for a cv.Canvas.
+
+        Retained mode: shape objects are created once per theme/quality and
+        only moved and repainted each frame, so the canvas diff carries
+        coordinates instead of whole new shapes.
+        """
 
         def __init__(self):
             self.width = 1200
@@ -244,6 +271,7 @@ def main(page: ft.Page):
             self.layers = []
             self._last_theme = None
             self._last_preset = None
+            self._state_version = -1
             self._symmetry = 8
             self._shape_types = ["circle", "petal"]
             self._palette = KALEIDOSCOPE_COLORS["home"]
@@ -251,6 +279,15 @@ def main(page: ft.Page):
             self._focus_layers = 6
             self._rotation_speed = 0.005
             self._shape_scale = 1.0
+            # Retained mode: shapes survive across frames, only moved/repainted
+            self._retained = []
+            self._retained_key = None
+            self._layers_gen = 0
+            self._paints = {}
+            # Frame diffing: displacement (px) and repaints since the last push
+            self.motion_px = 0.0
+            self.dirty = True
+            self._prev_pose = {}
 
         def resize(self, width, height):
             self.width = max(width, 100)
@@ -260,8 +297,12 @@ def main(page: ft.Page):
             self._rebuild_layers()
 
         def _resolve_config(self):
-            coll = config.ETAT.get("collection")
-            preset = config.ETAT.get("preset")
+            etat = config.STATE.snapshot()
+            if etat.version == self._state_version:
+                return  # Nothing changed since the last frame
+            self._state_version = etat.version
+            coll = etat.get("collection")
+            preset = etat.get("preset")
             theme = coll if coll in ("elements", "saisons", "atmos", "instruments") else "home"
 
             if theme == self._last_theme and preset == self._last_preset:
@@ -287,6 +328,7 @@ def main(page: ft.Page):
 
         def _rebuild_layers(self):
             max_layers = self._focus_layers
+            self._layers_gen += 1  # Invalidates the retained shapes
             self.layers = []
             max_radius = min(self.width, self.height) * 0.42
             for i in range(max_layers):
@@ -300,140 +342,99 @@ def main(page: ft.Page):
                     "phase_offset": i * 0.4,
                 })
 
-        def _make_paint(self, color, opacity, style=None, stroke_width=None):
-            if style is None:
-                style = ft.PaintingStyle.FILL
-            p = ft.Paint(
-                color=ft.Colors.with_opacity(min(1.0, max(0.02, opacity)), color),
-                style=style,
-                anti_alias=True,
-            )
-            if stroke_width is not None:
-                p.stroke_width = stroke_width
+        # --- Paint cache (shared, immutable once built) ---
+        def _paint(self, color, opacity, stroke_width=None):
+            """
+            Paint for (color, opacity bucket, stroke width). Reusing the same
+            object frame to frame lets the canvas diff skip the paint entirely.
+            """
+            opacity = min(1.0, max(0.02, opacity))
+            key = (color, round(opacity * PAINT_OPACITY_STEPS), None if stroke_width is None else round(stroke_width * 2))
+            p = self._paints.get(key)
+            if p is None:
+                if len(self._paints) >= 512:
+                    self._paints.clear()
+                p = ft.Paint(
+                    color=ft.Colors.with_opacity(key[1] / PAINT_OPACITY_STEPS, color),
+                    style=ft.PaintingStyle.FILL if stroke_width is None else ft.PaintingStyle.STROKE,
+                    anti_alias=True,
+                )
+                if stroke_width is not None:
+                    p.stroke_width = key[2] / 2.0
+                self._paints[key] = p
             return p
 
-        # --- Shape generators ---
-        def _shape_circle(self, cx, cy, r, color, opacity):
-            return cv.Circle(cx, cy, max(1, r), paint=self._make_paint(color, opacity))
-
-        def _shape_petal(self, cx, cy, size, angle, color, opacity):
-            s = max(size, 2)
-            cos_a, sin_a = math.cos(angle), math.sin(angle)
-            tip_x = cx + cos_a * s * 2
-            tip_y = cy + sin_a * s * 2
-            perp_cos = math.cos(angle + math.pi / 2)
-            perp_sin = math.sin(angle + math.pi / 2)
-            cp_dist = s * 0.8
-            mid_dist = s * 1.0
-            return cv.Path(
-                elements=[
-                    cv.Path.MoveTo(cx, cy),
-                    cv.Path.CubicTo(
-                        cx + cos_a * mid_dist + perp_cos * cp_dist,
-                        cy + sin_a * mid_dist + perp_sin * cp_dist,
-                        tip_x + perp_cos * cp_dist * 0.3,
-                        tip_y + perp_sin * cp_dist * 0.3,
-                        tip_x, tip_y
-                    ),
-                    cv.Path.CubicTo(
-                        tip_x - perp_cos * cp_dist * 0.3,
-                        tip_y - perp_sin * cp_dist * 0.3,
-                        cx + cos_a * mid_dist - perp_cos * cp_dist,
-                        cy + sin_a * mid_dist - perp_sin * cp_dist,
-                        cx, cy
-                    ),
-                    cv.Path.Close(),
-                ],
-                paint=self._make_paint(color, opacity)
-            )
-
-        def _shape_teardrop(self, cx, cy, size, angle, color, opacity):
-            s = max(size, 2)
-            cos_a, sin_a = math.cos(angle), math.sin(angle)
-            tip_x = cx + cos_a * s * 2.5
-            tip_y = cy + sin_a * s * 2.5
-            perp_cos = math.cos(angle + math.pi / 2)
-            perp_sin = math.sin(angle + math.pi / 2)
-            bulge = s * 0.6
-            base_x = cx - cos_a * s * 0.3
-            base_y = cy - sin_a * s * 0.3
-            return cv.Path(
-                elements=[
-                    cv.Path.MoveTo(tip_x, tip_y),
-                    cv.Path.QuadraticTo(
-                        cx + perp_cos * bulge, cy + perp_sin * bulge,
-                        base_x, base_y, 1.0
-                    ),
-                    cv.Path.QuadraticTo(
-                        cx - perp_cos * bulge, cy - perp_sin * bulge,
-                        tip_x, tip_y, 1.0
-                    ),
-                    cv.Path.Close(),
-                ],
-                paint=self._make_paint(color, opacity)
-            )
-
-        def _shape_diamond(self, cx, cy, size, angle, color, opacity):
-            s = max(size, 2)
-            cos_a, sin_a = math.cos(angle), math.sin(angle)
-            perp_cos = math.cos(angle + math.pi / 2)
-            perp_sin = math.sin(angle + math.pi / 2)
-            return cv.Path(
-                elements=[
-                    cv.Path.MoveTo(cx + cos_a * s * 1.5, cy + sin_a * s * 1.5),
-                    cv.Path.LineTo(cx + perp_cos * s * 0.6, cy + perp_sin * s * 0.6),
-                    cv.Path.LineTo(cx - cos_a * s * 1.5, cy - sin_a * s * 1.5),
-                    cv.Path.LineTo(cx - perp_cos * s * 0.6, cy - perp_sin * s * 0.6),
-                    cv.Path.Close(),
-                ],
-                paint=self._make_paint(color, opacity)
-            )
-
-        def _shape_arc(self, cx, cy, size, angle, color, opacity):
-            s = max(size * 1.5, 3)
-            return cv.Arc(
-                cx - s, cy - s, s * 2, s * 2,
-                start_angle=angle,
-                sweep_angle=math.pi / max(self._symmetry, 1),
-                use_center=False,
-                paint=self._make_paint(color, opacity, ft.PaintingStyle.STROKE,
-                                       stroke_width=max(1, size * 0.15))
-            )
-
-        def _shape_crescent(self, cx, cy, size, angle, color, opacity):
-            s = max(size, 2)
-            cos_a, sin_a = math.cos(angle), math.sin(angle)
-            offset_d = s * 0.3
-            return cv.Path(
-                elements=[
-                    cv.Path.MoveTo(cx, cy - s),
-                    cv.Path.ArcTo(cx, cy + s, s, 0, True, True),
-                    cv.Path.ArcTo(cx + cos_a * offset_d, cy - s + sin_a * offset_d,
-                                  s * 0.7, 0, False, False),
+        # --- Retained shapes: built once per theme/quality, moved every frame ---
+        def _new_shape(self, shape_type):
+            if shape_type == "circle":
+                return cv.Circle(0, 0, 1)
+            if shape_type == "arc":
+                return cv.Arc(0, 0, 1, 1, start_angle=0,
+                              sweep_angle=math.pi / max(self._symmetry, 1), use_center=False)
+            if shape_type == "crescent":
+                return cv.Path(elements=[
+                    cv.Path.MoveTo(0, 0),
+                    cv.Path.ArcTo(0, 0, 1, 0, True, True),
+                    cv.Path.ArcTo(0, 0, 1, 0, False, False),
                     cv.Path.Close(),
-                ],
-                paint=self._make_paint(color, opacity)
-            )
+                ])
+            elements = []
+            for kind, _ in KALEIDOSCOPE_GEOMETRY[shape_type]:
+                if kind == "move":
+                    elements.append(cv.Path.MoveTo(0, 0))
+                elif kind == "line":
+                    elements.append(cv.Path.LineTo(0, 0))
+                elif kind == "cubic":
+                    elements.append(cv.Path.CubicTo(0, 0, 0, 0, 0, 0))
+                else:
+                    elements.append(cv.Path.QuadraticTo(0, 0, 0, 0, 1.0))
+            elements.append(cv.Path.Close())
+            return cv.Path(elements=elements)
 
-        def _make_shape(self, shape_type, cx, cy, radius, angle, color, opacity, scale):
-            size = radius * 0.18 * scale
-            # Low quality: replace complex path shapes with simple circles
-            quality = config.SETTINGS.get("visual_quality", "high")
-            if quality == "low" and shape_type not in ("circle", "diamond"):
-                shape_type = "circle"
+        def _ensure_retained(self, visible_count, quality):
+            key = (self._layers_gen, visible_count, quality, self._symmetry)
+            if key == self._retained_key:
+                return
+            self._retained_key = key
+            self._retained = []
+            self._prev_pose = {}
+            self.dirty = True
+            for li, layer in enumerate(self.layers[:visible_count]):
+                shape_type = layer["shape_type"]
+                # Low quality: replace complex path shapes with simple circles
+                if quality == "low" and shape_type not in ("circle", "diamond"):
+                    shape_type = "circle"
+                for _ in range(self._symmetry):
+                    self._retained.append((shape_type, self._new_shape(shape_type)))
+
+        def _place(self, shape_type, shape, cx, cy, s, angle):
+            """Move one retained shape: local geometry -> rotate, scale, translate."""
             if shape_type == "circle":
-                return self._shape_circle(cx, cy, size, color, opacity)
-            elif shape_type == "petal":
-                return self._shape_petal(cx, cy, size, angle, color, opacity)
-            elif shape_type == "teardrop":
-                return self._shape_teardrop(cx, cy, size, angle, color, opacity)
-            elif shape_type == "diamond":
-                return self._shape_diamond(cx, cy, size, angle, color, opacity)
-            elif shape_type == "arc":
-                return self._shape_arc(cx, cy, size, angle, color, opacity)
-            elif shape_type == "crescent":
-                return self._shape_crescent(cx, cy, size, angle, color, opacity)
-            return None
+                shape.x, shape.y, shape.radius = cx, cy, max(1, s)
+                return
+            if shape_type == "arc":
+                r = max(s * 1.5, 3)
+                shape.x, shape.y, shape.width, shape.height = cx - r, cy - r, r * 2, r * 2
+                shape.start_angle = angle
+                return
+            s = max(s, 2)
+            if shape_type == "crescent":
+                move, arc1, arc2, _ = shape.elements
+                move.x, move.y = cx, cy - s
+                arc1.x, arc1.y, arc1.radius = cx, cy + s, s
+                arc2.x = cx + math.cos(angle) * s * 0.3
+                arc2.y = cy - s + math.sin(angle) * s * 0.3
+                arc2.radius = s * 0.7
+                return
+            ca, sa = math.cos(angle) * s, math.sin(angle) * s
+            for el, (kind, pts) in zip(shape.elements, KALEIDOSCOPE_GEOMETRY[shape_type]):
+                xy = [(cx + u * ca - v * sa, cy + u * sa + v * ca) for u, v in pts]
+                if kind == "cubic":
+                    (el.cp1x, el.cp1y), (el.cp2x, el.cp2y), (el.x, el.y) = xy
+                elif kind == "quad":
+                    (el.cp1x, el.cp1y), (el.x, el.y) = xy
+                else:
+                    el.x, el.y = xy[0]
 
         def generate_frame(self, is_focus):
             self._resolve_config()
@@ -441,10 +442,11 @@ def main(page: ft.Page):
                 return []
 
             t = time.time()
-            bpm = config.ETAT.get("bpm", 120)
-            intensity = config.ETAT.get("intensite", 30)
-            vitesse = config.ETAT.get("vitesse", 50)
-            quality = config.SETTINGS.get("visual_quality", "high")
+            etat = config.STATE.snapshot()
+            bpm = etat.get("bpm", 120)
+            intensity = etat.get("intensite", 30)
+            vitesse = etat.get("vitesse", 50)
+            quality = frame_pacer.visual_quality()
 
             bpm_factor = bpm / 60.0
             breath = math.sin(t * bpm_factor * math.pi)
@@ -457,16 +459,17 @@ def main(page: ft.Page):
             # Quality: low reduces layers, high keeps all
             if quality == "low":
                 visible_count = max(2, visible_count // 2)
+            visible_count = min(visible_count, len(self.layers))
             base_opacity = 0.22 if is_focus else 0.10
             max_opacity = 0.42 if is_focus else 0.22
 
-            shapes = []
+            self._ensure_retained(visible_count, quality)
             arm_angle = 2 * math.pi / max(self._symmetry, 1)
+            slot = 0
+            frame_motion = 0.0
 
-            for li, layer in enumerate(self.layers):
-                if li >= visible_count:
-                    break
-
+            for li in range(visible_count):
+                layer = self.layers[li]
                 layer_speed = (0.3 + li * 0.15) * speed_mult
                 layer_angle = (self.global_angle * layer["rotation_dir"] * layer_speed
                                + layer["angle_offset"])
@@ -475,26 +478,45 @@ def main(page: ft.Page):
                 scale = (1.0 + abs(breath) * pulse_factor * intensity_mult) * self._shape_scale
 
                 radius = layer["radius"] * scale
+                size = radius * 0.18 * scale
                 color = self._palette[layer["color_idx"] % len(self._palette)]
 
                 layer_t = li / max(visible_count - 1, 1)
                 opacity = base_opacity + layer_t * (max_opacity - base_opacity)
                 opacity += abs(breath) * 0.08
-                opacity = min(1.0, max(0.02, opacity))
+
+                # Frame diffing: how far this layer's outer edge moved
+                prev = self._prev_pose.get(li)
+                if prev is not None:
+                    frame_motion = max(frame_motion,
+                                       abs(layer_angle - prev[0]) * (radius * 0.5 + size * 2.5)
+                                       + abs(radius - prev[1]) * 0.5 + abs(size - prev[2]) * 2.5)
+                self._prev_pose[li] = (layer_angle, radius, size)
+
+                shape_type = self._retained[slot][0]
+                if shape_type == "arc":
+                    paint = self._paint(color, opacity, stroke_width=max(1, size * 0.15))
+                else:
+                    paint = self._paint(color, opacity)
 
                 for arm in range(self._symmetry):
                     angle = layer_angle + arm * arm_angle
                     sx = self.cx + math.cos(angle) * radius * 0.5
                     sy = self.cy + math.sin(angle) * radius * 0.5
+                    shape_type, shape = self._retained[slot]
+                    self._place(shape_type, shape, sx, sy, size, angle)
+                    if shape.paint is not paint:
+                        shape.paint = paint
+                        self.dirty = True
+                    slot += 1
 
-                    shape = self._make_shape(
-                        layer["shape_type"], sx, sy, radius, angle,
-                        color, opacity, scale
-                    )
-                    if shape:
-                        shapes.append(shape)
+            self.motion_px += frame_motion
+            return [shape for _, shape in self._retained]
 
-            return shapes
+        def consume_changes(self):
+            """Called once the frame has been pushed: start accumulating again."""
+            self.motion_px = 0.0
+            self.dirty = False
 
     # ═══════════════════════════════════════════════════════════
     #  PARTICLE SYSTEM v1.20
@@ -505,123 +527,122 @@ def main(page: ft.Page):
         Ambient particle system synced with KaleidoscopeEngine.
         Particles drift upward with sinusoidal wobble, fade in/out,
         and use the current kaleidoscope palette colors.
+
+        Structure of arrays: one NumPy array per attribute over a fixed
+        pool, with a free list of slots. Ageing, culling, positions and
+        opacities are computed for all particles at once; each slot keeps
+        its cv shape, which is only moved and repainted (retained mode).
         """
 
+        CAPACITY = 512
+        # Shape kinds (index into SHAPES)
+        CIRCLE, DIAMOND, STAR, DOT = 0, 1, 2, 3
+        SHAPES = ("circle", "diamond", "star", "dot")
+        # Per-kind opacity response: min(cap, opacity * gain)
+        ALPHA_CAP = np.array([0.7, 0.65, 0.6, 0.85])
+        ALPHA_GAIN = np.array([0.6, 0.55, 0.5, 0.75])
+        # 4-pointed star: 8 vertices, alternating long/short radius
+        STAR_ANGLES = np.arange(8) * (math.pi / 4)
+        STAR_RADII = np.where(np.arange(8) % 2 == 0, 1.6, 0.5)
+
         def __init__(self, engine: KaleidoscopeEngine):
             self.engine = engine
-            self.particles: list[dict] = []
             self.max_particles = 22
             self.spawn_rate = 0.35  # seconds between spawns
             self._last_spawn = 0.0
-            self._shapes = ["circle", "diamond", "star", "dot"]
+            self._rng = np.random.default_rng()
+
+            n = self.CAPACITY
+            self.x0 = np.zeros(n)
+            self.y0 = np.zeros(n)
+            self.vx = np.zeros(n)
+            self.vy = np.zeros(n)
+            self.size = np.zeros(n)
+            self.born = np.zeros(n)
+            self.lifespan = np.ones(n)
+            self.wobble_freq = np.zeros(n)
+            self.wobble_amp = np.zeros(n)
+            self.phase = np.zeros(n)
+            self.rotation = np.zeros(n)
+            self.rot_speed = np.zeros(n)
+            self.kind = np.zeros(n, dtype=np.int8)
+            self.alive = np.zeros(n, dtype=bool)
+            self.colors = ["#ffffff"] * n    # Palette color per slot
+            self.shapes = [None] * n         # Retained cv shape per slot
+            self._free = list(range(n - 1, -1, -1))
+
+            # Frame diffing: max displacement since the last pushed frame
+            self.motion_px = 0.0
+            self.dirty = True
+            self._last_t = None
+            self._visible_key = b""
+
+        @property
+        def count(self) -> int:
+            return self.CAPACITY - len(self._free)
+
+        def _new_shape(self, kind):
+            if kind in (self.CIRCLE, self.DOT):
+                return cv.Circle(0, 0, 1)
+            vertices = 4 if kind == self.DIAMOND else 8
+            elements = [cv.Path.MoveTo(0, 0)]
+            elements += [cv.Path.LineTo(0, 0) for _ in range(vertices - 1)]
+            elements.append(cv.Path.Close())
+            return cv.Path(elements=elements)
 
-        def _spawn_particle(self, t: float) -> dict:
-            """Create a new particle with randomized properties."""
-            palette = self.engine._palette
-            color = random.choice(palette) if palette else "#ffffff"
+        def _spawn(self, t: float, k: int) -> None:
+            """Spawn up to k particles with randomized properties (vectorized draws)."""
+            k = min(k, len(self._free))
+            if k <= 0:
+                return
+            idx = np.array([self._free.pop() for _ in range(k)])
+            rng = self._rng
+            palette = self.engine._palette or ["#ffffff"]
             # Low quality: only simple shapes; high: all shapes
-            quality = config.SETTINGS.get("visual_quality", "high")
+            quality = frame_pacer.visual_quality()
             if quality == "low":
-                shape = random.choice(["circle", "dot"])
+                kinds = rng.choice([self.CIRCLE, self.DOT], size=k)
             else:
-                shape = random.choice(self._shapes)
-            size = random.uniform(2.0, 6.0)
-            lifespan = random.uniform(3.0, 5.5)
+                kinds = rng.integers(0, len(self.SHAPES), size=k)
 
             # Spawn zone: bottom 40% of canvas, spread horizontally
             w, h = self.engine.width, self.engine.height
-            x = random.uniform(w * 0.1, w * 0.9)
-            y = random.uniform(h * 0.55, h * 0.95)
-
-            return {
-                "x": x, "y": y,
-                "vx": random.uniform(-8, 8),       # horizontal drift speed
-                "vy": random.uniform(-25, -12),     # upward speed (negative = up)
-                "size": size,
-                "color": color,
-                "shape": shape,
-                "born": t,
-                "lifespan": lifespan,
-                "wobble_freq": random.uniform(1.5, 3.5),   # Hz
-                "wobble_amp": random.uniform(8, 25),        # px
-                "phase": random.uniform(0, 2 * math.pi),
-                "rotation": random.uniform(0, 2 * math.pi),
-                "rot_speed": random.uniform(-0.8, 0.8),
-            }
-
-        def _particle_opacity(self, age: float, lifespan: float) -> float:
-            """Fade in (15%) → full → fade out (25%)."""
-            if age < 0:
-                return 0.0
+            self.x0[idx] = rng.uniform(w * 0.1, w * 0.9, k)
+            self.y0[idx] = rng.uniform(h * 0.55, h * 0.95, k)
+            self.vx[idx] = rng.uniform(-8, 8, k)           # horizontal drift speed
+            self.vy[idx] = rng.uniform(-25, -12, k)        # upward speed (negative = up)
+            self.size[idx] = rng.uniform(2.0, 6.0, k)
+            self.born[idx] = t
+            self.lifespan[idx] = rng.uniform(3.0, 5.5, k)
+            self.wobble_freq[idx] = rng.uniform(1.5, 3.5, k)  # Hz
+            self.wobble_amp[idx] = rng.uniform(8, 25, k)      # px
+            self.phase[idx] = rng.uniform(0, 2 * math.pi, k)
+            self.rotation[idx] = rng.uniform(0, 2 * math.pi, k)
+            self.rot_speed[idx] = rng.uniform(-0.8, 0.8, k)
+            self.alive[idx] = True
+            self.dirty = True
+            for i, kind, c in zip(idx.tolist(), kinds.tolist(), rng.integers(0, len(palette), k).tolist()):
+                self.colors[i] = palette[c]
+                if self.shapes[i] is None or self.kind[i] != kind:
+                    self.shapes[i] = self._new_shape(kind)
+                self.kind[i] = kind
+
+        @staticmethod
+        def _opacity(age, lifespan):
+            """Fade in (15%) → full → fade out (25%), vectorized."""
             ratio = age / lifespan
-            if ratio < 0.15:
-                return ratio / 0.15  # Fade in
-            elif ratio > 0.75:
-                return max(0.0, (1.0 - ratio) / 0.25)  # Fade out
-            return 1.0
-
-        def _render_circle(self, x, y, size, color, opacity):
-            paint = ft.Paint(
-                color=ft.Colors.with_opacity(min(0.7, opacity * 0.6), color),
-                style=ft.PaintingStyle.FILL,
-                anti_alias=True,
-            )
-            return cv.Circle(x, y, max(1, size), paint=paint)
-
-        def _render_diamond(self, x, y, size, angle, color, opacity):
-            s = max(size, 1.5)
-            ca, sa = math.cos(angle), math.sin(angle)
-            pa, pb = math.cos(angle + math.pi / 2), math.sin(angle + math.pi / 2)
-            paint = ft.Paint(
-                color=ft.Colors.with_opacity(min(0.65, opacity * 0.55), color),
-                style=ft.PaintingStyle.FILL,
-                anti_alias=True,
-            )
-            return cv.Path(
-                elements=[
-                    cv.Path.MoveTo(x + ca * s * 1.8, y + sa * s * 1.8),
-                    cv.Path.LineTo(x + pa * s * 0.7, y + pb * s * 0.7),
-                    cv.Path.LineTo(x - ca * s * 1.8, y - sa * s * 1.8),
-                    cv.Path.LineTo(x - pa * s * 0.7, y - pb * s * 0.7),
-                    cv.Path.Close(),
-                ],
-                paint=paint,
-            )
-
-        def _render_star(self, x, y, size, angle, color, opacity):
-            """4-pointed star."""
-            s = max(size, 1.5)
-            paint = ft.Paint(
-                color=ft.Colors.with_opacity(min(0.6, opacity * 0.5), color),
-                style=ft.PaintingStyle.FILL,
-                anti_alias=True,
-            )
-            points = []
-            for i in range(8):
-                a = angle + i * (math.pi / 4)
-                r = s * 1.6 if i % 2 == 0 else s * 0.5
-                points.append((x + math.cos(a) * r, y + math.sin(a) * r))
-            elements = [cv.Path.MoveTo(points[0][0], points[0][1])]
-            for px, py in points[1:]:
-                elements.append(cv.Path.LineTo(px, py))
-            elements.append(cv.Path.Close())
-            return cv.Path(elements=elements, paint=paint)
-
-        def _render_dot(self, x, y, size, color, opacity):
-            """Tiny bright dot — like a distant sparkle."""
-            paint = ft.Paint(
-                color=ft.Colors.with_opacity(min(0.85, opacity * 0.75), color),
-                style=ft.PaintingStyle.FILL,
-                anti_alias=True,
-            )
-            return cv.Circle(x, y, max(0.8, size * 0.4), paint=paint)
+            fade_in = ratio / 0.15
+            fade_out = np.maximum(0.0, (1.0 - ratio) / 0.25)
+            out = np.where(ratio < 0.15, fade_in, np.where(ratio > 0.75, fade_out, 1.0))
+            return np.where(age < 0, 0.0, out)
 
         def generate_particles(self) -> list:
             """Update particles and return cv shapes."""
             t = time.time()
-            intensity = config.ETAT.get("intensite", 30)
-            bpm = config.ETAT.get("bpm", 120)
-            quality = config.SETTINGS.get("visual_quality", "high")
+            etat = config.STATE.snapshot()
+            intensity = etat.get("intensite", 30)
+            bpm = etat.get("bpm", 120)
+            quality = frame_pacer.visual_quality()
 
             # Adaptive max particles: more when intensity is high
             base_particles = int(15 + (intensity / 100.0) * 12)
@@ -631,56 +652,93 @@ def main(page: ft.Page):
                 self.max_particles = int(base_particles * 1.3)
             else:
                 self.max_particles = base_particles
+            self.max_particles = min(self.max_particles, self.CAPACITY)
 
             # Spawn new particles
-            if t - self._last_spawn > self.spawn_rate and len(self.particles) < self.max_particles:
-                self.particles.append(self._spawn_particle(t))
-                self._last_spawn = t
+            if t - self._last_spawn > self.spawn_rate and self.count < self.max_particles:
                 # Occasionally spawn 2 at once for variety
-                if random.random() < 0.3 and len(self.particles) < self.max_particles:
-                    self.particles.append(self._spawn_particle(t))
+                k = 2 if random.random() < 0.3 else 1
+                self._spawn(t, min(k, self.max_particles - self.count))
+                self._last_spawn = t
+
+            dt = 0.0 if self._last_t is None else t - self._last_t
+            self._last_t = t
+
+            idx = np.flatnonzero(self.alive)
+            if idx.size == 0:
+                return []
+
+            # Age and cull (dead slots go back to the free list)
+            age = t - self.born[idx]
+            dead = age > self.lifespan[idx]
+            if dead.any():
+                gone = idx[dead]
+                self.alive[gone] = False
+                self._free.extend(gone.tolist())
+                idx, age = idx[~dead], age[~dead]
+                self.dirty = True
+
+            opacity = self._opacity(age, self.lifespan[idx])
+            visible = opacity > 0.02
+            idx, age, opacity = idx[visible], age[visible], opacity[visible]
+            key = idx.tobytes()
+            if key != self._visible_key:
+                self._visible_key = key
+                self.dirty = True
+            if idx.size == 0:
+                return []
+
+            # Upper bound on how far any visible particle moved this frame
+            speed = np.abs(self.vx[idx]) + np.abs(self.vy[idx]) + self.wobble_amp[idx] * self.wobble_freq[idx]
+            self.motion_px += float(speed.max()) * dt
 
             # BPM-synced pulse: particles subtly breathe
             bpm_pulse = 0.5 + 0.5 * math.sin(t * (bpm / 60.0) * math.pi)
 
-            # Update and render
+            # Position update: drift + sinusoidal wobble
+            x = self.x0[idx] + self.vx[idx] * age + np.sin(age * self.wobble_freq[idx] + self.phase[idx]) * self.wobble_amp[idx]
+            y = self.y0[idx] + self.vy[idx] * age
+            # Size pulsation synced with BPM
+            size = self.size[idx] * (0.85 + bpm_pulse * 0.3)
+            angle = self.rotation[idx] + self.rot_speed[idx] * age
+            kind = self.kind[idx]
+            alpha = np.minimum(self.ALPHA_CAP[kind], opacity * self.ALPHA_GAIN[kind])
+
+            # Polygon vertices for diamonds and stars, all at once
+            s = np.maximum(size, 1.5)
+            ca, sa = np.cos(angle), np.sin(angle)
+            star_a = angle[:, None] + self.STAR_ANGLES
+            star_r = s[:, None] * self.STAR_RADII
+            star_x = x[:, None] + np.cos(star_a) * star_r
+            star_y = y[:, None] + np.sin(star_a) * star_r
+            # Diamond: tip, side, tail, side (u = 1.8 along, v = 0.7 across)
+            diam_x = x[:, None] + np.stack([ca * 1.8, -sa * 0.7, -ca * 1.8, sa * 0.7], axis=1) * s[:, None]
+            diam_y = y[:, None] + np.stack([sa * 1.8, ca * 0.7, -sa * 1.8, -ca * 0.7], axis=1) * s[:, None]
+
+            paint = self.engine._paint
             shapes = []
-            alive = []
-            for p in self.particles:
-                age = t - p["born"]
-                if age > p["lifespan"]:
-                    continue  # Dead particle
-
-                alive.append(p)
-                opacity = self._particle_opacity(age, p["lifespan"])
-                if opacity <= 0.02:
-                    continue
-
-                # Position update: drift + sinusoidal wobble
-                dt = age
-                wobble_x = math.sin(dt * p["wobble_freq"] + p["phase"]) * p["wobble_amp"]
-                x = p["x"] + p["vx"] * dt + wobble_x
-                y = p["y"] + p["vy"] * dt
-
-                # Size pulsation synced with BPM
-                size = p["size"] * (0.85 + bpm_pulse * 0.3)
-
-                angle = p["rotation"] + p["rot_speed"] * dt
-
-                # Render based on shape
-                shape_type = p["shape"]
-                if shape_type == "circle":
-                    shapes.append(self._render_circle(x, y, size, p["color"], opacity))
-                elif shape_type == "diamond":
-                    shapes.append(self._render_diamond(x, y, size, angle, p["color"], opacity))
-                elif shape_type == "star":
-                    shapes.append(self._render_star(x, y, size, angle, p["color"], opacity))
-                elif shape_type == "dot":
-                    shapes.append(self._render_dot(x, y, size, p["color"], opacity))
-
-            self.particles = alive
+            rows = zip(idx.tolist(), kind.tolist(), x.tolist(), y.tolist(), size.tolist(), alpha.tolist())
+            for row, (i, k, px, py, sz, a) in enumerate(rows):
+                shape = self.shapes[i]
+                if k == self.CIRCLE:
+                    shape.x, shape.y, shape.radius = px, py, max(1, sz)
+                elif k == self.DOT:
+                    shape.x, shape.y, shape.radius = px, py, max(0.8, sz * 0.4)
+                else:
+                    xs, ys = (diam_x, diam_y) if k == self.DIAMOND else (star_x, star_y)
+                    for el, vx, vy in zip(shape.elements, xs[row].tolist(), ys[row].tolist()):
+                        el.x, el.y = vx, vy
+                p = paint(self.colors[i], a)
+                if shape.paint is not p:
+                    shape.paint = p
+                    self.dirty = True
+                shapes.append(shape)
             return shapes
 
+        def consume_changes(self):
+            self.motion_px = 0.0
+            self.dirty = False
+
     # --- KALEIDOSCOPE CANVAS ---
     kaleidoscope_engine = KaleidoscopeEngine()
     particle_system = ParticleSystem(kaleidoscope_engine)
@@ -694,30 +752,51 @@ def main(page: ft.Page):
         on_resize=on_canvas_resize,
     )
 
-    def animer_fond():
-        while True:
-            try:
-                shapes = kaleidoscope_engine.generate_frame(focus_mode)
-                # Overlay particles on top of kaleidoscope
-                particles = particle_system.generate_particles()
-                kaleidoscope_canvas.shapes = shapes + particles
-                safe_update(kaleidoscope_canvas)
-            except Exception:
-                pass
-            fps = config.SETTINGS.get("target_fps", 30)
-            time.sleep(1.0 / max(fps, 1) if fps > 0 else 0.004)
-
-
+    def tick_fond() -> bool:
+        """
+        Kaleidoscope + particles for one frame. Returns False when nothing
+        moved by a visible amount since the last pushed frame: the canvas
+        is then left alone and boucle_rendu skips the push.
+        """
+        shapes = kaleidoscope_engine.generate_frame(focus_mode)
+        # Overlay particles on top of kaleidoscope
+        particles = particle_system.generate_particles()
+        changed = kaleidoscope_engine.dirty or particle_system.dirty
+        motion = kaleidoscope_engine.motion_px + particle_system.motion_px
+        if not changed and motion < frame_pacer.SUBPIXEL_MOTION:
+            return False
+        kaleidoscope_canvas.shapes = shapes + particles
+        kaleidoscope_engine.consume_changes()
+        particle_system.consume_changes()
+        return True
 
 
     # --- GLOBAL AUDIO PLAYER (v13.0 - Pygame Backend) ---
     # --- GLOBAL AUDIO PLAYER (v13.3 - Dual Channel Crossfade) ---
     class GlobalAudioPlayer:
+        """
+        v1.20: Public methods only post commands to the audio worker and
+        return at once; pygame and the mixer are only touched by the worker.
+        """
         def __init__(self):
+            self.current_src = None
+            self.active_channel = None # 'A' or 'B' or None (legacy Sound path)
+            self.is_muted = False
+            self.is_paused = False
+            self.volume = 0.4 
+            self.has_pygame = False
+            self.format = None
+            self.cache = None
+            self.ambience = None
+            self.worker = ambience.AudioWorker()
+            self.worker.post(self._init_audio)
+
+        def _init_audio(self):
             try:
                 if pygame is None:
                     raise ImportError("pygame not available")
-                pygame.mixer.init()  # type: ignore
+                # v1.20: Same format as the .qpcm assets, so they play without conversion
+                pygame.mixer.init(frequency=ambience.PCM_RATE, size=-16, channels=ambience.PCM_CHANNELS)  # type: ignore
                 pygame.mixer.set_num_channels(8)  # type: ignore # Ensure enough channels
                 self.mixer = pygame.mixer  # type: ignore
 
@@ -731,13 +810,49 @@ def main(page: ft.Page):
                 print(f"❌ Pygame Init Failed: {e}")
                 self.has_pygame = False
 
-            self.current_src = None
-            self.active_channel = None # 'A' or 'B' or None
-            self.is_muted = False
-            self.is_paused = False
-            self.volume = 0.4 
-            
+            # v1.20: streamed ambiences, mixed by one background thread onto channel 0
+            self.format = ambience.mixer_format() if self.has_pygame else None
+            if self.format is not None:
+                budget = int(config.SETTINGS.get("ambience_cache_mb", 256)) * 1024 * 1024
+                self.cache = ambience.DecodedCache(budget, self.format)
+                self.ambience = ambience.AmbienceMixer(self.chan_a, self.format, cache=self.cache)
+                self.ambience.set_master(0 if self.is_muted else self.volume, fade=0)
+                # Ambience level follows intensite (slider and auto-drift) at control rate
+                self.ambience.automation = ambience.follow_intensity
+
+        # ── Commands (any thread, never block) ─────────────────
+        # Keyed commands coalesce: a burst of slider moves applies only the last value
+
         def play_ambience(self, preset_key):
+            self.worker.post(self._play_ambience, preset_key, key="play")
+
+        def toggle_layer(self, preset_key, volume=0.6):
+            """v1.20: Add/remove an ambience on top of the current one (e.g. rain + fire)."""
+            self.worker.post(self._toggle_layer, preset_key, volume)
+
+        def toggle_mute(self):
+            self.is_muted = not self.is_muted
+            self.worker.post(self._apply_volume, key="volume")
+            return self.is_muted
+
+        def set_volume(self, vol_percent):
+            # vol_percent 0-100 map to 0.0-1.0
+            self.volume = val_map(vol_percent, 0, 100, 0, 1)
+            self.worker.post(self._apply_volume, key="volume")
+
+        def follow_intensity(self, intensite):
+            """Intensity slider -> volume, legacy path only (the ambience mixer follows intensite itself)."""
+            self.worker.post(self._follow_intensity, intensite, key="intensite")
+
+        def toggle_pause(self):
+            if pygame is None: return
+            self.is_paused = not self.is_paused
+            self.worker.post(self._apply_pause, self.is_paused, key="pause")
+            return self.is_paused
+
+        # ── Worker side ────────────────────────────────────────
+
+        def _play_ambience(self, preset_key):
             if not self.has_pygame: return
             
             # Resolve file path
@@ -751,6 +866,22 @@ def main(page: ft.Page):
             if src == self.current_src and not self.is_paused:
                 return # Already playing this track
 
+            if self.ambience is not None:
+                # v1.20: N-way crossfade — returns at once; decoding and fades run off the UI thread
+                try:
+                    if self.is_paused:
+                        self.ambience.resume()
+                    self.ambience.play(src)
+                    print(f"🔄 Crossfade -> {os.path.basename(src)} ({len(self.ambience.voices)} voices)")
+                    self.cache.pin(*self.ambience.layers())
+                    # Decode this file and its collection neighbours for the next switches
+                    self.cache.prefetch(ambience.prefetch_targets(preset_key))
+                    self.current_src = src
+                    self.is_paused = False
+                except Exception as e:
+                    print(f"⚠️ Error playing {src}: {e}")
+                return
+
             # Determine Channels for Crossfade
             # If nothing playing, start on A.
             # If A playing, start B and fade A.
@@ -782,37 +913,49 @@ def main(page: ft.Page):
                 
             except Exception as e:
                 print(f"⚠️ Error playing {src}: {e}")
+
+        def _toggle_layer(self, preset_key, volume):
+            if self.ambience is None: return
+            src = config.AUDIO_FILES.get(preset_key)
+            if not src or not os.path.exists(src) or src == self.current_src:
+                return
+            if src in self.ambience.layers():
+                self.ambience.stop(src)
+                print(f"➖ Ambience layer off: {preset_key}")
+            else:
+                self.ambience.play(src, volume=volume, layer=True)
+                print(f"➕ Ambience layer on: {preset_key}")
+            self.cache.pin(*self.ambience.layers())
                 
-        def toggle_mute(self):
-            self.is_muted = not self.is_muted
+        def _apply_volume(self):
+            # Reads the latest volume/mute state: coalesced bursts apply once
+            if not self.has_pygame: return
             target_vol = 0 if self.is_muted else self.volume
-            
-            if self.has_pygame:
+            if self.ambience is not None:
+                self.ambience.set_master(target_vol)  # Ramped by the mixer thread
+            else:
                 self.chan_a.set_volume(target_vol)
                 self.chan_b.set_volume(target_vol)
-            return self.is_muted
 
-        def set_volume(self, vol_percent):
-            # vol_percent 0-100 map to 0.0-1.0
-            self.volume = val_map(vol_percent, 0, 100, 0, 1)
-            if not self.has_pygame: return
-            
-            if not self.is_muted:
-                self.chan_a.set_volume(self.volume)
-                self.chan_b.set_volume(self.volume)
+        def _follow_intensity(self, intensite):
+            # Runs after _init_audio (same worker), so the mixer is known to exist or not
+            if self.ambience is not None: return
+            self.volume = val_map(intensite, 0, 100, 0, 1)
+            self._apply_volume()
 
-        def toggle_pause(self):
+        def _apply_pause(self, paused):
             if not self.has_pygame: return
-            
-            if self.is_paused:
-                self.chan_a.unpause()
-                self.chan_b.unpause()
-                self.is_paused = False
-            else:
+            if self.ambience is not None:
+                if paused:
+                    self.ambience.pause()
+                else:
+                    self.ambience.resume()
+            elif paused:
                 self.chan_a.pause()
                 self.chan_b.pause()
-                self.is_paused = True
-            return self.is_paused
+            else:
+                self.chan_a.unpause()
+                self.chan_b.unpause()
 
     # Val map helper
     def val_map(v, in_min, in_max, out_min, out_max):
@@ -915,12 +1058,45 @@ def main(page: ft.Page):
         ink=True,
     )
 
+    # v1.20: Debug overlay — note onset lag (audio thread starvation)
+    debug_text = ft.Text("", size=10, color="#ccffffff", font_family="Consolas")
+    debug_overlay = ft.Container(
+        content=debug_text,
+        top=12, left=12,
+        padding=ft.Padding(left=10, top=6, right=10, bottom=6),
+        border_radius=10,
+        bgcolor=ft.Colors.with_opacity(0.45, "black"),
+        visible=config.SETTINGS.get("debug_overlay", False),
+    )
+
+    debug_state = {"t": 0.0}
+
+    def tick_debug() -> bool:
+        """Refresh the onset-lag overlay (about once per second). True if it changed."""
+        visible = config.SETTINGS.get("debug_overlay", False)
+        if not visible:
+            if debug_overlay.visible:
+                debug_overlay.visible = False
+                return True
+            return False
+        now = time.monotonic()
+        if debug_overlay.visible and now - debug_state["t"] < 1.0:
+            return False
+        debug_state["t"] = now
+        lines = [f"ONSET LAG  {onset_probe.format_stats(onset_probe.PROBE.stats(onset_probe.ALL))}"]
+        for name, stats in onset_probe.PROBE.worst(3):
+            lines.append(f"{name[:10]:<10} {onset_probe.format_stats(stats)}")
+        debug_text.value = "\n".join(lines)
+        debug_overlay.visible = True
+        return True
+
     main_layout_stack = ft.Stack(
         [
             bg_gradient,
             kaleidoscope_canvas,   # v1.20 Canvas kaleidoscope + particles
             content_layer,
             focus_exit_hint,
+            debug_overlay,
         ],
         expand=True
     )
@@ -945,74 +1121,109 @@ def main(page: ft.Page):
         ], horizontal_alignment=ft.CrossAxisAlignment.CENTER, spacing=0)
 
     # --- BOUCLE D'ANIMATION ---
-    # --- BOUCLE D'ANIMATION ---
-    def animer_coeur():
-        angle = 0
+    coeur = {"angle": 0.0}
+
+    def tick_coeur(etat):
+        """Pulse, aura and spin of the central icon. Returns True if it must be pushed."""
+        # Check if attached to page (safe check)
+        if not container_icone.page or not etat["actif"]:
+            return False
+
+        bpm = etat.get("bpm", 60)
+        intensite = etat.get("intensite", 50)
+
+        # Unified Breathing Logic (Sine Wave)
+        # Smooth, continuous expansion/contraction linked to BPM
+        t = time.time()
+        cycle = math.sin(t * (bpm / 60.0) * math.pi) # -1 to 1
+
+        # Convert sine to 0-1 scale range
+        # Base scale 1.0, max scale depends on intensity
+        max_growth = 0.2 + (intensite / 200.0) # 0.2 to 0.7 extra
+        current_scale = 1.0 + (max_growth * abs(cycle))
+
+        container_icone.scale = current_scale
+
+        # Aura Pulse (Sync with cycle) — disabled on low quality
+        quality = frame_pacer.visual_quality()
+        if quality == "low":
+            glow_shadow.spread_radius = 0
+            glow_shadow.color = ft.Colors.with_opacity(0, "white")
+        else:
+            glow_shadow.spread_radius = 5 + (intensite/5) * abs(cycle)
+            glow_shadow.color = ft.Colors.with_opacity(0.3 + (abs(cycle)*0.3), "white")
+
+        # Spin for Space Themes (with counter-rotation for inner icon)
+        if etat.get("preset") in ["espace", "vide", "cyber", "indus"]:
+            coeur["angle"] += 1.0
+            icone_rotate.angle = coeur["angle"]
+            icon_counter_rotate.angle = -coeur["angle"]  # Counter-rotate inner icon
+        elif coeur["angle"] != 0:
+            # Reset rotation when leaving space themes
+            coeur["angle"] = 0
+            icone_rotate.angle = 0
+            icon_counter_rotate.angle = 0
+        return True
+
+    BASE_LAYERS = len(main_layout_stack.controls)  # Anything above is an overlay
+
+    def mode_rendu(etat) -> str:
+        """
+        "frozen": paused or minimized, nothing to draw (poll at IDLE_PERIOD).
+        "throttled": background hidden by an overlay, or silent (THROTTLED_FPS).
+        "live": full frame rate, canvas pushed only when it visibly changed.
+        """
+        if not etat["actif"] or getattr(page.window, "minimized", False):
+            return "frozen"
+        if len(main_layout_stack.controls) > BASE_LAYERS or etat.get("intensite", 0) <= 0:
+            return "throttled"
+        return "live"
+
+    def boucle_rendu():
+        """
+        Single render loop (v1.20): heart, kaleidoscope and particles are
+        computed in the same tick and pushed together, once per frame, under
+        a single _ui_lock acquisition. Frame cost feeds the quality governor.
+        Idle frames (no visible change, paused, covered) are not pushed.
+        """
+        pacer = frame_pacer.FramePacer()
         while True:
+            pacer.begin()
+            etat = config.STATE.snapshot()  # One consistent state per frame
+            mode = mode_rendu(etat)
+            a_pousser = []
             try:
-                # Check if attached to page (safe check)
-                if not container_icone.page:
-                    time.sleep(0.5)
-                    continue
-                    
-                if config.ETAT["actif"]:    
-                    bpm = config.ETAT.get("bpm", 60)
-                    intensite = config.ETAT.get("intensite", 50)
-                    
-                    # Unified Breathing Logic (Sine Wave)
-                    # Smooth, continuous expansion/contraction linked to BPM
-                    t = time.time()
-                    cycle = math.sin(t * (bpm / 60.0) * math.pi) # -1 to 1
-                    
-                    # Convert sine to 0-1 scale range
-                    # Base scale 1.0, max scale depends on intensity
-                    max_growth = 0.2 + (intensite / 200.0) # 0.2 to 0.7 extra
-                    current_scale = 1.0 + (max_growth * abs(cycle))
-                    
-                    container_icone.scale = current_scale
-
-                    # Aura Pulse (Sync with cycle) — disabled on low quality
-                    quality = config.SETTINGS.get("visual_quality", "high")
-                    if quality == "low":
-                        glow_shadow.spread_radius = 0
-                        glow_shadow.color = ft.Colors.with_opacity(0, "white")
-                    else:
-                        glow_shadow.spread_radius = 5 + (intensite/5) * abs(cycle)
-                        glow_shadow.color = ft.Colors.with_opacity(0.3 + (abs(cycle)*0.3), "white")
-
-                    # Spin for Space Themes (with counter-rotation for inner icon)
-                    if config.ETAT.get("preset") in ["espace", "vide", "cyber", "indus"]:
-                        angle += 1.0
-                        icone_rotate.angle = angle
-                        icon_counter_rotate.angle = -angle  # Counter-rotate inner icon
-                    else:
-                        # Reset rotation when leaving space themes
-                        if angle != 0:
-                            angle = 0
-                            icone_rotate.angle = 0
-                            icon_counter_rotate.angle = 0
-
-                    safe_update(container_icone)
-
-                    fps = config.SETTINGS.get("target_fps", 30)
-                    time.sleep(1.0 / max(fps, 1) if fps > 0 else 0.004)
-                else:
-                    time.sleep(1.0)
-            except Exception as e:
-                # Silently ignore page attachment errors during startup/shutdown
-                time.sleep(1.0)
-            
-            # v11.0: UI Sync for Auto-Drift (Check if instruments changed externally)
-            # This allows the background audio engine to add/remove instruments and reflected on UI
+                if tick_coeur(etat):
+                    a_pousser.append(container_icone)
+            except Exception:
+                pass  # Page attachment errors during startup/shutdown
+            if mode != "frozen":
+                try:
+                    if tick_fond():
+                        a_pousser.append(kaleidoscope_canvas)
+                except Exception:
+                    pass
             try:
-                if config.ETAT["mode_auto"] and config.ETAT["collection"] == "instruments":
-                     # Simple check: we could store a hash, but list length comparison + first item check is 'good enough' for now
-                     # Or just call a lightweight update?
-                     # Ideally we need a flag "ui_needs_update" in config
-                     if config.ETAT.get("ui_needs_update", False):
-                         update_ui()
-                         config.ETAT["ui_needs_update"] = False
-            except: pass
+                if tick_debug():
+                    a_pousser.append(debug_overlay)
+            except Exception:
+                pass
+            if a_pousser:
+                safe_update(*a_pousser)
+
+            # v1.20: Engine -> UI sync. Deltas published by the audio engine
+            # (instruments added/removed, bpm...) are coalesced and delivered here
+            try:
+                config.EVENTS.dispatch()
+            except Exception:
+                pass
+
+            if mode == "frozen":
+                pacer.end(frame_pacer.IDLE_PERIOD, record=False)
+            elif mode == "throttled":
+                pacer.end(1.0 / frame_pacer.THROTTLED_FPS, record=False)
+            else:
+                pacer.end(record=bool(a_pousser))
 
 
     # --- LOGIQUE UI ---
@@ -1051,64 +1262,81 @@ def main(page: ft.Page):
         
         # v10.5 & v11.0: Refresh Instrument Grid to show/hide excluded instruments
         if config.ETAT["collection"] == "instruments":
-             # OPTIMIZED REFRESH: Don't rebuild, just update styles
-             # We assume container_presets.content is the main Column
+             # OPTIMIZED REFRESH: Don't rebuild, just restyle buttons whose state changed
+             # (pushed by the page update below)
              try:
-                 main_col = container_presets.content
-                 if not main_col or not isinstance(main_col, ft.Column): return
-                 
-                 actifs = config.ETAT.get("instruments_actifs", [])
-                 
-                 # Recursive helper to find and update instrument buttons
-                 def update_recursive(controls):
-                     for c in controls:
-                         # Check if it's an instrument button (Container with data=code)
-                         if isinstance(c, ft.Container) and isinstance(c.data, str) and c.data in instruments_mapping:
-                             inst_code = c.data
-                             is_active = inst_code in actifs
-                             
-                             # Update Style
-                             c.bgcolor = ft.Colors.with_opacity(0.2, "#FFD700") if is_active else ft.Colors.TRANSPARENT
-                             c.border = ft.Border.all(1, "#FFD700") if is_active else ft.Border.all(1, ft.Colors.with_opacity(0.5, "#FFFFFF"))
-                             c.shadow = ft.BoxShadow(blur_radius=10, color="#FF9800" if is_active else ft.Colors.TRANSPARENT)
-                             # Update Icon Color (nested in Column -> Image)
-                             try:
-                                 # Content structure: Column -> [Image, Text]
-                                 if isinstance(c.content, ft.Column):
-                                     img = c.content.controls[0]
-                                     if isinstance(img, ft.Image):
-                                         img.color = "#FFD700" if is_active else "#FFFFFF"
-                             except: pass
-                             
-                             # c.update() # OPTIMIZATION: Don't update individual controls, let page.update() handle it at the end
-                             
-                         # Recurse if control has controls (Row, Column, etc)
-                         elif isinstance(c, (ft.Row, ft.Column)):
-                             update_recursive(c.controls)
-                         # Recurse if control is Container with content being a Row/Column
-                         elif isinstance(c, ft.Container) and isinstance(c.content, (ft.Row, ft.Column)):
-                             update_recursive(c.content.controls)
-                 
-                 # Need a reference list of valid instruments to check data against
-                 # We can reconstruct it or import it. For now, let's hardcode the keys or assume any short string data is one?
-                 # Better: re-use the mapping keys from get_asset logic if possible, or just checking if data is not None
-                 # Let's simple check if data is not None and matches our known keys
-                 instruments_mapping = [
-                     "violon", "alto", "violoncelle", "contrebasse", "guitare", "basse", "harpe", "pizzicato",
-                     "flute", "piccolo", "clarinette", "hautbois", "basson", "trompette", "cor", "cuivres",
-                     "piano", "orgue", "clavecin", "accordeon",
-                     "timbales", "batterie", "xylophone", "glockenspiel",
-                     "choir", "voice", "celesta", "bells"
-                 ]
-                 
-                 update_recursive(main_col.controls)
-                 
+                 rafraichir_boutons_instruments(config.ETAT.get("instruments_actifs", ()), push=False)
              except Exception as e:
                  # print(f"UI Update Error: {e}")
                  pass
 
         safe_update(page)
 
+    # --- REGISTRE DES BOUTONS INSTRUMENTS (v1.20) ---
+    # code -> bouton, rempli à la création par creer_boutons_instruments().
+    # style_boutons_instruments garde l'état affiché (actif ou non) : seuls
+    # les boutons dont l'état change sont restylés et poussés.
+    boutons_instruments = {}
+    style_boutons_instruments = {}
+    # Restyle des boutons émotion de la dernière grille construite
+    maj_boutons_emotion = None
+
+    def enregistrer_bouton_instrument(code, bouton, is_active):
+        boutons_instruments[code] = bouton
+        style_boutons_instruments[code] = is_active
+
+    def rafraichir_boutons_instruments(actifs, codes=None, push=True):
+        """Restyle the registered buttons whose active state changed; returns them."""
+        changes = []
+        for code in list(boutons_instruments if codes is None else codes):
+            bouton = boutons_instruments.get(code)
+            if bouton is None:
+                continue
+            is_active = code in actifs
+            if style_boutons_instruments.get(code) == is_active:
+                continue  # Clean: already displayed this way
+            styler_bouton_instrument(bouton, is_active)
+            style_boutons_instruments[code] = is_active
+            changes.append(bouton)
+        if push and changes:
+            safe_update(*changes)
+        return changes
+
+    def styler_bouton_instrument(c, is_active):
+        c.bgcolor = ft.Colors.with_opacity(0.2, "#FFD700") if is_active else ft.Colors.TRANSPARENT
+        c.border = ft.Border.all(1, "#FFD700") if is_active else ft.Border.all(1, ft.Colors.with_opacity(0.5, "#FFFFFF"))
+        c.shadow = ft.BoxShadow(blur_radius=10, color="#FF9800" if is_active else ft.Colors.TRANSPARENT)
+        # Update Icon Color (nested in Column -> Image)
+        try:
+            # Content structure: Column -> [Image, Text]
+            if isinstance(c.content, ft.Column):
+                img = c.content.controls[0]
+                if isinstance(img, ft.Image):
+                    img.color = "#FFD700" if is_active else "#FFFFFF"
+        except: pass
+
+    # --- SYNCHRO MOTEUR -> UI (v1.20: bus d'événements) ---
+    def on_instruments_changed(delta):
+        # Only the buttons whose state changed are restyled and pushed
+        if config.ETAT.get("collection") != "instruments":
+            return
+        rafraichir_boutons_instruments(delta.get("actifs", ()), codes=delta["added"] | delta["removed"])
+
+    def on_bpm_changed(delta):
+        texte = f"{int(delta['bpm'])} BPM"
+        if lbl_bpm.value != texte:
+            lbl_bpm.value = texte
+            safe_update(lbl_bpm)
+
+    def on_emotion_changed(delta):
+        # Clicks, loaded profiles and the engine's auto mode all land here
+        if maj_boutons_emotion is not None:
+            maj_boutons_emotion()
+
+    config.EVENTS.subscribe(event_bus.INSTRUMENTS_CHANGED, on_instruments_changed)
+    config.EVENTS.subscribe(event_bus.EMOTION_CHANGED, on_emotion_changed)
+    config.EVENTS.subscribe(event_bus.BPM_CHANGED, on_bpm_changed)
+
     def changer_valeur(e, cle):
         config.ETAT[cle] = e.control.value
         update_ui()
@@ -1265,6 +1493,10 @@ def main(page: ft.Page):
         def apply_fps(fps_val):
             config.save_setting(page, "target_fps", int(fps_val))
 
+        def apply_debug_overlay(value):
+            if value:
+                onset_probe.PROBE.reset()  # Start the histograms from the moment it's shown
+
         def confirm_reset():
             config.reset_all_settings(page)
             main_layout_stack.controls.pop()
@@ -1330,6 +1562,7 @@ def main(page: ft.Page):
             def on_pick(e, v=val):
                 quality_val[0] = v
                 on_setting_change("visual_quality", v)
+                frame_pacer.GOVERNOR.reset()  # Explicit choice: drop any automatic cap
                 # Rebuild overlay
                 main_layout_stack.controls.pop()
                 safe_update(page)
@@ -1415,6 +1648,11 @@ def main(page: ft.Page):
 
         accent_row = ft.Row([make_accent_dot(c) for c in accent_colors], spacing=8)
 
+        sw_debug = ft.Switch(
+            value=config.SETTINGS.get("debug_overlay", False), active_color=accent,
+            on_change=lambda e: on_setting_change("debug_overlay", e.control.value, apply_debug_overlay)
+        )
+
         app_card = section_card(
             assets.SVG_TUNE, "#CE93D8", "sec_app",
             [ft.Colors.with_opacity(0.15, "#6A1B9A"), ft.Colors.with_opacity(0.05, "#4A148C")],
@@ -1422,6 +1660,7 @@ def main(page: ft.Page):
                 setting_row("language", dd_language),
                 ft.Text(config.T("accent_color"), size=13, color="#ddffffff"),
                 accent_row,
+                setting_row("debug_overlay", sw_debug),
             ]
         )
 
@@ -1764,6 +2003,7 @@ def main(page: ft.Page):
                 ], spacing=4, alignment=ft.MainAxisAlignment.CENTER),
                 data=code,
                 on_click=lambda e, c=code: [changer_preset(e), update_central_icon_for_preset(c)],
+                on_long_press=lambda e, c=code: global_audio.toggle_layer(c),  # v1.20: layer ambiences
                 height=34, padding=ft.Padding(left=10, top=4, right=10, bottom=4),
                 border_radius=17,
                 bgcolor=ft.Colors.with_opacity(0.35, c1) if is_active
@@ -2100,25 +2340,25 @@ def main(page: ft.Page):
         ])
 
     def creer_boutons_instruments():
+        nonlocal maj_boutons_emotion
+        # New grid: the registry only tracks the buttons built below
+        boutons_instruments.clear()
+        style_boutons_instruments.clear()
+
         def toggle_inst(e):
             inst = e.control.data
-            actifs = config.ETAT.get("instruments_actifs", [])
-            
-            if inst in actifs:
-                actifs.remove(inst)
-                e.control.bgcolor = ft.Colors.TRANSPARENT
-                e.control.border = ft.Border.all(1, ft.Colors.with_opacity(0.5, "#FFFFFF")) # White Hex
-                e.control.shadow.color = ft.Colors.TRANSPARENT
-                e.control.content.controls[0].color = "#FFFFFF" # Icon White
-            else:
-                actifs.append(inst)
-                e.control.bgcolor = ft.Colors.with_opacity(0.2, "#FFD700") # Gold Hex
-                e.control.border = ft.Border.all(1, "#FFD700") # Gold Hex
-                e.control.shadow.color = "#FF9800" # Orange Hex
-                e.control.content.controls[0].color = "#FFD700" # Icon Gold
-                
-            config.ETAT["instruments_actifs"] = actifs
-            safe_update(e.control)
+
+            def basculer(etat):
+                actifs = list(etat.get("instruments_actifs", ()))
+                if inst in actifs:
+                    actifs.remove(inst)
+                else:
+                    actifs.append(inst)
+                return {"instruments_actifs": actifs}
+
+            # Atomic read-modify-write (the conductor edits the same list)
+            etat = config.STATE.mutate(basculer)
+            rafraichir_boutons_instruments(etat["instruments_actifs"], codes=(inst,))
 
         def get_asset(code):
             mapping = {
@@ -2174,7 +2414,7 @@ def main(page: ft.Page):
                 tooltip = nom
                 on_click_action = toggle_inst
 
-            return ft.Container(
+            bouton = ft.Container(
                 content=ft.Column([
                     ft.Image(src=f"data:image/svg+xml;base64,{b64}", width=40, height=40, color=icon_color, fit=ft.BoxFit.CONTAIN),
                     ft.Text(nom, size=10, color="white" if not est_exclu else "#555555", weight=ft.FontWeight.BOLD, text_align=ft.TextAlign.CENTER, max_lines=1, overflow=ft.TextOverflow.ELLIPSIS)
@@ -2192,6 +2432,9 @@ def main(page: ft.Page):
                 animate_scale=ft.Animation(300, ft.AnimationCurve.EASE_OUT) if est_actif else None,
                 width=80, height=80 
             )
+            if not est_exclu:  # Excluded buttons keep their greyed-out style
+                enregistrer_bouton_instrument(code, bouton, est_actif)
+            return bouton
 
         def section(titre, instruments_list):
             return ft.Column([
@@ -2248,10 +2491,12 @@ def main(page: ft.Page):
                 p_name = val.replace("profile_", "")
                 p_data = config.ETAT["custom_profiles"].get(p_name)
                 if p_data:
-                    config.ETAT["bpm"] = p_data.get("bpm", 120)
-                    config.ETAT["instruments_actifs"] = list(p_data.get("actifs", []))
-                    config.ETAT["chaos"] = p_data.get("chaos", 100)
-                    config.ETAT["gravite"] = p_data.get("gravite", 0)
+                    config.STATE.set(
+                        bpm=p_data.get("bpm", 120),
+                        instruments_actifs=list(p_data.get("actifs", [])),
+                        chaos=p_data.get("chaos", 100),
+                        gravite=p_data.get("gravite", 0),
+                    )
                     print(f"📂 Loaded Profile: {p_name}")
                     # Update active instruments visual
                     update_ui()
@@ -2261,7 +2506,7 @@ def main(page: ft.Page):
             if val == "aleatoire":
                  config.ETAT["last_emotion_switch"] = 0 
             
-            update_emotion_buttons()
+            # Buttons restyled by on_emotion_changed (EMOTION_CHANGED)
             
             if val == "creatif":
                  update_ui()
@@ -2341,6 +2586,8 @@ def main(page: ft.Page):
                 animate_scale=ft.Animation(200, ft.AnimationCurve.EASE_OUT)
             )
 
+        maj_boutons_emotion = update_emotion_buttons
+
         row_emotions = ft.Row([
             emotion_btn("dice", "aleatoire", config.T("random_flow")),
             emotion_btn("palette", "creatif", config.T("creative")),
@@ -2419,8 +2666,10 @@ def main(page: ft.Page):
                     # Store current 'emotion' mode if needed, or just treat as 'custom'
                 }
                 
-                if "custom_profiles" not in config.ETAT: config.ETAT["custom_profiles"] = {}
-                config.ETAT["custom_profiles"][name] = profile_data
+                # Snapshots are immutable: publish a new profiles dict
+                profils = dict(config.ETAT.get("custom_profiles", {}))
+                profils[name] = profile_data
+                config.ETAT["custom_profiles"] = profils
                 
                 # PERSIST TO DISK (v11.1)
                 config.save_profiles_to_disk()
@@ -2531,9 +2780,10 @@ def main(page: ft.Page):
             val = e.control.value
             config.ETAT[key] = val
             
-            # Update Audio Volume if Intensity changes
+            # Update Audio Volume if Intensity changes (v1.20: decided on the
+            # audio worker, after the mixer init; the mixer follows intensite itself)
             if key == "intensite":
-                 global_audio.set_volume(val)
+                 global_audio.follow_intensity(val)
             
             # Update Labels
             if key == "vitesse": lbl_vitesse.value = f"{int(val)}%"
@@ -2683,12 +2933,9 @@ def main(page: ft.Page):
     page.add(main_layout_stack)
     
     # Threading correction: Start animation loop AFTER adding content to page
-    thread_anim = threading.Thread(target=animer_coeur, daemon=True)
-    thread_anim.start()
-
-    # v14.0: Start Background Animation
-    thread_fond = threading.Thread(target=animer_fond, daemon=True)
-    thread_fond.start()
+    # v1.20: one render thread for heart + kaleidoscope + particles
+    thread_rendu = threading.Thread(target=boucle_rendu, daemon=True)
+    thread_rendu.start()
 
 if __name__ == "__main__":
     print("Lancement v1.20 Kaleidoscope...")
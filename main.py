@@ -6,6 +6,8 @@ import time
 import threading
 import config
 import gammes
+from scale_quantizer import get_quantizer
+from clock import WallClock
 from ai_conductor import AIConductor, SUSTAINED_INSTRUMENTS, PLUCKED_INSTRUMENTS, PERCUSSIVE_INSTRUMENTS
 
 # --- CONFIGURATION SOUNDFONT ---
@@ -14,8 +16,8 @@ NOM_SOUNDFONT = "FluidR3_GM.sf2"
 # --- OUTILS ---
 def trouver_accords(note_base, gamme):
     try:
-        if note_base not in gamme: return [note_base]
-        idx = gamme.index(note_base)
+        idx = get_quantizer(gamme).index_of(note_base)
+        if idx < 0: return [note_base]
         n1 = gamme[idx]
         n2 = gamme[(idx + 4) % len(gamme)]
         n3 = gamme[(idx + 8) % len(gamme)]
@@ -163,24 +165,25 @@ def main():
     # --- COUCHE FOND ---
     def gerer_nappe_fond():
         while True:
-            if not config.ETAT["actif"] or config.ETAT["collection"] is None:
+            etat = config.STATE.snapshot()  # One consistent state per iteration
+            if not etat["actif"] or etat["collection"] is None:
                 wait(1.0)
                 continue
                 
             # v13.0: Skip MIDI Nappe if in Audio Loop Mode
-            if config.ETAT["collection"] in ["elements", "saisons", "atmos"]:
+            if etat["collection"] in ["elements", "saisons", "atmos"]:
                 wait(1.0)
                 continue
             
-            preset = config.ETAT["preset"]
+            preset = etat["preset"]
             if preset is None: 
                 wait(1.0)
                 continue
 
             gamme = gammes.TOUTES_GAMMES[preset]
-            intensite = config.ETAT["intensite"]
+            intensite = etat["intensite"]
             
-            note_cible = min(gamme, key=lambda x: abs(x - 48))
+            note_cible = get_quantizer(gamme).nearest_note(48)
             duree = 10.0 
             vol = 0.05 + (intensite / 800.0) 
             
@@ -192,7 +195,9 @@ def main():
             wait(duree * 0.8)
 
     # --- AI CONDUCTOR (v1.20) ---
-    conductor = AIConductor()
+    # Cette boucle tourne dans un thread Python hors contexte SCAMP : temps réel
+    horloge = WallClock()
+    conductor = AIConductor(clock=horloge)
     print("🎼 AI Conductor initialized (Organic Soul & Phrasing)")
 
     # --- COUCHE MELODIE ---
@@ -200,40 +205,39 @@ def main():
         note_courante = 60
         while True:
             try:
-                if not config.ETAT["actif"] or config.ETAT["collection"] is None:
+                etat = config.STATE.snapshot()  # One consistent state per iteration
+                if not etat["actif"] or etat["collection"] is None:
                     wait(0.1)
                     continue
 
-                if config.ETAT["mode_auto"]: pass 
+                if etat["mode_auto"]: pass 
 
                 # ═══════════════════════════════════════════════════════
                 #  ORCHESTRA MODE v1.20 — ORGANIC SOUL & PHRASING
                 # ═══════════════════════════════════════════════════════
-                if config.ETAT.get("mode_orchestre", False):
-                    actifs = config.ETAT.get("instruments_actifs", [])
+                if etat.get("mode_orchestre", False):
+                    actifs = etat.get("instruments_actifs", ())
                     if not actifs:
                         wait(0.5)
                         continue
                     
                     # Skip MIDI if in audio loop modes
-                    current_collection = config.ETAT.get("collection")
+                    current_collection = etat.get("collection")
                     if current_collection in ["elements", "saisons", "atmos"]:
                         wait(1.0)
                         continue
                     
                     # ── EMOTION ENGINE ──
                     EMOTIONS = config.EMOTIONS
-                    current_emotion = config.ETAT.get("emotion", "aleatoire")
+                    current_emotion = etat.get("emotion", "aleatoire")
                     
                     if current_emotion == "aleatoire":
-                        if "target_emotion" not in config.ETAT:
-                            config.ETAT["target_emotion"] = "joyeux"
-                            config.ETAT["last_emotion_switch"] = time.time()
-                        if time.time() - config.ETAT.get("last_emotion_switch", 0) > random.randint(15, 25):
+                        if "target_emotion" not in etat:
+                            etat = config.STATE.set(target_emotion="joyeux", last_emotion_switch=horloge.now())
+                        if horloge.now() - etat.get("last_emotion_switch", 0) > random.randint(15, 25):
                             new_emotion = random.choice(list(EMOTIONS.keys()))
-                            config.ETAT["target_emotion"] = new_emotion
-                            config.ETAT["last_emotion_switch"] = time.time()
-                        target_key = config.ETAT["target_emotion"]
+                            etat = config.STATE.set(target_emotion=new_emotion, last_emotion_switch=horloge.now())
+                        target_key = etat["target_emotion"]
                     else:
                         target_key = current_emotion
                     
@@ -241,18 +245,20 @@ def main():
                     gamme = target_data["gamme"]
                     
                     # ── CONDUCTOR UPDATE (Perlin-driven state) ──
-                    bpm = config.ETAT.get("bpm", 120)
+                    bpm = etat.get("bpm", 120)
                     attente = 60.0 / bpm
                     attente = humaniser(attente, 0.05)
                     
-                    if config.ETAT.get("mode_auto", False):
+                    if etat.get("mode_auto", False):
                         conductor.update(attente, target_data)
+                        etat = config.STATE.snapshot()  # Conductor drifted bpm/intensite/layers
+                        actifs = etat.get("instruments_actifs", ())
                     
-                    intensite = config.ETAT.get("intensite", 50)
-                    current_time = time.time()
+                    intensite = etat.get("intensite", 50)
+                    current_time = horloge.now()
                     
                     # ── PLAY ALL ACTIVE INSTRUMENTS ──
-                    for inst_name in list(actifs):
+                    for inst_name in actifs:
                         if inst_name not in instruments:
                             continue
                         if inst_name in target_data.get("excluded", []):
@@ -300,6 +306,7 @@ def main():
                         
                         # ── DURATION (Conductor-driven) ──
                         sound_duration = conductor.suggest_duration(inst_name, attente, loop_wait=attente)
+                        sound_duration = conductor.envelope_length(sound_duration)
                         
                         # ── COOLDOWN UPDATE ──
                         if is_sustained and in_phrase:
@@ -342,12 +349,12 @@ def main():
                 # STANDARD MODE LOGIC
                 # v13.0: Skip standard MIDI generation for Audio Loop Modes (Elements, Seasons, Atmos)
                 # This ensures only the audio file plays, not the MIDI notes.
-                if config.ETAT.get("collection") in ["elements", "saisons", "atmos"]:
+                if etat.get("collection") in ["elements", "saisons", "atmos"]:
                     wait(1.0)
                     # Note: We rely on interface.py GlobalAudioPlayer for sound here.
                     continue
 
-                preset = config.ETAT["preset"]
+                preset = etat["preset"]
                 if preset is None: 
                     wait(0.1)
                     continue
@@ -355,10 +362,10 @@ def main():
                 inst = instruments[preset]
                 gamme = gammes.TOUTES_GAMMES[preset]
                 
-                vitesse = config.ETAT["vitesse"]
-                intensite = config.ETAT["intensite"]
-                chaos = config.ETAT["chaos"]
-                gravite = config.ETAT["gravite"]
+                vitesse = etat["vitesse"]
+                intensite = etat["intensite"]
+                chaos = etat["chaos"]
+                gravite = etat["gravite"]
                 
                 # Rythme
                 presets_lents = ["espace", "vide", "indus", "zen"]
@@ -376,8 +383,7 @@ def main():
                     if random.random() * 100 < chaos: saut = random.randint(2, 4)
                     
                     try:
-                        curr = min(gamme, key=lambda x: abs(x-note_courante))
-                        curr_idx = gamme.index(curr)
+                        curr_idx = get_quantizer(gamme).index_near(note_courante)
                         new_idx = max(0, min(curr_idx + (direction*saut), len(gamme)-1))
                         note_brute = gamme[new_idx]
                     except: note_brute = 60
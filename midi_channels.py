@@ -0,0 +1,151 @@
+# midi_channels.py - ALLOCATION DES CANAUX MIDI v1.20
+"""
+Programmes General MIDI des presets du moteur et allocateur de canaux.
+
+Un fichier MIDI n'a que 16 canaux (dont le 10 réservé aux percussions) et
+le synthé FluidSynth de SCAMP en a 256, dont chaque part prend un bloc
+fixe ; le moteur connaît une quarantaine de presets. Les presets sont liés
+à un emplacement (canal MIDI, ou part SCAMP en temps réel) au premier
+besoin ; quand tout est pris, l'emplacement le moins récemment utilisé et
+silencieux est repris (le nouvel occupant renvoie program change + CC
+91/93). Sert au moteur temps réel et à l'écriture des fichiers MIDI.
+"""
+
+# ═══════════════════════════════════════════════════════════
+#  GENERAL MIDI PROGRAMS (presets used by the engine)
+# ═══════════════════════════════════════════════════════════
+
+GM_PROGRAMS = {
+    "Acoustic Grand Piano": 0, "Electric Piano 1": 4, "Electric Piano 2": 5,
+    "Harpsichord": 6, "Celesta": 8, "Glockenspiel": 9, "Marimba": 12,
+    "Xylophone": 13, "Tubular Bells": 14, "Church Organ": 19, "Accordion": 21,
+    "Acoustic Guitar (nylon)": 24, "Acoustic Guitar (steel)": 25,
+    "Acoustic Bass": 32, "Violin": 40, "Viola": 41, "Cello": 42,
+    "Contrabass": 43, "Pizzicato Strings": 45, "Orchestral Harp": 46,
+    "Timpani": 47, "Choir Aahs": 52, "Voice Oohs": 53, "Trumpet": 56,
+    "French Horn": 60, "Brass Section": 61, "Oboe": 68, "Bassoon": 70,
+    "Clarinet": 71, "Piccolo": 72, "Flute": 73, "Pan Flute": 75,
+    "Shakuhachi": 77, "Lead 2 (sawtooth)": 81, "Pad 2 (warm)": 89,
+    "Pad 3 (polysynth)": 90, "Pad 7 (halo)": 94, "Sitar": 104,
+    "Kalimba": 108, "Steel Drums": 114,
+}
+
+# Drum kits live on MIDI channel 10 (index 9), program = kit number
+GM_DRUM_KITS = {"Orchestral Kit": 48}
+
+DRUM_CHANNEL = 9
+MELODIC_CHANNELS = tuple(ch for ch in range(16) if ch != DRUM_CHANNEL)
+
+# SCAMP's FluidSynth host: 256 synth channels, new_part() takes a block of 8
+# (one per simultaneous pitch bend) and never gives them back. The live
+# engine binds presets to a fixed set of parts, re-programmed on reuse.
+SCAMP_SYNTH_CHANNELS = 256
+SCAMP_PART_CHANNELS = 8
+SCAMP_PART_SLOTS = tuple(range(SCAMP_SYNTH_CHANNELS // SCAMP_PART_CHANNELS))
+DRUM_BANK = 128  # Soundfont bank of the GM drum kits
+
+# CC numbers re-sent on every (re)bind
+CC_REVERB = 91
+CC_CHORUS = 93
+
+
+def gm_program(preset_name: str) -> tuple[bool, int]:
+    """(is drum kit, program number) for a SCAMP preset name."""
+    if preset_name in GM_DRUM_KITS:
+        return True, GM_DRUM_KITS[preset_name]
+    return False, GM_PROGRAMS.get(preset_name, 0)
+
+
+# ═══════════════════════════════════════════════════════════
+#  CHANNEL ALLOCATOR
+# ═══════════════════════════════════════════════════════════
+
+class ChannelAllocator:
+    """
+    Lazy preset → channel binding with least-recently-used eviction.
+
+        channel, evicted = alloc.bind(key, preset_name, now)
+        alloc.note_on(channel, now)      # or hold(channel, until) when note-offs aren't seen
+        alloc.note_off(channel)
+
+    A channel is idle when no note is sounding on it. Eviction prefers a
+    free channel, then the least recently used idle one, then (everything
+    ringing) the least recently used overall. Keys in `pinned` are only
+    evicted when nothing else can be, keys in `reserved` never are. Drum
+    kits share `drum_channel` and are never evicted (None: drum kits take
+    a channel like any preset). `channels=None` means unbounded (one
+    virtual channel per key, nothing is ever evicted).
+    """
+
+    def __init__(self, channels=MELODIC_CHANNELS, drum_channel: int | None = DRUM_CHANNEL) -> None:
+        self.unbounded = channels is None
+        self.drum_channel = drum_channel
+        self.channels = [] if channels is None else list(channels)
+        self.owner: dict[int, object] = {}     # channel -> key
+        self.bound: dict[object, int] = {}     # key -> channel
+        self.last_used: dict[int, float] = {ch: -1 for ch in self.channels}
+        self.busy: dict[int, int] = {}          # Sounding notes (note_on/off)
+        self.busy_until: dict[int, float] = {}  # Sounding until (hold)
+        self.pinned: set = set()
+        self.reserved: set = set()
+        self.rebinds = 0
+
+    def __contains__(self, key) -> bool:
+        return key in self.bound
+
+    def channel_of(self, key) -> int | None:
+        return self.bound.get(key)
+
+    def is_idle(self, channel: int, now: float) -> bool:
+        return self.busy.get(channel, 0) == 0 and self.busy_until.get(channel, -1) <= now
+
+    def bind(self, key, preset_name: str, now: float = 0.0) -> tuple[int, object]:
+        """Bind `key` to a channel. Returns (channel, key evicted from it or None)."""
+        if self.drum_channel is not None and preset_name in GM_DRUM_KITS:
+            self.bound[key] = self.drum_channel
+            return self.drum_channel, None
+
+        if self.unbounded:
+            channel = len(self.channels)
+            self.channels.append(channel)
+            self.last_used[channel] = -1
+        else:
+            channel = self._pick(now)
+        previous = self.owner.get(channel)
+        if previous is not None:
+            del self.bound[previous]
+            self.rebinds += 1
+        self.owner[channel] = key
+        self.bound[key] = channel
+        self.last_used[channel] = now  # Not the next victim before it has played
+        return channel, previous
+
+    def _pick(self, now: float) -> int:
+        free = [ch for ch in self.channels if ch not in self.owner]
+        if not free:
+            kept = self.pinned | self.reserved
+            movable = ([ch for ch in self.channels if self.owner[ch] not in kept]
+                       or [ch for ch in self.channels if self.owner[ch] not in self.reserved])
+            free = [ch for ch in movable if self.is_idle(ch, now)] or movable
+        return min(free, key=lambda ch: self.last_used[ch])
+
+    def release(self, key) -> None:
+        channel = self.bound.pop(key, None)
+        if channel is not None and self.owner.get(channel) == key:
+            del self.owner[channel]
+
+    def touch(self, channel: int, now: float) -> None:
+        self.last_used[channel] = now
+
+    def note_on(self, channel: int, now: float) -> None:
+        self.last_used[channel] = now
+        self.busy[channel] = self.busy.get(channel, 0) + 1
+
+    def note_off(self, channel: int) -> None:
+        self.busy[channel] -= 1
+
+    def hold(self, channel: int, now: float, until: float) -> None:
+        """A note started at `now` rings until `until` (no note-off tracking)."""
+        self.last_used[channel] = now
+        if until > self.busy_until.get(channel, -1):
+            self.busy_until[channel] = until
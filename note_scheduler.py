@@ -0,0 +1,114 @@
+# note_scheduler.py - ORDONNANCEUR DE NOTES À ANTICIPATION v1.20
+"""
+Décider les notes en avance, les jouer à l'heure.
+
+La boucle orchestre compose ses temps jusqu'à `lookahead` secondes devant
+l'horloge et dépose les notes dans une file de priorité triée par date ;
+le dispatch attend chaque échéance sur l'horloge du moteur (temps SCAMP,
+ou simulé hors ligne) puis appelle play_note. Un à-coup Python pendant la
+composition (GC, verrou UI, mise à jour du chef d'orchestre) est absorbé
+par la fenêtre d'anticipation au lieu de retarder toutes les notes du temps.
+"""
+
+import heapq
+import itertools
+
+from onset_probe import clock_lag, clock_seconds
+
+DEFAULT_LOOKAHEAD = 0.5  # Seconds composed ahead of the clock
+MIN_WAIT = 0.01          # A dispatch pass always yields at least this long
+
+
+class ComposeClock:
+    """
+    Clock view for the composer (AI conductor): now() is the time being
+    composed, which runs up to `lookahead` ahead of the real clock.
+    """
+
+    def __init__(self, scheduler: "NoteScheduler") -> None:
+        self._scheduler = scheduler
+
+    def now(self) -> float:
+        return max(self._scheduler.cursor, self._scheduler.clock.now())
+
+    def wait(self, seconds: float) -> None:
+        self._scheduler.clock.wait(seconds)
+
+    def seconds(self, duration: float) -> float:
+        return self._scheduler.clock.seconds(duration)
+
+
+class NoteScheduler:
+    """
+    Time-sorted note queue between composition and playback.
+
+        while sched.cursor < clock.now() + sched.lookahead:
+            sched.cursor += compose_tick(sched.cursor)   # schedule() notes at tick time
+        sched.play_until(sched.cursor - sched.lookahead)
+
+    Events that come due while the clock was stopped (pause) are dropped
+    rather than played in a burst: anything later than `stale` is skipped.
+    With a `probe` (onset_probe.OnsetProbe), each dispatch records how late
+    it fired against its scheduled time; with a `profiler`
+    (profiler.SpanProfiler), play_note calls are timed as "play_note".
+    """
+
+    def __init__(self, clock, lookahead: float = DEFAULT_LOOKAHEAD, probe=None, profiler=None) -> None:
+        self.clock = clock
+        self.probe = probe
+        self.profiler = profiler
+        self.lookahead = lookahead
+        self.stale = max(1.0, lookahead * 4)
+        self.cursor = clock.now()  # Composed up to here
+        self._heap: list[tuple] = []
+        self._seq = itertools.count()  # FIFO among events at the same time
+        self.played = 0
+        self.dropped = 0
+        self.failed = 0
+        self.compose_clock = ComposeClock(self)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, t: float, part, pitch, volume, length: float, name: str = "") -> None:
+        heapq.heappush(self._heap, (t, next(self._seq), part, pitch, volume, length, name))
+
+    def resync(self) -> float:
+        """Never compose in the past (first call, after a pause or an overload). Returns now."""
+        now = self.clock.now()
+        if self.cursor < now:
+            self.cursor = now
+        return now
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self.cursor = self.clock.now()
+
+    def play_until(self, t_end: float) -> None:
+        """Play every event due before `t_end` at its time, then wait until `t_end`."""
+        clock, heap, probe, prof = self.clock, self._heap, self.probe, self.profiler
+        t_end = max(t_end, clock.now() + MIN_WAIT)
+        while heap and heap[0][0] < t_end:
+            t = heap[0][0]
+            now = clock.now()
+            if t > now:
+                clock.wait(t - now)
+                now = clock.now()
+            _, _, part, pitch, volume, length, name = heapq.heappop(heap)
+            if now - t > self.stale:
+                self.dropped += 1
+                continue
+            if probe is not None:
+                probe.record(name, clock_seconds(clock, now - t) + clock_lag(clock))
+            t0 = prof.start() if prof is not None else 0
+            try:
+                part.play_note(pitch, volume, length, blocking=False)
+                self.played += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"⚠️ play_note failed ({name}): {e}")
+            if t0:
+                prof.stop("play_note", t0)
+        now = clock.now()
+        if t_end > now:
+            clock.wait(t_end - now)
@@ -0,0 +1,310 @@
+# offline_render.py - RENDU HORS TEMPS RÉEL v1.20
+"""
+Rendu offline déterministe : pilote la logique de QuoniamAudioEngine
+(_play_orchestra_mode, _play_fluid_note, nappe de fond) sur une horloge
+virtuelle, sans FluidSynth ni attente réelle, et écrit un fichier MIDI.
+
+Usage :
+    python offline_render.py sortie.mid --minutes 120 --seed 42
+    python offline_render.py sortie.mid --orchestre violon,piano --emotion melancolique
+    python offline_render.py sortie.mid --preset choir
+"""
+
+import argparse
+import heapq
+import os
+import random
+import struct
+import time
+from contextlib import contextmanager
+
+import config
+from clock import SimulatedClock
+from audio_engine import QuoniamAudioEngine
+from midi_channels import ChannelAllocator, gm_program, CC_REVERB, CC_CHORUS
+from profiler import PROFILER
+
+TICKS_PER_BEAT = 480  # One engine clock unit is one beat, as with ScampClock
+
+
+# ═══════════════════════════════════════════════════════════
+#  RECORDING PARTS & OFFLINE ENGINE
+# ═══════════════════════════════════════════════════════════
+
+class _RecordingPart:
+    """Stand-in for a SCAMP part: stores note events instead of playing them."""
+
+    def __init__(self, preset_name: str, clock: SimulatedClock) -> None:
+        self.preset_name = preset_name
+        self.clock = clock
+        self.events: list[tuple[float, int, int, float]] = []  # (start, pitch, velocity, length)
+        self.reverb = 0
+        self.chorus = 0
+
+    def play_note(self, pitch, volume, length, blocking=False):
+        if length <= 0:
+            return
+        level = volume.max_level() if hasattr(volume, "max_level") else float(volume)
+        velocity = max(1, min(127, int(round(level * 127))))
+        self.events.append((self.clock.now(), int(round(pitch)), velocity, float(length)))
+
+
+class OfflineEngine(QuoniamAudioEngine):
+    """
+    QuoniamAudioEngine sans session SCAMP : les parts enregistrent les notes.
+    Aucune éviction ici : write_midi_file répartit les parts sur les canaux.
+    """
+
+    CHANNELS = None
+
+    def __init__(self, clock: SimulatedClock) -> None:
+        super().__init__(soundfont_path=None, clock=clock)
+
+    def _init_scamp_session(self):
+        self.session = None
+        self._load_instruments()
+
+    def _create_part(self, preset_name):
+        return _RecordingPart(preset_name, self.clock)
+
+    def _setup_part(self, preset_name, part):
+        # Same CC 91/93 values as the live engine, written into the MIDI file
+        effects = self._part_effects(preset_name)
+        if effects is not None:
+            part.reverb, part.chorus = effects
+
+    def start_recording(self):
+        pass
+
+    def stop_recording(self, output_dir="./recordings"):
+        return None
+
+
+# ═══════════════════════════════════════════════════════════
+#  STANDARD MIDI FILE WRITER
+# ═══════════════════════════════════════════════════════════
+
+def _varlen(value: int) -> bytes:
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def _track_chunk(events: list[tuple[int, bytes]]) -> bytes:
+    data = bytearray()
+    last_tick = 0
+    for tick, message in events:
+        data += _varlen(tick - last_tick) + message
+        last_tick = tick
+    data += _varlen(0) + b"\xff\x2f\x00"  # End of track
+    return b"MTrk" + struct.pack(">I", len(data)) + bytes(data)
+
+
+def _beats_to_ticks(beats: float) -> int:
+    return int(round(beats * TICKS_PER_BEAT))
+
+
+def write_midi_file(path: str, parts: list[_RecordingPart], bpm: float = 120.0) -> int:
+    """
+    Write recorded parts as a single-track MIDI file. Returns the note count.
+    Event times are in beats; `bpm` goes into the tempo meta event.
+
+    Parts are bound to the 15 melodic channels on first use; when all are
+    taken, the least recently used silent channel is rebound (program change
+    + CC 91/93 are re-sent), so any number of presets fits.
+    """
+    # (tick, order, part index, pitch, velocity): note-offs (order 0) first
+    raw = []
+    for p_idx, part in enumerate(parts):
+        for start, pitch, velocity, length in part.events:
+            if not 0 <= pitch <= 127:
+                continue
+            on = _beats_to_ticks(start)
+            off = max(on + 1, _beats_to_ticks(start + length))
+            raw.append((on, 1, p_idx, pitch, velocity))
+            raw.append((off, 0, p_idx, pitch, 0))
+    raw.sort()
+
+    channels = ChannelAllocator()  # part index -> channel, LRU rebinding
+    sounding: dict[tuple[int, int], int] = {}
+    pending: dict[tuple[int, int], list[int]] = {}  # (part, pitch) -> channels
+    tempo_us = int(round(60_000_000 / bpm))
+    body: list[tuple[int, bytes]] = [(0, b"\xff\x51\x03" + tempo_us.to_bytes(3, "big"))]
+    notes = 0
+
+    def bind(p_idx: int, tick: int) -> int:
+        part = parts[p_idx]
+        channel, _ = channels.bind(p_idx, part.preset_name, tick)
+        _, program = gm_program(part.preset_name)
+        body.append((tick, bytes([0xC0 | channel, program])))
+        body.append((tick, bytes([0xB0 | channel, CC_REVERB, part.reverb])))
+        body.append((tick, bytes([0xB0 | channel, CC_CHORUS, part.chorus])))
+        return channel
+
+    for tick, order, p_idx, pitch, velocity in raw:
+        if order == 1:
+            channel = channels.channel_of(p_idx)
+            if channel is None:
+                channel = bind(p_idx, tick)
+            channels.note_on(channel, tick)
+            key = (channel, pitch)
+            sounding[key] = sounding.get(key, 0) + 1
+            pending.setdefault((p_idx, pitch), []).append(channel)
+            body.append((tick, bytes([0x90 | channel, pitch, velocity])))
+            notes += 1
+        else:
+            channel = pending[(p_idx, pitch)].pop(0)
+            channels.note_off(channel)
+            key = (channel, pitch)
+            sounding[key] -= 1
+            # Overlapping notes of the same pitch: only the last release sends note-off
+            if sounding[key] == 0:
+                body.append((tick, bytes([0x80 | channel, pitch, 0])))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"MThd" + struct.pack(">IHHH", 6, 0, 1, TICKS_PER_BEAT))
+        f.write(_track_chunk(body))
+    return notes
+
+
+# ═══════════════════════════════════════════════════════════
+#  RENDER
+# ═══════════════════════════════════════════════════════════
+
+@contextmanager
+def isolated_state():
+    """
+    Snapshot config.ETAT / COOLDOWNS / ACTIVE_NOTES, start from clean
+    cooldowns, and restore everything on exit (renders and benchmarks
+    must not leak into a running session).
+    """
+    saved_etat = config.STATE.snapshot()  # Immutable: no copy needed
+    saved_cooldowns = dict(config.COOLDOWNS)
+    saved_active = dict(config.ACTIVE_NOTES)
+    config.COOLDOWNS.clear()
+    config.ACTIVE_NOTES.clear()
+    try:
+        yield
+    finally:
+        config.STATE.replace(saved_etat)
+        config.COOLDOWNS.clear()
+        config.COOLDOWNS.update(saved_cooldowns)
+        config.ACTIVE_NOTES.clear()
+        config.ACTIVE_NOTES.update(saved_active)
+
+
+def configure(instruments: list[str] | None = None, emotion: str = "aleatoire",
+              preset: str | None = None, bpm: float | None = None,
+              intensite: float | None = None, auto: bool = True) -> None:
+    """
+    Point config.ETAT at one generation mode: orchestra when `instruments`
+    is given (or no preset), otherwise the fluid-note mode for `preset`.
+    """
+    changes = {"actif": True, "mode_auto": auto}
+    if bpm is not None:
+        changes["bpm"] = bpm
+    if intensite is not None:
+        changes["intensite"] = intensite
+
+    if preset is not None and not instruments:
+        # Fluid mode: any collection outside the audio-loop ones enables MIDI
+        changes.update(collection="offline", mode_orchestre=False, preset=preset)
+    else:
+        changes.update(collection="instruments", mode_orchestre=True, preset=None,
+                       emotion=emotion, instruments_actifs=list(instruments or ["piano"]))
+
+    config.STATE.delete("target_emotion", "last_emotion_switch")
+    config.STATE.update(changes)
+
+
+def render(duration: float, seed: int | None = None, **mode) -> OfflineEngine:
+    """
+    Run the generator for `duration` virtual seconds and return the engine
+    (its parts hold the recorded events). `mode` is passed to configure().
+    Same seed + same arguments = same output.
+
+    Like the live session, the clock counts beats at the configured bpm
+    (the session tempo is set once from ETAT["bpm"]).
+    """
+    if seed is not None:
+        random.seed(seed)
+
+    with isolated_state():
+        configure(**mode)
+
+        clock = SimulatedClock(tempo=config.ETAT["bpm"])
+        engine = OfflineEngine(clock)
+        engine.is_running = True
+
+        # Discrete-event scheduling of the engine's two loops on one clock
+        voices = [(0.0, 0, engine._nappe_fond_step), (0.0, 1, engine._melodie_step)]
+        heapq.heapify(voices)
+        end = duration / clock.beat_length
+        while voices[0][0] < end:
+            t, order, step = heapq.heappop(voices)
+            clock.t = t
+            try:
+                step()
+            except Exception as e:
+                print(f"⚠️ Offline: erreur génération: {e}")
+                clock.wait(1.0)
+            if clock.t <= t:
+                clock.t = t + 0.01  # Never stall the schedule
+            heapq.heappush(voices, (clock.t, order, step))
+
+        engine.is_running = False
+        return engine
+
+
+def render_to_midi(path: str, duration: float, **kwargs) -> dict:
+    """Render `duration` seconds to a MIDI file. Returns render statistics."""
+    started = time.perf_counter()
+    engine = render(duration, **kwargs)
+    notes = write_midi_file(path, list(engine.parts_cache.values()), bpm=60.0 / engine.clock.beat_length)
+    elapsed = time.perf_counter() - started
+    return {
+        "path": path,
+        "duration": duration,
+        "notes": notes,
+        "wall_time": elapsed,
+        "speedup": duration / elapsed if elapsed > 0 else float("inf"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quoniam offline MIDI renderer")
+    parser.add_argument("output", help="Output .mid path")
+    parser.add_argument("--minutes", type=float, default=10.0, help="Virtual duration in minutes")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed (reproducible output)")
+    parser.add_argument("--orchestre", default=None, help="Comma-separated instruments (orchestra mode)")
+    parser.add_argument("--emotion", default="aleatoire", choices=["aleatoire", *config.EMOTIONS.keys()])
+    parser.add_argument("--preset", default=None, help="Fluid-note preset (e.g. choir, eau)")
+    parser.add_argument("--bpm", type=float, default=None)
+    parser.add_argument("--intensite", type=float, default=None)
+    parser.add_argument("--no-auto", action="store_true", help="Disable the AI conductor drift")
+    parser.add_argument("--profile", action="store_true", help="Print per-stage generator costs after the render")
+    args = parser.parse_args()
+
+    if args.profile:
+        PROFILER.enable()
+
+    instruments = [i.strip() for i in args.orchestre.split(",") if i.strip()] if args.orchestre else None
+    stats = render_to_midi(
+        args.output, args.minutes * 60.0, seed=args.seed, instruments=instruments,
+        emotion=args.emotion, preset=args.preset, bpm=args.bpm,
+        intensite=args.intensite, auto=not args.no_auto,
+    )
+    print(f"✅ {stats['notes']} notes -> {stats['path']} "
+          f"({stats['duration'] / 60:.1f} min in {stats['wall_time']:.2f}s, x{stats['speedup']:.0f})")
+    if args.profile:
+        PROFILER.dump()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# onset_probe.py - SONDE DE RETARD D'ATTAQUE v1.20
+"""
+Mesure l'écart entre la date prévue d'une note et l'instant où play_note
+part réellement, par instrument, dans un histogramme de taille fixe
+(p50/p95/p99/max). Sert à voir quand le chef d'orchestre, l'UI ou le GC
+affament le thread audio.
+
+Le retard combine deux sources :
+- l'horloge du moteur a dépassé l'échéance (dispatch tardif) ;
+- l'horloge logique elle-même a pris du retard sur le temps réel
+  (ScampClock.lag() : SCAMP continue son temps logique même en retard).
+"""
+
+import math
+import threading
+
+# Histogram: 4 bins per octave from 0.25 ms to ~4 s, plus underflow/overflow
+_BASE_MS = 0.25
+_BINS_PER_OCTAVE = 4
+_OCTAVES = 14
+N_BINS = _BINS_PER_OCTAVE * _OCTAVES + 2
+ALL = "*"  # Aggregate over every instrument
+
+
+def _bin_index(lag_ms: float) -> int:
+    if lag_ms < _BASE_MS:
+        return 0
+    i = 1 + int(math.log2(lag_ms / _BASE_MS) * _BINS_PER_OCTAVE)
+    return min(i, N_BINS - 1)
+
+
+def _bin_upper_ms(i: int) -> float:
+    """Upper edge of bin `i` (what a percentile falling in it reports)."""
+    return _BASE_MS * 2 ** (i / _BINS_PER_OCTAVE)
+
+
+def clock_seconds(clock, duration: float) -> float:
+    """A duration in the clock's now() units (SCAMP: beats), in seconds."""
+    seconds = getattr(clock, "seconds", None)
+    return seconds(duration) if seconds is not None else duration
+
+
+def clock_lag(clock) -> float:
+    """Seconds the clock's logical time runs behind real time (0 for clocks that can't)."""
+    lag = getattr(clock, "lag", None)
+    return lag() if lag is not None else 0.0
+
+
+class _Histogram:
+    __slots__ = ("bins", "count", "max_ms", "total_ms")
+
+    def __init__(self) -> None:
+        self.bins = [0] * N_BINS
+        self.count = 0
+        self.max_ms = 0.0
+        self.total_ms = 0.0
+
+    def add(self, lag_ms: float) -> None:
+        self.bins[_bin_index(lag_ms)] += 1
+        self.count += 1
+        self.total_ms += lag_ms
+        if lag_ms > self.max_ms:
+            self.max_ms = lag_ms
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.bins):
+            seen += n
+            if seen >= rank:
+                return min(_bin_upper_ms(i), self.max_ms)
+        return self.max_ms
+
+    def stats(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total_ms / self.count if self.count else 0.0,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max_ms,
+        }
+
+
+class OnsetProbe:
+    """
+    Per-instrument onset lag histograms (milliseconds).
+
+        PROBE.record("violon", clock_seconds(clock, clock.now() - t) + clock_lag(clock))
+        PROBE.stats()          # {"violon": {"count", "mean", "p50", "p95", "p99", "max"}, "*": {...}}
+
+    record() is called from the audio thread and costs one log2 and a few
+    increments; stats() and reset() may be called from any thread.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._hists: dict[str, _Histogram] = {ALL: _Histogram()}
+        self.enabled = True
+
+    def record(self, name: str, lag_seconds: float) -> None:
+        if not self.enabled:
+            return
+        lag_ms = max(0.0, lag_seconds * 1000.0)  # Early (ahead of time) counts as on time
+        hist = self._hists.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self._hists.setdefault(name, _Histogram())
+        hist.add(lag_ms)
+        self._hists[ALL].add(lag_ms)
+
+    def record_onset(self, name: str, clock, t: float) -> None:
+        """Note intended at engine time `t` fires now on `clock`."""
+        if self.enabled:
+            self.record(name, clock_seconds(clock, clock.now() - t) + clock_lag(clock))
+
+    def stats(self, name: str | None = None) -> dict:
+        """Stats for one instrument, or for all of them (plus the "*" aggregate)."""
+        with self._lock:
+            if name is not None:
+                hist = self._hists.get(name)
+                return hist.stats() if hist is not None else _Histogram().stats()
+            return {key: hist.stats() for key, hist in self._hists.items()}
+
+    def worst(self, n: int = 3) -> list[tuple[str, dict]]:
+        """The `n` instruments with the highest p95 (debug overlay)."""
+        per_inst = [(k, s) for k, s in self.stats().items() if k != ALL and s["count"]]
+        per_inst.sort(key=lambda item: item[1]["p95"], reverse=True)
+        return per_inst[:n]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hists = {ALL: _Histogram()}
+
+
+PROBE = OnsetProbe()
+
+
+def format_stats(stats: dict) -> str:
+    return (f"p50 {stats['p50']:.1f} | p95 {stats['p95']:.1f} | p99 {stats['p99']:.1f} | "
+            f"max {stats['max']:.1f} ms ({stats['count']})")
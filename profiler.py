@@ -0,0 +1,120 @@
+# profiler.py - SONDES DE PROFILAGE DU CHEMIN CRITIQUE v1.20
+"""
+Compteurs par étape (appels, total ns, max ns) autour des étapes de la
+boucle orchestre et de la note fluide, pour voir où le thread SCAMP passe
+son temps sur les machines modestes.
+
+Désactivé par défaut : start() renvoie 0 et stop() sort aussitôt, soit
+deux appels de méthode par étape. Activé, chaque étape coûte deux
+perf_counter_ns() et trois additions.
+
+    t0 = PROFILER.start()
+    ...étape...
+    PROFILER.stop("voice_lead", t0)
+
+Les compteurs se lisent à la demande (snapshot / dump) ou sont écrits
+périodiquement dans un fichier JSON Lines, une fenêtre glissante par ligne.
+"""
+
+import json
+import threading
+import time
+
+_perf_ns = time.perf_counter_ns
+
+
+class SpanProfiler:
+    """Rolling per-span counters: name -> [calls, total_ns, max_ns]."""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._spans: dict[str, list[int]] = {}
+        self._window_start = time.time()
+        self._periodic: threading.Thread | None = None
+        self._periodic_stop = threading.Event()
+
+    def enable(self, on: bool = True) -> None:
+        self.enabled = on
+
+    def start(self) -> int:
+        return _perf_ns() if self.enabled else 0
+
+    def stop(self, name: str, t0: int) -> None:
+        if not t0:
+            return
+        dt = _perf_ns() - t0
+        span = self._spans.get(name)
+        if span is None:
+            with self._lock:
+                span = self._spans.setdefault(name, [0, 0, 0])
+        span[0] += 1
+        span[1] += dt
+        if dt > span[2]:
+            span[2] = dt
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """{span: {"calls", "total_ns", "max_ns", "mean_ns"}}; `reset` starts a new window."""
+        with self._lock:
+            spans = self._spans
+            window = time.time() - self._window_start
+            if reset:
+                self._spans = {}
+                self._window_start = time.time()
+        out = {}
+        for name, (calls, total, peak) in spans.items():
+            out[name] = {"calls": calls, "total_ns": total, "max_ns": peak,
+                         "mean_ns": total // calls if calls else 0}
+        return {"window_s": round(window, 3), "spans": out}
+
+    def reset(self) -> None:
+        self.snapshot(reset=True)
+
+    def dump(self, path: str | None = None, reset: bool = False) -> dict:
+        """Print the counters as a table, or append them as one JSON line to `path`."""
+        snap = self.snapshot(reset=reset)
+        if path is None:
+            print(format_snapshot(snap))
+        else:
+            snap["time"] = time.time()
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(snap) + "\n")
+        return snap
+
+    def start_periodic(self, path: str, interval: float = 10.0) -> None:
+        """Enable, then write one window of counters to `path` every `interval` seconds."""
+        self.stop_periodic()
+        self.enable()
+        self.reset()
+        self._periodic_stop.clear()
+
+        def loop() -> None:
+            while not self._periodic_stop.wait(interval):
+                try:
+                    self.dump(path, reset=True)
+                except Exception as e:
+                    print(f"⚠️ Profiler write failed: {e}")
+
+        self._periodic = threading.Thread(target=loop, daemon=True)
+        self._periodic.start()
+        print(f"⏱️ Profiling audio hot path -> {path} (every {interval:g}s)")
+
+    def stop_periodic(self) -> None:
+        if self._periodic is not None:
+            self._periodic_stop.set()
+            self._periodic.join(timeout=1.0)
+            self._periodic = None
+
+
+def format_snapshot(snap: dict) -> str:
+    lines = [f"{'SPAN':<22} | {'calls':>9} | {'total ms':>10} | {'mean us':>9} | {'max us':>9}",
+             "-" * 70]
+    spans = sorted(snap["spans"].items(), key=lambda item: item[1]["total_ns"], reverse=True)
+    for name, s in spans:
+        lines.append(f"{name:<22} | {s['calls']:>9} | {s['total_ns'] / 1e6:>10.2f} | "
+                     f"{s['mean_ns'] / 1e3:>9.1f} | {s['max_ns'] / 1e3:>9.1f}")
+    lines.append(f"(window {snap['window_s']:.1f}s)")
+    return "\n".join(lines)
+
+
+PROFILER = SpanProfiler()
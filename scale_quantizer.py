@@ -0,0 +1,110 @@
+# scale_quantizer.py - QUANTIFICATION PAR TABLES v1.20
+"""
+Quantification des hauteurs sur une gamme par tables précalculées.
+Chaque gamme est étendue une seule fois sur les 128 notes MIDI :
+toute recherche de "note la plus proche" devient une lecture de tableau.
+"""
+
+import config
+from gammes import TOUTES_GAMMES
+
+MIDI_RANGE = 128
+
+
+class ScaleQuantizer:
+    """
+    Lookup tables for one scale over the full MIDI range (0–127).
+
+    nearest[p]        -> closest note of the scale itself (ties: first in list)
+    nearest_index[p]  -> index of that note in the scale
+    snapped[p]        -> closest note across the scale and its ±12/±24 shifts
+    """
+
+    __slots__ = ("scale", "nearest", "nearest_index", "snapped", "_positions")
+
+    def __init__(self, scale: list[int]) -> None:
+        if not scale:
+            raise ValueError("Cannot quantize to an empty scale")
+        self.scale = scale
+        nearest: list[int] = []
+        nearest_index: list[int] = []
+        snapped: list[int] = []
+        for p in range(MIDI_RANGE):
+            idx = min(range(len(scale)), key=lambda i: abs(scale[i] - p))
+            nearest.append(scale[idx])
+            nearest_index.append(idx)
+            snapped.append(self._snap_slow(p))
+        self.nearest: tuple[int, ...] = tuple(nearest)
+        self.nearest_index: tuple[int, ...] = tuple(nearest_index)
+        self.snapped: tuple[int, ...] = tuple(snapped)
+        # First occurrence wins, like list.index()
+        self._positions: dict[int, int] = {}
+        for i, n in enumerate(scale):
+            self._positions.setdefault(n, i)
+
+    def _snap_slow(self, pitch: int) -> int:
+        """Reference multi-octave search (used to build the table)."""
+        scale = self.scale
+        if pitch in scale:
+            return pitch
+        best = min(scale, key=lambda n: abs(n - pitch))
+        for octave_shift in (-12, 12, -24, 24):
+            for n in scale:
+                shifted = n + octave_shift
+                if abs(shifted - pitch) < abs(best - pitch):
+                    best = shifted
+        return best
+
+    def nearest_note(self, pitch: int) -> int:
+        if 0 <= pitch < MIDI_RANGE:
+            return self.nearest[pitch]
+        return self.nearest[0 if pitch < 0 else MIDI_RANGE - 1]
+
+    def index_near(self, pitch: int) -> int:
+        if 0 <= pitch < MIDI_RANGE:
+            return self.nearest_index[pitch]
+        return self.nearest_index[0 if pitch < 0 else MIDI_RANGE - 1]
+
+    def index_of(self, pitch: int) -> int:
+        """Index of an exact scale note, or -1 if not in the scale."""
+        return self._positions.get(pitch, -1)
+
+    def snap(self, pitch: int) -> int:
+        if 0 <= pitch < MIDI_RANGE:
+            return self.snapped[pitch]
+        return self._snap_slow(pitch)
+
+
+# ═══════════════════════════════════════════════════════════
+#  REGISTRY (built once for every known scale)
+# ═══════════════════════════════════════════════════════════
+
+_QUANTIZERS: dict[int, ScaleQuantizer] = {}
+_QUANTIZERS_MAX = 256
+
+
+def get_quantizer(scale: list[int]) -> ScaleQuantizer:
+    """
+    Return the quantizer for a scale list.
+
+    Scales are shared constant tables (gammes.py, config.EMOTIONS), so the
+    cache is keyed by identity; the quantizer keeps a reference to its list.
+    """
+    q = _QUANTIZERS.get(id(scale))
+    if q is None or q.scale is not scale:
+        if len(_QUANTIZERS) >= _QUANTIZERS_MAX:
+            _QUANTIZERS.clear()
+            _prebuild()
+        q = _QUANTIZERS[id(scale)] = ScaleQuantizer(scale)
+    return q
+
+
+def _prebuild() -> None:
+    for gamme in TOUTES_GAMMES.values():
+        _QUANTIZERS[id(gamme)] = ScaleQuantizer(gamme)
+    for emotion in config.EMOTIONS.values():
+        gamme = emotion["gamme"]
+        _QUANTIZERS[id(gamme)] = ScaleQuantizer(gamme)
+
+
+_prebuild()
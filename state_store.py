@@ -0,0 +1,213 @@
+# state_store.py - ÉTAT PARTAGÉ VERSIONNÉ v1.20
+"""
+État global immuable et versionné (copy-on-write, échange atomique).
+
+Chaque écriture construit un nouveau Snapshot puis remplace la référence
+courante en une seule affectation : les lecteurs (thread SCAMP, boucles
+UI) ne prennent aucun verrou et voient toujours un état cohérent.
+Les écrivains sont sérialisés entre eux par un verrou court.
+"""
+
+import threading
+from collections.abc import MutableMapping
+
+_MISSING = object()
+
+
+def _freeze(value):
+    """Lists become tuples so a snapshot can't be mutated in place."""
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+class Snapshot(dict):
+    """
+    Read-only dict with a version number.
+
+    Subclassing dict keeps reads at native dict speed; every mutator
+    raises. A new version is produced by StateStore, never by editing.
+    """
+
+    __slots__ = ("version",)
+
+    def __init__(self, data, version: int = 0) -> None:
+        dict.__init__(self, data)
+        self.version = version
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Snapshot is read-only: write through StateStore")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (Snapshot, (dict(self), self.version))
+
+
+class StateStore:
+    """
+    Versioned state shared between the audio and UI threads.
+
+    snapshot()        -> current Snapshot (lock-free, one attribute read)
+    set(**changes)    -> atomic multi-key write
+    mutate(fn)        -> read-modify-write: fn(snapshot) returns the changes
+    subscribe(cb)     -> cb(snapshot, changed_keys) after every new version
+    wait_for_change() -> block until the version moves past a known one
+
+    Writes that don't change any value keep the current version, so
+    watchers only wake up on real changes.
+    """
+
+    def __init__(self, initial: dict | None = None) -> None:
+        self._snap = Snapshot({k: _freeze(v) for k, v in (initial or {}).items()}, 0)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._subscribers: list[tuple] = []
+
+    # ── Reads (lock-free) ──────────────────────────────────────
+
+    def snapshot(self) -> Snapshot:
+        return self._snap
+
+    @property
+    def version(self) -> int:
+        return self._snap.version
+
+    def get(self, key, default=None):
+        return self._snap.get(key, default)
+
+    # ── Writes ─────────────────────────────────────────────────
+
+    def _commit(self, changes: dict, removed=()) -> tuple[Snapshot, frozenset]:
+        """Build and swap in the next snapshot. Caller holds the lock."""
+        old = self._snap
+        changed = set()
+        for key, value in changes.items():
+            if old.get(key, _MISSING) != value:
+                changed.add(key)
+        for key in removed:
+            if key in old:
+                changed.add(key)
+        if not changed:
+            return old, frozenset()
+        data = dict(old)
+        for key in removed:
+            data.pop(key, None)
+        for key in changed:
+            if key in changes:
+                data[key] = changes[key]
+        new = Snapshot(data, old.version + 1)
+        self._snap = new  # Atomic reference swap
+        self._changed.notify_all()
+        return new, frozenset(changed)
+
+    def _publish(self, snap: Snapshot, changed: frozenset) -> Snapshot:
+        if changed:
+            for callback, keys in list(self._subscribers):
+                if keys is None or not keys.isdisjoint(changed):
+                    try:
+                        callback(snap, changed)
+                    except Exception as e:
+                        print(f"⚠️ State subscriber error: {e}")
+        return snap
+
+    def set(self, **changes) -> Snapshot:
+        return self.update(changes)
+
+    def update(self, changes: dict) -> Snapshot:
+        frozen = {k: _freeze(v) for k, v in changes.items()}
+        with self._lock:
+            snap, changed = self._commit(frozen)
+        return self._publish(snap, changed)
+
+    def mutate(self, fn) -> Snapshot:
+        """
+        Atomic read-modify-write. `fn(snapshot)` returns a dict of changes
+        (or None); no other writer can run between the read and the swap.
+        Keep `fn` short: it runs under the writer lock.
+        """
+        with self._lock:
+            changes = fn(self._snap) or {}
+            snap, changed = self._commit({k: _freeze(v) for k, v in changes.items()})
+        return self._publish(snap, changed)
+
+    def delete(self, *keys) -> Snapshot:
+        with self._lock:
+            snap, changed = self._commit({}, removed=keys)
+        return self._publish(snap, changed)
+
+    def replace(self, data: dict) -> Snapshot:
+        """Swap in a whole new state (e.g. restoring a saved snapshot)."""
+        frozen = {k: _freeze(v) for k, v in data.items()}
+        with self._lock:
+            removed = [k for k in self._snap if k not in frozen]
+            snap, changed = self._commit(frozen, removed=removed)
+        return self._publish(snap, changed)
+
+    # ── Change notification ────────────────────────────────────
+
+    def subscribe(self, callback, keys=None):
+        """
+        Call `callback(snapshot, changed_keys)` after each new version
+        (only when one of `keys` changed, if given). Runs on the writer's
+        thread. Returns an unsubscribe function.
+        """
+        entry = (callback, frozenset(keys) if keys is not None else None)
+        with self._lock:
+            self._subscribers.append(entry)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+        return unsubscribe
+
+    def wait_for_change(self, since_version: int, timeout: float | None = None) -> Snapshot:
+        """Block until version > since_version (or timeout); return the current snapshot."""
+        with self._changed:
+            self._changed.wait_for(lambda: self._snap.version > since_version, timeout)
+            return self._snap
+
+    def view(self) -> "StateView":
+        return StateView(self)
+
+
+class StateView(MutableMapping):
+    """
+    dict-compatible facade over a StateStore (config.ETAT).
+
+    Each item write is its own atomic version; use STATE.set()/mutate()
+    when several keys must change together or a value is read-modified.
+    """
+
+    __slots__ = ("_store",)
+
+    def __init__(self, store: StateStore) -> None:
+        self._store = store
+
+    def __getitem__(self, key):
+        return self._store._snap[key]
+
+    def get(self, key, default=None):
+        return self._store._snap.get(key, default)
+
+    def __contains__(self, key) -> bool:
+        return key in self._store._snap
+
+    def __setitem__(self, key, value) -> None:
+        self._store.update({key: value})
+
+    def __delitem__(self, key) -> None:
+        if key not in self._store._snap:
+            raise KeyError(key)
+        self._store.delete(key)
+
+    def __iter__(self):
+        return iter(self._store._snap)
+
+    def __len__(self) -> int:
+        return len(self._store._snap)
+
+    def __repr__(self) -> str:
+        return f"StateView(v{self._store.version}, {dict(self._store._snap)!r})"
@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+pytest.importorskip("numpy")  # ambience.py needs it at import
+
+from ambience import AudioWorker
+
+
+@pytest.fixture
+def blocked_worker():
+    """Worker held busy by a first command until the test releases it."""
+    worker = AudioWorker()
+    gate = threading.Event()
+    worker.post(gate.wait)
+    yield worker, gate
+    gate.set()
+    worker.flush(2.0)
+
+
+def test_unkeyed_commands_run_in_posting_order(blocked_worker):
+    worker, gate = blocked_worker
+    out = []
+    for i in range(5):
+        worker.post(out.append, i)
+    gate.set()
+    assert worker.flush(2.0)
+    assert out == [0, 1, 2, 3, 4]
+
+
+def test_keyed_burst_runs_only_the_last_value(blocked_worker):
+    worker, gate = blocked_worker
+    out = []
+    for vol in range(10):
+        worker.post(out.append, vol, key="volume")
+    gate.set()
+    assert worker.flush(2.0)
+    assert out == [9]
+    assert worker.coalesced == 9
+
+
+def test_coalesced_command_moves_after_later_posts(blocked_worker):
+    worker, gate = blocked_worker
+    out = []
+    worker.post(out.append, "play A", key="play")
+    worker.post(out.append, "layer B")
+    worker.post(out.append, "play C", key="play")
+    gate.set()
+    assert worker.flush(2.0)
+    assert out == ["layer B", "play C"]
+
+
+def test_different_keys_keep_their_order(blocked_worker):
+    worker, gate = blocked_worker
+    out = []
+    worker.post(out.append, "vol 1", key="volume")
+    worker.post(out.append, "pause", key="pause")
+    worker.post(out.append, "vol 2", key="volume")
+    gate.set()
+    assert worker.flush(2.0)
+    assert out == ["pause", "vol 2"]
+
+
+def test_key_can_be_posted_again_once_it_ran():
+    worker = AudioWorker()
+    out = []
+    worker.post(out.append, 1, key="volume")
+    assert worker.flush(2.0)
+    worker.post(out.append, 2, key="volume")
+    assert worker.flush(2.0)
+    assert out == [1, 2]
+
+
+def test_failing_command_does_not_stop_the_worker():
+    worker = AudioWorker()
+    out = []
+    worker.post(lambda: 1 / 0)
+    worker.post(out.append, "next")
+    assert worker.flush(2.0)
+    assert out == ["next"]
@@ -0,0 +1,74 @@
+import event_bus
+from event_bus import EventBus, bridge_state
+from state_store import StateStore
+
+
+def collect(bus, topic):
+    seen = []
+    bus.subscribe(topic, seen.append)
+    return seen
+
+
+def test_nothing_is_delivered_before_dispatch():
+    bus = EventBus()
+    seen = collect(bus, event_bus.BPM_CHANGED)
+    bus.publish(event_bus.BPM_CHANGED, bpm=90)
+    assert seen == []
+    assert bus.dispatch() == 1
+    assert seen == [{"bpm": 90}]
+    assert bus.dispatch() == 0
+
+
+def test_scalar_keys_coalesce_last_wins():
+    bus = EventBus()
+    seen = collect(bus, event_bus.BPM_CHANGED)
+    for bpm in range(60, 110):
+        bus.publish(event_bus.BPM_CHANGED, bpm=bpm)
+    bus.dispatch()
+    assert seen == [{"bpm": 109}]
+
+
+def test_set_keys_merge_and_net_out():
+    bus = EventBus()
+    seen = collect(bus, event_bus.INSTRUMENTS_CHANGED)
+    bus.publish(event_bus.INSTRUMENTS_CHANGED, added={"piano"}, removed=set(), actifs=("piano",))
+    bus.publish(event_bus.INSTRUMENTS_CHANGED, added={"violon"}, removed=set(), actifs=("piano", "violon"))
+    bus.publish(event_bus.INSTRUMENTS_CHANGED, added=set(), removed={"piano"}, actifs=("violon",))
+    bus.dispatch()
+    assert seen == [{"added": {"violon"}, "removed": {"piano"}, "actifs": ("violon",)}]
+
+
+def test_topics_are_delivered_separately_and_unsubscribe_works():
+    bus = EventBus()
+    bpm = collect(bus, event_bus.BPM_CHANGED)
+    emotion = []
+    unsubscribe = bus.subscribe(event_bus.EMOTION_CHANGED, emotion.append)
+    bus.publish(event_bus.BPM_CHANGED, bpm=80)
+    bus.publish(event_bus.EMOTION_CHANGED, emotion="joyeux", target="joyeux")
+    unsubscribe()
+    assert bus.dispatch() == 2
+    assert bpm == [{"bpm": 80}] and emotion == []
+
+
+def test_handler_error_does_not_stop_other_handlers():
+    bus = EventBus()
+    bus.subscribe(event_bus.BPM_CHANGED, lambda delta: 1 / 0)
+    seen = collect(bus, event_bus.BPM_CHANGED)
+    bus.publish(event_bus.BPM_CHANGED, bpm=70)
+    bus.dispatch()
+    assert seen == [{"bpm": 70}]
+
+
+def test_bridge_publishes_state_changes():
+    store = StateStore({"instruments_actifs": ("piano",), "bpm": 120, "emotion": "aleatoire"})
+    bus = EventBus()
+    bridge_state(store, bus)
+    inst = collect(bus, event_bus.INSTRUMENTS_CHANGED)
+    emotion = collect(bus, event_bus.EMOTION_CHANGED)
+    bpm = collect(bus, event_bus.BPM_CHANGED)
+    store.set(instruments_actifs=["piano", "harpe"], target_emotion="epique")
+    store.set(chaos=40)  # Not bridged
+    bus.dispatch()
+    assert inst == [{"added": {"harpe"}, "removed": set(), "actifs": ("piano", "harpe")}]
+    assert emotion == [{"emotion": "aleatoire", "target": "epique"}]
+    assert bpm == []
@@ -0,0 +1,92 @@
+from midi_channels import (ChannelAllocator, DRUM_CHANNEL, MELODIC_CHANNELS,
+                           SCAMP_PART_SLOTS, gm_program)
+
+
+def test_free_channels_are_used_before_any_eviction():
+    alloc = ChannelAllocator((0, 1, 2))
+    bound = [alloc.bind(key, "Violin", now) for now, key in enumerate("abc")]
+    assert sorted(ch for ch, _ in bound) == [0, 1, 2]
+    assert all(evicted is None for _, evicted in bound)
+
+
+def test_evicts_least_recently_used_idle_channel():
+    alloc = ChannelAllocator((0, 1, 2))
+    for now, key in enumerate("abc"):
+        alloc.bind(key, "Violin", now)
+    alloc.touch(alloc.channel_of("a"), 10)  # a played last
+    channel, evicted = alloc.bind("d", "Cello", 11)
+    assert evicted == "b"
+    assert alloc.channel_of("d") == channel and "b" not in alloc
+    assert alloc.rebinds == 1
+
+
+def test_sounding_channels_are_kept_while_an_idle_one_exists():
+    alloc = ChannelAllocator((0, 1))
+    alloc.bind("a", "Violin", 0)
+    alloc.bind("b", "Violin", 1)
+    alloc.note_on(alloc.channel_of("a"), 2)  # Least recently used, but ringing
+    alloc.touch(alloc.channel_of("b"), 3)
+    assert alloc.bind("c", "Cello", 4)[1] == "b"
+    alloc.note_off(alloc.channel_of("a"))
+    assert alloc.bind("d", "Cello", 5)[1] == "a"
+
+
+def test_hold_keeps_channel_until_release_time():
+    alloc = ChannelAllocator((0, 1))
+    alloc.bind("a", "Violin", 0)
+    alloc.bind("b", "Violin", 1)
+    alloc.hold(alloc.channel_of("a"), 0, 10)
+    alloc.hold(alloc.channel_of("b"), 1, 3)
+    assert alloc.bind("c", "Cello", 5)[1] == "b"
+    assert alloc.bind("d", "Cello", 12)[1] == "a"  # Hold over
+
+
+def test_everything_ringing_falls_back_to_lru():
+    alloc = ChannelAllocator((0, 1))
+    alloc.bind("a", "Violin", 0)
+    alloc.bind("b", "Violin", 1)
+    alloc.note_on(alloc.channel_of("a"), 2)
+    alloc.note_on(alloc.channel_of("b"), 3)
+    assert alloc.bind("c", "Cello", 4)[1] == "a"
+
+
+def test_pinned_only_evicted_as_last_resort_reserved_never():
+    alloc = ChannelAllocator((0, 1, 2))
+    for now, key in enumerate("abc"):
+        alloc.bind(key, "Violin", now)
+    alloc.reserved = {"a"}
+    alloc.pinned = {"b"}
+    assert alloc.bind("d", "Cello", 5)[1] == "c"
+    alloc.pinned = {"b", "d"}
+    assert alloc.bind("e", "Flute", 6)[1] == "b"  # Pinned, oldest after reserved a
+    assert "a" in alloc
+
+
+def test_just_bound_key_is_not_the_next_victim():
+    alloc = ChannelAllocator((0, 1))
+    alloc.bind("a", "Violin", 0)
+    alloc.bind("b", "Violin", 5)
+    alloc.bind("c", "Cello", 6)  # Evicts a
+    assert alloc.bind("d", "Flute", 6)[1] == "b"
+
+
+def test_drum_kits_share_the_drum_channel_unless_disabled():
+    alloc = ChannelAllocator()
+    assert alloc.bind("kit", "Orchestral Kit", 0) == (DRUM_CHANNEL, None)
+    assert DRUM_CHANNEL not in MELODIC_CHANNELS
+    parts = ChannelAllocator(SCAMP_PART_SLOTS, drum_channel=None)
+    channel, _ = parts.bind("kit", "Orchestral Kit", 0)
+    assert channel in SCAMP_PART_SLOTS
+
+
+def test_unbounded_never_evicts():
+    alloc = ChannelAllocator(None)
+    results = [alloc.bind(i, "Violin", i) for i in range(40)]
+    assert [ch for ch, _ in results] == list(range(40))
+    assert all(evicted is None for _, evicted in results)
+
+
+def test_gm_program():
+    assert gm_program("Violin") == (False, 40)
+    assert gm_program("Orchestral Kit") == (True, 48)
+    assert gm_program("Unknown") == (False, 0)
@@ -0,0 +1,93 @@
+from clock import SimulatedClock
+from note_scheduler import NoteScheduler, MIN_WAIT
+from onset_probe import OnsetProbe
+
+
+class Part:
+    def __init__(self, clock, fail=False):
+        self.clock = clock
+        self.fail = fail
+        self.played = []
+
+    def play_note(self, pitch, volume, length, blocking=False):
+        if self.fail:
+            raise RuntimeError("synth gone")
+        self.played.append((self.clock.now(), pitch))
+
+
+def test_plays_in_time_order_fifo_on_ties():
+    clock = SimulatedClock()
+    sched = NoteScheduler(clock)
+    part = Part(clock)
+    sched.schedule(0.3, part, 62, 0.5, 1.0)
+    sched.schedule(0.1, part, 60, 0.5, 1.0)
+    sched.schedule(0.3, part, 64, 0.5, 1.0)  # Same time: after 62
+    sched.play_until(1.0)
+    assert part.played == [(0.1, 60), (0.3, 62), (0.3, 64)]
+    assert clock.now() == 1.0
+    assert len(sched) == 0 and sched.played == 3
+
+
+def test_leaves_later_events_queued():
+    clock = SimulatedClock()
+    sched = NoteScheduler(clock)
+    part = Part(clock)
+    sched.schedule(0.2, part, 60, 0.5, 1.0)
+    sched.schedule(0.8, part, 62, 0.5, 1.0)
+    sched.play_until(0.5)
+    assert [p for _, p in part.played] == [60]
+    assert len(sched) == 1
+
+
+def test_stale_events_are_dropped_not_burst():
+    clock = SimulatedClock()
+    sched = NoteScheduler(clock, lookahead=0.5)
+    part = Part(clock)
+    sched.schedule(0.0, part, 60, 0.5, 1.0)
+    clock.t = 10.0  # Paused far past the event
+    sched.play_until(10.5)
+    assert part.played == []
+    assert sched.dropped == 1
+
+
+def test_always_yields_at_least_min_wait():
+    clock = SimulatedClock(start=5.0)
+    NoteScheduler(clock).play_until(0.0)
+    assert clock.now() == 5.0 + MIN_WAIT
+
+
+def test_resync_never_moves_cursor_back():
+    clock = SimulatedClock()
+    sched = NoteScheduler(clock)
+    sched.cursor = 2.0
+    clock.t = 1.0
+    assert sched.resync() == 1.0 and sched.cursor == 2.0
+    clock.t = 3.0
+    sched.resync()
+    assert sched.cursor == 3.0
+
+
+def test_compose_clock_runs_ahead_of_the_engine_clock():
+    clock = SimulatedClock(tempo=120)
+    sched = NoteScheduler(clock)
+    sched.cursor = 1.5
+    assert sched.compose_clock.now() == 1.5
+    assert sched.compose_clock.seconds(2.0) == 1.0
+
+
+def test_failed_play_note_is_counted():
+    clock = SimulatedClock()
+    sched = NoteScheduler(clock)
+    sched.schedule(0.0, Part(clock, fail=True), 60, 0.5, 1.0, "violon")
+    sched.play_until(0.1)
+    assert sched.failed == 1 and sched.played == 0
+
+
+def test_probe_records_lag_in_seconds():
+    clock = SimulatedClock(tempo=120)  # One beat = 0.5 s
+    probe = OnsetProbe()
+    sched = NoteScheduler(clock, probe=probe)
+    sched.schedule(0.0, Part(clock), 60, 0.5, 1.0, "violon")
+    clock.t = 0.5  # Dispatched half a beat late
+    sched.play_until(1.0)
+    assert probe.stats("violon")["max"] == 250.0
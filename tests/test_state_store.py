@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+from state_store import Snapshot, StateStore
+
+
+def test_snapshot_is_isolated_from_later_writes():
+    store = StateStore({"bpm": 120, "actifs": ["piano"]})
+    before = store.snapshot()
+    store.set(bpm=90, actifs=["violon", "harpe"])
+    assert before["bpm"] == 120 and before["actifs"] == ("piano",)
+    assert store.snapshot()["actifs"] == ("violon", "harpe")
+
+
+def test_snapshot_is_read_only():
+    snap = StateStore({"bpm": 120}).snapshot()
+    with pytest.raises(TypeError):
+        snap["bpm"] = 90
+    with pytest.raises(TypeError):
+        snap.update(bpm=90)
+    assert isinstance(snap["bpm"], int)
+
+
+def test_lists_are_frozen_so_callers_cannot_mutate_state():
+    store = StateStore()
+    actifs = ["piano"]
+    store.set(actifs=actifs)
+    actifs.append("violon")
+    assert store.get("actifs") == ("piano",)
+
+
+def test_version_moves_only_on_real_changes():
+    store = StateStore({"bpm": 120})
+    assert store.version == 0
+    store.set(bpm=120)
+    assert store.version == 0
+    store.set(bpm=100, chaos=10)
+    assert store.version == 1
+    store.delete("missing")
+    assert store.version == 1
+    store.delete("chaos")
+    assert store.version == 2 and "chaos" not in store.snapshot()
+
+
+def test_subscribers_get_changed_keys_filtered():
+    store = StateStore({"bpm": 120, "chaos": 0})
+    seen, bpm_only = [], []
+    store.subscribe(lambda snap, changed: seen.append(changed))
+    unsubscribe = store.subscribe(lambda snap, changed: bpm_only.append(snap["bpm"]), keys=("bpm",))
+    store.set(chaos=5)
+    store.set(bpm=90, chaos=6)
+    unsubscribe()
+    store.set(bpm=80)
+    assert seen == [frozenset({"chaos"}), frozenset({"bpm", "chaos"}), frozenset({"bpm"})]
+    assert bpm_only == [90]
+
+
+def test_mutate_is_atomic_read_modify_write():
+    store = StateStore({"n": 0})
+
+    def bump():
+        for _ in range(500):
+            store.mutate(lambda s: {"n": s["n"] + 1})
+
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert store.get("n") == 2000
+    assert store.version == 2000
+
+
+def test_replace_drops_missing_keys_and_view_writes_through():
+    store = StateStore({"bpm": 120, "chaos": 0})
+    view = store.view()
+    view["bpm"] = 100
+    assert store.get("bpm") == 100
+    store.replace(Snapshot({"bpm": 60}))
+    assert dict(view) == {"bpm": 60}
+    with pytest.raises(KeyError):
+        del view["chaos"]